@@ -0,0 +1,272 @@
+# -*- encoding: utf-8 -*-
+'''
+AruCo marker detection for locating the DMF chip in video frames.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import cv2
+import numpy as np
+
+
+# Order of corners returned by :func:`cv2.aruco.detectMarkers`.
+CORNER_NAMES = ['top-left', 'top-right', 'bottom-right', 'bottom-left']
+
+
+class MarkerTracker(object):
+    '''
+    Multi-scale AruCo marker detector with region-of-interest tracking.
+
+    A *full scan* detects markers on a downscaled grayscale copy of the frame
+    and refines the detected corners to sub-pixel accuracy at full resolution.
+    Once all tracked markers have been found, subsequent frames only search
+    windows around the last known position of each tracked marker.  If any
+    tracked marker is not found within its window, a full scan is performed.
+
+    Parameters
+    ----------
+    marker_ids : list[int], optional
+        Ids of markers to track.
+    dictionary : int, optional
+        Predefined AruCo dictionary id.
+    scale : float, optional
+        Scale factor applied to frame for full scan.
+    margin : float, optional
+        Size of search window margin around last known marker position,
+        relative to marker size.
+    refine_window : int, optional
+        Half size of sub-pixel corner refinement window (in pixels).  Set to
+        ``0`` to disable refinement.
+    '''
+    def __init__(self, marker_ids=(0, 1), dictionary=None, scale=.5,
+                 margin=1., refine_window=5):
+        if dictionary is None:
+            dictionary = cv2.aruco.DICT_4X4_1000
+        self.marker_ids = list(marker_ids)
+        # Dictionary and detector parameters are constant; create once.
+        self.dictionary = cv2.aruco.getPredefinedDictionary(dictionary)
+        self.parameters = cv2.aruco.DetectorParameters_create()
+        self.scale = scale
+        self.margin = margin
+        self.refine_window = refine_window
+        self.criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER,
+                         30, .01)
+        # Last known corners (4x2 array) of each tracked marker.
+        self.tracked = {}
+        self.full_scan_count = 0
+        self.tracked_count = 0
+
+    def reset(self):
+        '''
+        Forget tracked marker positions; next frame will be fully scanned.
+        '''
+        self.tracked.clear()
+
+    def detect(self, frame, gray=None):
+        '''
+        Detect markers in frame.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            BGR video frame.
+        gray : numpy.ndarray, optional
+            Grayscale version of ``frame`` (computed if not provided).
+
+        Returns
+        -------
+        corners, ids
+            Same format as returned by :func:`cv2.aruco.detectMarkers`, i.e.,
+            list of ``1x4x2`` corner arrays and ``Nx1`` array of ids (or
+            ``None`` if no markers were detected).
+        '''
+        if gray is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        corners_by_id = None
+        if self.tracked and all(i in self.tracked for i in self.marker_ids):
+            corners_by_id = self._detect_windows(gray)
+            if not all(i in corners_by_id for i in self.marker_ids):
+                # Tracking lost.
+                corners_by_id = None
+        if corners_by_id is None:
+            corners_by_id = self._detect_full(gray)
+            self.full_scan_count += 1
+        else:
+            self.tracked_count += 1
+
+        self.tracked = {i: corners_by_id[i] for i in self.marker_ids
+                        if i in corners_by_id}
+        if not corners_by_id:
+            return [], None
+        ids = sorted(corners_by_id)
+        return ([corners_by_id[i].reshape(1, 4, 2) for i in ids],
+                np.array(ids, dtype='int32').reshape(-1, 1))
+
+    def _detect(self, gray):
+        corners, ids, _ = cv2.aruco.detectMarkers(gray, self.dictionary,
+                                                  parameters=self.parameters)
+        if ids is None:
+            return {}
+        return {int(i): c.reshape(4, 2).astype('float32')
+                for i, c in zip(ids[:, 0], corners)}
+
+    def _refine(self, gray, corners_by_id):
+        if self.refine_window > 0 and corners_by_id:
+            ids = sorted(corners_by_id)
+            points = np.concatenate([corners_by_id[i] for i in ids])
+            points = points.reshape(-1, 1, 2)
+            window = (self.refine_window, self.refine_window)
+            cv2.cornerSubPix(gray, points, window, (-1, -1), self.criteria)
+            for k, i in enumerate(ids):
+                corners_by_id[i] = points[4 * k:4 * (k + 1)].reshape(4, 2)
+        return corners_by_id
+
+    def _detect_full(self, gray):
+        if self.scale < 1:
+            small = cv2.resize(gray, None, fx=self.scale, fy=self.scale,
+                               interpolation=cv2.INTER_AREA)
+            corners_by_id = {i: c / self.scale
+                             for i, c in self._detect(small).items()}
+            return self._refine(gray, corners_by_id)
+        return self._detect(gray)
+
+    def _detect_windows(self, gray):
+        height, width = gray.shape[:2]
+        corners_by_id = {}
+        for i in self.marker_ids:
+            corners = self.tracked[i]
+            (x0, y0), (x1, y1) = corners.min(axis=0), corners.max(axis=0)
+            margin = self.margin * max(x1 - x0, y1 - y0)
+            x0 = int(max(0, x0 - margin))
+            y0 = int(max(0, y0 - margin))
+            x1 = int(min(width, x1 + margin + 1))
+            y1 = int(min(height, y1 + margin + 1))
+            window = np.ascontiguousarray(gray[y0:y1, x0:x1])
+            found = self._detect(window).get(i)
+            if found is not None:
+                corners_by_id[i] = found + np.array([x0, y0], dtype='float32')
+        return corners_by_id
+
+
+class CornerSmoother(object):
+    '''
+    Smooth detected marker corners over time, using preallocated arrays.
+
+    Supported methods:
+
+     - ``'mean'``: moving average over the last ``window`` samples
+     - ``'ewma'``: exponentially weighted moving average
+     - ``'kalman'``: per-coordinate Kalman filter with a constant position
+       model
+
+    Parameters
+    ----------
+    marker_ids : list[int], optional
+        Ids of markers to smooth.
+    window : int, optional
+        Number of samples in moving average window.
+    method : str, optional
+        Smoothing method; one of ``'mean'``, ``'ewma'``, or ``'kalman'``.
+    alpha : float, optional
+        Weight of newest sample for ``'ewma'`` method.
+    process_noise : float, optional
+        Corner position process noise variance for ``'kalman'`` method.
+    measurement_noise : float, optional
+        Corner position measurement noise variance for ``'kalman'`` method.
+    '''
+    def __init__(self, marker_ids=(0, 1), window=5, method='mean', alpha=.5,
+                 process_noise=1e-2, measurement_noise=1.):
+        if method not in ('mean', 'ewma', 'kalman'):
+            raise ValueError('Unsupported smoothing method: `%s`' % method)
+        self.method = method
+        self.alpha = alpha
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self._slots = {i: k for k, i in enumerate(marker_ids)}
+        count = len(self._slots)
+        self._samples = np.zeros((count, window, 4, 2), dtype='float32')
+        self._counts = np.zeros(count, dtype='int64')
+        self._positions = np.zeros(count, dtype='int64')
+        self._estimates = np.zeros((count, 4, 2), dtype='float64')
+        self._variances = np.zeros((count, 4, 2), dtype='float64')
+
+    def __contains__(self, marker_id):
+        return self._counts[self._slots[marker_id]] > 0
+
+    def reset(self, marker_id=None):
+        '''
+        Discard samples for marker (default: all markers).
+        '''
+        if marker_id is None:
+            self._counts[:] = 0
+            self._positions[:] = 0
+        else:
+            k = self._slots[marker_id]
+            self._counts[k] = 0
+            self._positions[k] = 0
+
+    def update(self, marker_id, corners):
+        '''
+        Add corner sample for marker.
+
+        Parameters
+        ----------
+        marker_id : int
+            Marker id.
+        corners : numpy.ndarray
+            Marker corners, in any shape containing 4 ``(x, y)`` points (e.g.,
+            ``1x4x2`` as returned by :func:`cv2.aruco.detectMarkers`).
+        '''
+        k = self._slots[marker_id]
+        corners = np.reshape(corners, (4, 2))
+        window = self._samples.shape[1]
+        self._samples[k, self._positions[k]] = corners
+        self._positions[k] = (self._positions[k] + 1) % window
+        first = self._counts[k] == 0
+        self._counts[k] = min(self._counts[k] + 1, window)
+
+        if first:
+            self._estimates[k] = corners
+            self._variances[k] = self.measurement_noise
+        elif self.method == 'ewma':
+            self._estimates[k] += self.alpha * (corners - self._estimates[k])
+        elif self.method == 'kalman':
+            self._variances[k] += self.process_noise
+            gain = self._variances[k] / (self._variances[k] +
+                                         self.measurement_noise)
+            self._estimates[k] += gain * (corners - self._estimates[k])
+            self._variances[k] *= 1 - gain
+
+    def corners(self, marker_id):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            Smoothed ``4x2`` corners of marker, in :data:`CORNER_NAMES` order.
+        '''
+        k = self._slots[marker_id]
+        if self.method == 'mean':
+            return self._samples[k, :self._counts[k]].mean(axis=0)
+        return self._estimates[k].astype('float32')
+
+    def quad(self, corner_indices):
+        '''
+        Parameters
+        ----------
+        corner_indices : list[tuple(int, str)]
+            ``(marker id, corner name)`` of each point, e.g.,
+            ``(1, 'top-right')``.
+
+        Returns
+        -------
+        numpy.ndarray
+            ``Nx2`` array of smoothed points, e.g., the source quad for
+            :func:`cv2.getPerspectiveTransform`.
+        '''
+        corners = {i: self.corners(i) for i in set(i for i, _ in
+                                                   corner_indices)}
+        return np.array([corners[i][CORNER_NAMES.index(name)]
+                         for i, name in corner_indices], dtype='float32')
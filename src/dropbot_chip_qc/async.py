@@ -1,12 +1,175 @@
 # -*- encoding: utf-8 -*-
 from __future__ import print_function, absolute_import, unicode_literals
+import collections
+import logging
+import threading
+import time
 
 import cv2
 import trollius as asyncio
 
+from .timing import TimingHistogram
+
+
+class FrameSubscription(object):
+    '''
+    Subscription to ``frame-ready`` messages signalled by
+    :func:`dropbot_chip_qc.video.chip_video_process()`, for consumers running
+    in a :py:mod:`trollius` `asyncio` event loop.
+
+    The ``frame-ready`` receiver only stores the message according to the
+    backpressure ``policy`` and wakes the event loop, so a slow consumer never
+    slows down video processing:
+
+     - ``'latest'``: keep only the newest message
+     - ``'queue'``: keep up to ``maxsize`` messages; drop *new* messages while
+       the queue is full
+     - ``'drop-oldest'``: keep up to ``maxsize`` messages; drop the *oldest*
+       queued message to make room for a new message
+
+    The receiver is disconnected by :meth:`unsubscribe`, on exit when used as
+    a context manager, or automatically once the subscription is garbage
+    collected.
+
+    Messages are :class:`dropbot_chip_qc.payload.FramePayload` mappings.
+    Views listed in ``views`` are computed as each message is received, since
+    views that have not been computed by the end of the ``frame-ready``
+    dispatch are no longer available.
+
+    With the ``'latest'`` policy, frames in messages reference reusable
+    buffers (see :func:`dropbot_chip_qc.video.chip_video_process()`), so a
+    message must be used as soon as it is taken.  With the ``'queue'`` and
+    ``'drop-oldest'`` policies, messages may wait in the queue while later
+    frames are processed, so each message is queued as a copy (see
+    :meth:`dropbot_chip_qc.payload.FramePayload.detach`), i.e., queued
+    frames are never overwritten.
+
+    Parameters
+    ----------
+    signals : blinker.Namespace
+        DMF chip webcam monitor signals.
+    policy : str, optional
+        Backpressure policy; one of ``'latest'``, ``'queue'``, or
+        ``'drop-oldest'``.
+    maxsize : int, optional
+        Maximum number of queued messages (ignored for ``'latest'`` policy).
+    loop : asyncio.BaseEventLoop, optional
+        Event loop of consumer (default: current event loop).
+    views : list[str], optional
+        Views to compute on receipt, e.g., ``['frame']``.
+
+    Examples
+    --------
+
+    >>> @asyncio.coroutine
+    ... def consume(signals):
+    ...     with FrameSubscription(signals, policy='drop-oldest',
+    ...                            maxsize=10) as subscription:
+    ...         while True:
+    ...             message = yield asyncio.From(subscription.get())
+    ...             ...
+
+
+    .. versionadded:: 0.13.0
+    '''
+    POLICIES = ('latest', 'queue', 'drop-oldest')
+
+    def __init__(self, signals, policy='latest', maxsize=1, loop=None,
+                 views=()):
+        if policy not in self.POLICIES:
+            raise ValueError('Unsupported policy: `%s`.  Must be one of: %s' %
+                             (policy, ', '.join(self.POLICIES)))
+        self.signal = signals.signal('frame-ready')
+        self.policy = policy
+        self.maxsize = 1 if policy == 'latest' else maxsize
+        self.loop = asyncio.get_event_loop() if loop is None else loop
+        self.views = tuple(views)
+        self.received_count = 0
+        self.dropped_count = 0
+        self._messages = collections.deque()
+        self._lock = threading.Lock()
+        self._ready = asyncio.Event(loop=self.loop)
+        self._wake_pending = False
+        self.subscribe()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.unsubscribe()
+
+    def __len__(self):
+        return len(self._messages)
+
+    def subscribe(self):
+        # Weak reference to bound method; automatically disconnected when
+        # subscription is garbage collected.
+        self.signal.connect(self._on_frame_ready)
+
+    def unsubscribe(self):
+        self.signal.disconnect(self._on_frame_ready)
+
+    def _on_frame_ready(self, sender, payload=None):
+        with self._lock:
+            self.received_count += 1
+            if len(self._messages) >= self.maxsize:
+                self.dropped_count += 1
+                if self.policy == 'queue':
+                    return
+                self._messages.popleft()
+            if self.policy == 'latest':
+                for view in self.views:
+                    # Compute view while its buffers are still valid.
+                    payload[view]
+                message = payload
+            else:
+                # Frame buffers are reused before queued messages are taken.
+                message = payload.detach(self.views)
+            self._messages.append(message)
+            if self._wake_pending:
+                # Event loop has already been asked to wake consumer.
+                return
+            self._wake_pending = True
+        self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        with self._lock:
+            self._wake_pending = False
+        self._ready.set()
+
+    def get_nowait(self):
+        '''
+        Returns
+        -------
+        dropbot_chip_qc.payload.FramePayload or None
+            Next queued ``frame-ready`` message, or ``None`` if no message is
+            queued.
+        '''
+        with self._lock:
+            if not self._messages:
+                self._ready.clear()
+                return None
+            return self._messages.popleft()
+
+    @asyncio.coroutine
+    def get(self):
+        '''
+        Wait for next ``frame-ready`` message.
+
+        Returns
+        -------
+        dropbot_chip_qc.payload.FramePayload
+            ``frame-ready`` message payload.
+        '''
+        while True:
+            message = self.get_nowait()
+            if message is not None:
+                raise asyncio.Return(message)
+            yield asyncio.From(self._ready.wait())
+
 
 @asyncio.coroutine
-def read_frame(signals):
+def read_frame(signals, views=('frame', 'warped')):
     '''
     :py:mod:`trollius` `asyncio` wrapper to return a single frame produced by a
     ``frame-ready`` event signalled by
@@ -17,57 +180,105 @@ def read_frame(signals):
     signals : blinker.Namespace
         DMF chip webcam monitor signals (see
         :func:`dropbot_chip_qc.video.chip_video_process()`).
-    '''
-    loop = asyncio.get_event_loop()
-
-    frame_ready = asyncio.Event()
-    response = {}
+    views : list[str], optional
+        Views to compute (see :class:`FrameSubscription`).
 
-    def on_frame_ready(sender, **message):
-        response.update(message)
-        loop.call_soon_threadsafe(frame_ready.set)
+    Returns
+    -------
+    dropbot_chip_qc.payload.FramePayload
+        ``frame-ready`` message payload.
 
-    signals.signal('frame-ready').connect(on_frame_ready)
 
-    yield asyncio.From(frame_ready.wait())
+    .. versionchanged:: 0.13.0
+        Return lazy ``frame-ready`` payload, and disconnect ``frame-ready``
+        receiver once frame has been read.  Add ``views`` keyword argument.
+    '''
+    with FrameSubscription(signals, views=views) as subscription:
+        response = yield asyncio.From(subscription.get())
     raise asyncio.Return(response)
 
 
 @asyncio.coroutine
-def show_chip(signals, title='DMF chip'):
+def show_chip(signals, title='DMF chip', max_fps=30., idle_interval=.25):
     '''
     Display raw webcam view and corresponding perspective-corrected chip view.
 
     Press ``q`` key to close window.
 
+    The window is only redrawn when a new frame is available, at most
+    ``max_fps`` times per second.  While no frames arrive, window events are
+    processed every ``idle_interval`` seconds.
+
     Parameters
     ----------
     signals : blinker.Namespace
         DMF chip webcam monitor signals (see
         :func:`dropbot_chip_qc.video.chip_video_process()`).
+
+        A ``frame-displayed`` signal is sent after each redraw, with the
+        keyword arguments ``frame_index`` and ``lag`` (time from frame capture
+        until display, in seconds).
     title : str, optional
         Window title.
+    max_fps : float, optional
+        Maximum redraw rate (frames per second).  Set to ``None`` to redraw
+        every frame.
+    idle_interval : float, optional
+        Time between processing window events while no frames arrive (in
+        seconds).
+
+    Returns
+    -------
+    dict
+        Display lag summary: ``count``, ``mean``, ``p50``, ``p95``, ``p99``,
+        and ``max`` (in seconds).
 
     See also
     --------
     dropbot_chip_qc.video.chip_video_process()
+
+
+    .. versionchanged:: 0.13.0
+        Wait for new frames instead of polling every 10 ms, cap redraw rate,
+        and report display lag.  Add ``max_fps`` and ``idle_interval`` keyword
+        arguments.
     '''
     print('Press "q" to quit')
 
-    loop = asyncio.get_event_loop()
-    frame_ready = asyncio.Event()
+    min_interval = 1. / max_fps if max_fps else 0
+    last_draw = 0
+    lag_histogram = TimingHistogram()
 
-    def on_frame_ready(sender, **message):
-        frame_ready.record = message
-        loop.call_soon_threadsafe(frame_ready.set)
+    with FrameSubscription(signals, policy='latest',
+                           views=('frame', )) as subscription:
+        while True:
+            try:
+                message = yield asyncio.From(asyncio
+                                             .wait_for(subscription.get(),
+                                                       idle_interval))
+            except asyncio.TimeoutError:
+                message = None
 
-    signals.signal('frame-ready').connect(on_frame_ready)
+            if message is not None and message.get('frame') is not None:
+                delay = last_draw + min_interval - time.time()
+                if delay > 0:
+                    # Cap redraw rate; display newest frame after delay.
+                    yield asyncio.From(asyncio.sleep(delay))
+                    message = subscription.get_nowait() or message
+                cv2.imshow(title, message['frame'])
+                last_draw = time.time()
+                if message.get('timestamp') is not None:
+                    lag = last_draw - message['timestamp']
+                    lag_histogram.add(lag)
+                    signals.signal('frame-displayed')\
+                        .send('show_chip', frame_index=message
+                              .get('frame_index'), lag=lag)
 
-    while True:
-        try:
-            yield asyncio.wait_for(frame_ready.wait(), .01)
-            cv2.imshow(title, frame_ready.record['frame'])
+            # Process window events.
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
-        except asyncio.TimeoutError:
-            continue
+
+    summary = lag_histogram.summary()
+    logging.info('display lag: p50=%.3fs, p95=%.3fs, p99=%.3fs',
+                 summary['p50'], summary['p95'], summary['p99'])
+    raise asyncio.Return(summary)
@@ -0,0 +1,218 @@
+# -*- encoding: utf-8 -*-
+'''
+Compare decode latency and hit rate of QR code decoders.
+
+The corpus is either a directory of chip images (files named
+``<chip UUID>.<ext>`` are checked against the UUID; other images count as a
+hit if any symbol is decoded), or a generated corpus of synthetic chip
+labels rendered with random position, size, rotation, perspective, blur, and
+noise.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import argparse
+import glob
+import logging
+import os
+import sys
+import timeit
+import uuid
+
+import cv2
+import numpy as np
+import pandas as pd
+import qrcode
+
+from ..qr import DECODERS, decode_adaptive, get_decoder
+
+
+def synthetic_corpus(count=20, size=(1280, 720), seed=0):
+    '''
+    Generate synthetic frames, each containing a single QR code chip label.
+
+    Parameters
+    ----------
+    count : int, optional
+        Number of frames.
+    size : tuple(int, int), optional
+        ``(width, height)`` of each frame.
+    seed : int, optional
+        Random seed.
+
+    Returns
+    -------
+    list[tuple(numpy.ndarray, str)]
+        Grayscale frames and corresponding encoded UUIDs.
+    '''
+    random = np.random.RandomState(seed)
+    width, height = size
+    corpus = []
+    for i in range(count):
+        uuid_i = str(uuid.UUID(bytes=random.bytes(16), version=4))
+        qr = qrcode.QRCode(border=4, box_size=8)
+        qr.add_data(uuid_i)
+        label = np.array(qr.make_image().convert('L'))
+
+        # Random label size, position, rotation, and perspective skew.
+        side = random.uniform(.1, .35) * min(size)
+        center = random.uniform(side, [width - side, height - side])
+        angle = random.uniform(0, 2 * np.pi)
+        corners = np.array([[-1, -1], [1, -1], [1, 1], [-1, 1]]) * side / 2
+        rotation = np.array([[np.cos(angle), -np.sin(angle)],
+                             [np.sin(angle), np.cos(angle)]])
+        corners = (corners.dot(rotation.T) + center +
+                   random.normal(scale=.05 * side, size=(4, 2)))
+        label_corners = np.array([[0, 0], [1, 0], [1, 1], [0, 1]]) * \
+            label.shape[::-1]
+        M = cv2.getPerspectiveTransform(label_corners.astype('float32'),
+                                        corners.astype('float32'))
+        background = random.randint(60, 200)
+        frame = cv2.warpPerspective(label, M, size,
+                                    borderMode=cv2.BORDER_CONSTANT,
+                                    borderValue=background)
+
+        blur = 2 * random.randint(0, 3) + 1
+        frame = cv2.GaussianBlur(frame, (blur, blur), 0)
+        noise = random.normal(scale=random.uniform(0, 12), size=frame.shape)
+        frame = np.clip(frame + noise, 0, 255).astype('uint8')
+        corpus.append((frame, uuid_i))
+    return corpus
+
+
+def load_corpus(path, pattern='*.png'):
+    '''
+    Parameters
+    ----------
+    path : str
+        Directory of images, or path to a single image.
+    pattern : str, optional
+        Glob pattern of images within directory.
+
+    Returns
+    -------
+    list[tuple(numpy.ndarray, str)]
+        Grayscale images and expected UUIDs (``None`` if image name is not a
+        UUID).
+    '''
+    paths = (sorted(glob.glob(os.path.join(path, pattern)))
+             if os.path.isdir(path) else [path])
+    corpus = []
+    for path_i in paths:
+        image = cv2.imread(path_i, cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            logging.warning('Error reading image: `%s`', path_i)
+            continue
+        name = os.path.splitext(os.path.basename(path_i))[0]
+        try:
+            expected = str(uuid.UUID(name))
+        except ValueError:
+            expected = None
+        corpus.append((image, expected))
+    return corpus
+
+
+def benchmark_decoders(corpus, decoders=None, scale=.5, repeat=1):
+    '''
+    Decode each image of a corpus with each decoder, using the same adaptive
+    strategy as the video pipeline (see
+    :func:`dropbot_chip_qc.qr.decode_adaptive`).
+
+    Parameters
+    ----------
+    corpus : list[tuple(numpy.ndarray, str)]
+        Grayscale images and expected UUIDs (``None`` to accept any decoded
+        symbol).
+    decoders : list[str or function], optional
+        Decoders to compare (default: all of
+        :data:`dropbot_chip_qc.qr.DECODERS`).
+    scale : float, optional
+        Scale factor applied to images before first decode attempt.
+    repeat : int, optional
+        Number of times to decode each image (minimum duration is used).
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per decoder, with the columns ``images``, ``hits``,
+        ``hit_rate``, and ``mean``, ``p50``, ``p95``, and ``max`` decode
+        duration (in seconds).
+    '''
+    if decoders is None:
+        decoders = list(DECODERS)
+    rows = []
+    for decoder in decoders:
+        decode = get_decoder(decoder)
+        durations = []
+        hits = 0
+        for image, expected in corpus:
+            small = (cv2.resize(image, None, fx=scale, fy=scale,
+                                interpolation=cv2.INTER_AREA)
+                     if scale < 1 else image)
+            duration = None
+            for i in range(repeat):
+                start = timeit.default_timer()
+                decoded_objects = decode_adaptive(image, small, min(scale, 1),
+                                                  decode=decode)
+                duration_i = timeit.default_timer() - start
+                duration = (duration_i if duration is None
+                            else min(duration, duration_i))
+            durations.append(duration)
+            data = [d.data.decode('utf8') for d in decoded_objects]
+            if (data and expected is None) or expected in data:
+                hits += 1
+        durations = np.array(durations)
+        rows.append({'decoder': getattr(decoder, '__name__', decoder),
+                     'images': len(corpus), 'hits': hits,
+                     'hit_rate': hits / len(corpus) if corpus else np.nan,
+                     'mean': durations.mean() if corpus else np.nan,
+                     'p50': np.percentile(durations, 50) if corpus else np.nan,
+                     'p95': np.percentile(durations, 95) if corpus else np.nan,
+                     'max': durations.max() if corpus else np.nan})
+    return pd.DataFrame(rows, columns=['decoder', 'images', 'hits',
+                                       'hit_rate', 'mean', 'p50', 'p95',
+                                       'max']).set_index('decoder')
+
+
+def parse_args(args=None):
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description='Compare QR code decoders.')
+    parser.add_argument('corpus', nargs='*', help='Image files and/or '
+                        'directories of images (default: synthetic corpus).')
+    parser.add_argument('-d', '--decoder', action='append',
+                        choices=list(DECODERS), help='Decoder to compare '
+                        '(default: all).')
+    parser.add_argument('--pattern', default='*.png', help='Glob pattern of '
+                        'images within directories (default=%(default)s).')
+    parser.add_argument('--scale', type=float, default=.5, help='Scale '
+                        'factor of first decode attempt '
+                        '(default=%(default)s).')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of '
+                        'times to decode each image (default=%(default)s).')
+    parser.add_argument('--synthetic', type=int, default=50, help='Number of '
+                        'synthetic images, if no corpus is specified '
+                        '(default=%(default)s).')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of '
+                        'synthetic corpus (default=%(default)s).')
+    return parser.parse_args(args)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO,
+                        format="[%(asctime)s] %(levelname)s: %(message)s")
+    args = parse_args()
+    if args.corpus:
+        corpus = [item for path in args.corpus
+                  for item in load_corpus(path, pattern=args.pattern)]
+    else:
+        corpus = synthetic_corpus(args.synthetic, seed=args.seed)
+    results = benchmark_decoders(corpus, decoders=args.decoder,
+                                 scale=args.scale, repeat=args.repeat)
+    print(results.to_string(float_format=lambda x: '%.4f' % x))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# -*- encoding: utf-8 -*-
+'''
+Compare actuation step count of a test route with a minimum-move route
+visiting the same channels.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import argparse
+import io
+import json
+import logging
+import pkgutil
+import sys
+
+from ..connect import get_channels_graph, load_device
+from ..paths import PathOracle
+from ..route import load_test_routes, optimize_route, route_steps, walk
+
+
+def parse_args(args=None):
+    if args is None:
+        args = sys.argv[1:]
+    DEFAULT_DEVICE_NAME = 'SCI-BOTS 90-pin array'
+    DEFAULT_DEVICE_SOURCE = \
+        pkgutil.get_data('dropbot', 'static/SCI-BOTS 90-pin array/device.svg')
+
+    parser = argparse.ArgumentParser(description='Optimize DropBot chip test '
+                                     'route.')
+    parser.add_argument('-S', '--svg-path',
+                        default=io.BytesIO(DEFAULT_DEVICE_SOURCE),
+                        help="SVG device file (default='%s')" %
+                        DEFAULT_DEVICE_NAME)
+    parser.add_argument('test_route', nargs='*', help='Test route as either '
+                        'id of <dmf:TestRoute> in SVG or JSON list of channel '
+                        'numbers (default: all test routes in SVG).')
+    parser.add_argument('-b', '--budget', type=float, default=1.,
+                        help='Optimization time budget per route, in seconds '
+                        '(default=%(default)s).')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed '
+                        '(default=%(default)s).')
+    return parser.parse_args(args)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO,
+                        format="[%(asctime)s] %(levelname)s: %(message)s")
+    args = parse_args()
+    test_routes = load_test_routes(args.svg_path)
+    chip_info, electrodes_graph, neighbours = load_device(args.svg_path)
+    paths = PathOracle(get_channels_graph(chip_info, electrodes_graph))
+
+    for route_id in args.test_route or list(test_routes):
+        if route_id in test_routes:
+            way_points = test_routes[route_id]
+        else:
+            way_points = json.loads(route_id)
+        steps = route_steps(paths, way_points)
+        optimized = optimize_route(paths, walk(paths, way_points),
+                                   time_budget=args.budget, seed=args.seed)
+        optimized_steps = route_steps(paths, optimized)
+        print('%s: %d steps (hand route), %d steps (optimized, %.0f%%)' %
+              (route_id, steps, optimized_steps,
+               100. * optimized_steps / steps if steps else 100.))
+        print('  optimized waypoints: `%s`' % json.dumps(optimized))
+
+
+if __name__ == '__main__':
+    main()
@@ -18,16 +18,20 @@ import blinker
 import dmf_chip as dc
 import dropbot as db
 import dropbot.self_test
-import lxml.etree
 import mutagen
 import networkx as nx
 import path_helpers as ph
 import trollius as asyncio
 
 from ..connect import connect
+from ..history import FrameHistory
+from ..occupancy import ElectrodeOccupancy
 from ..render import render_summary
+from ..retry import RETRY_POLICIES, retry_policy
+from ..route import load_test_routes, optimize_route, route_steps, walk
 from ..video import chip_video_process, show_chip
 from ..single_drop import _run_test as _single_run_test
+from ..vision import VisionTransfer
 try:
     from ..multi_sensing import _run_test as _multi_run_test
     MULTI_SENSING_ENABLED = True
@@ -62,7 +66,10 @@ def question(text, title='Question', flags=QMessageBox.StandardButton.Yes |
 def run_test(way_points, start_electrode, output_dir, video_dir=None,
              overwrite=False, svg_source=None, launch=False,
              resolution=(1280, 720), device_id=0, multi_sensing=False,
-             voltage=115):
+             voltage=115, video_source=None, record=False, decode_scale=1,
+             qr_decoder='pyzbar', vision=False, vision_region=None,
+             clip_padding=1., route_budget=None, edge_coverage=False,
+             retry=None):
     '''
     Parameters
     ----------
@@ -100,6 +107,46 @@ def run_test(way_points, start_electrode, output_dir, video_dir=None,
     multi_sensing : bool, optional
         If `True`, run multi-sensing test.  Otherwise, run single-drop test
         (default: `False`).
+    video_source : str, optional
+        Recorded video file or directory of images to use instead of video
+        device ``device_id``.
+    record : bool, optional
+        If ``True``, record perspective-corrected video of each detected chip
+        directly to ``<output_dir>/<uuid>.mp4`` (``video_dir`` is ignored).
+    decode_scale : int, optional
+        Decode MJPEG frames from video device at ``1 / decode_scale``
+        resolution (see :func:`dropbot_chip_qc.video.chip_video_process`).
+    qr_decoder : str, optional
+        QR code decoder, ``'pyzbar'`` or ``'opencv'``.
+    vision : bool, optional
+        If ``True``, complete each single-drop move as soon as the camera
+        shows the target electrode covered, and fail attempts early if the
+        camera shows no liquid movement (see
+        :class:`dropbot_chip_qc.vision.VisionTransfer`).
+    vision_region : tuple(float, float, float, float), optional
+        ``(x0, y0, x1, y1)`` bounding box of electrodes in the
+        perspective-corrected chip view, normalized to frame size (see
+        :class:`dropbot_chip_qc.occupancy.ElectrodeOccupancy`).  Required if
+        ``vision`` is ``True``.
+    clip_padding : float, optional
+        Embed video clips of each failed electrode move in the test report,
+        from ``clip_padding`` seconds before the move attempt started until
+        ``clip_padding`` seconds after it failed (see
+        :class:`dropbot_chip_qc.history.FrameHistory`).  Set to ``0`` to
+        disable clips.
+    route_budget : float, optional
+        If set, replace test route by a minimum-move route visiting the same
+        channels, optimized for up to ``route_budget`` seconds (see
+        :func:`dropbot_chip_qc.route.optimize_route`), if it requires fewer
+        actuation steps.
+    edge_coverage : bool, optional
+        If ``True``, run single-drop test over every connection between
+        channels, starting at ``start_electrode``, instead of the test route
+        (see :func:`dropbot_chip_qc.route.edge_coverage_route`).
+    retry : dropbot_chip_qc.retry.RetryPolicy, optional
+        Number of attempts, timeout of each attempt, and delay between
+        attempts of each electrode move (see
+        :func:`dropbot_chip_qc.retry.retry_policy`).
 
 
     .. versionchanged:: 0.2
@@ -128,6 +175,10 @@ def run_test(way_points, start_electrode, output_dir, video_dir=None,
         Add ``voltage`` keyword argument (actuation RMS voltage).
     .. versionchanged:: 0.11.1
         Remove shorted channels from adjacent channels graph.
+    .. versionchanged:: 0.13.0
+        Add ``video_source``, ``record``, ``decode_scale``, ``qr_decoder``,
+        ``vision``, ``vision_region``, ``clip_padding``, ``route_budget``,
+        ``edge_coverage``, and ``retry`` keyword arguments.
     '''
     output_dir = ph.path(output_dir)
 
@@ -150,6 +201,24 @@ def run_test(way_points, start_electrode, output_dir, video_dir=None,
     G = proxy.channels_graph
     proxy.voltage = voltage
 
+    if route_budget is not None:
+        steps = route_steps(G, way_points)
+        optimized = optimize_route(G, walk(G, way_points),
+                                   start=start_electrode,
+                                   time_budget=route_budget)
+        optimized_steps = route_steps(G, optimized)
+        print('test route steps: %d (optimized: %d)' % (steps,
+                                                         optimized_steps))
+        if optimized_steps < steps:
+            logging.info('use optimized test route: `%s`', optimized)
+            way_points = optimized
+
+    # Per-electrode occupancy statistics for camera-based move criterion.
+    occupancy = (ElectrodeOccupancy(proxy.chip_info, region=vision_region)
+                 if vision else None)
+    # Compressed frame history for clips of failed electrode moves.
+    history = FrameHistory() if clip_padding > 0 else None
+
     def update_video(video, uuid):
         response = question('Attempt to set UUID in title of video file, '
                             '`%s`?' % video, title='Update video?')
@@ -180,6 +249,21 @@ def run_test(way_points, start_electrode, output_dir, video_dir=None,
                 ph.path(video).move(output_path)
                 logging.info('moved video to : `%s`', output_path)
 
+    def record_path(uuid, view):
+        # Substitute UUID into output directory path as necessary.
+        path_subs_dict = {'uuid': uuid}
+        path_subs_dict.update(_date_subs_dict())
+        output_dir_ = ph.path(output_dir % path_subs_dict).expand().realpath()
+        output_dir_.makedirs_p()
+        name = uuid if view == 'warped' else '%s-%s' % (uuid, view)
+        output_path = output_dir_.joinpath('%s.mp4' % name)
+        if output_path.exists() and not overwrite:
+            # Do not block video processing thread to ask before overwriting.
+            output_path = output_dir_.joinpath('%s-%s.mp4' %
+                                               (name, dt.datetime.utcnow()
+                                                .strftime('%Y%m%dT%H%M%S')))
+        return output_path
+
     def on_chip_detected(sender, **kwargs):
         @ft.wraps(on_chip_detected)
         def wrapped(sender, **kwargs):
@@ -239,6 +323,20 @@ def run_test(way_points, start_electrode, output_dir, video_dir=None,
                 else:
                     # Use single-drop test implementation.
                     _run_test = _single_run_test
+                    if occupancy is not None:
+                        vision_ = VisionTransfer(signals, occupancy)
+                        # Reference frame of chip before liquid is loaded.
+                        reference_set = yield asyncio\
+                            .From(vision_.set_reference())
+                        if not reference_set:
+                            logging.warning('No occupancy reference frame; '
+                                            'camera transfer progress is '
+                                            'estimated from intensity.')
+                        _run_test = ft.partial(_run_test, vision=vision_)
+                    if edge_coverage:
+                        _run_test = ft.partial(_run_test, cover_edges=True)
+                if retry is not None:
+                    _run_test = ft.partial(_run_test, retry=retry)
 
                 loggers = {e: ft.partial(lambda event, sender, **kwargs:
                                          log_route_event(event, kwargs), e)
@@ -248,6 +346,31 @@ def run_test(way_points, start_electrode, output_dir, video_dir=None,
                 for event, logger in loggers.items():
                     signals.signal(event).connect(logger)
 
+                # Extract video clip of each failed electrode move, once
+                # frames following the failure have been captured.
+                clips = []
+                clip_timers = []
+
+                def on_move_failed(event, sender, **kwargs):
+                    def extract_clip():
+                        frames = history.clip(kwargs['start'] - clip_padding,
+                                              kwargs['end'] + clip_padding)
+                        clips.append({'event': event, 'frames': frames,
+                                      'source': kwargs['source'],
+                                      'target': kwargs['target'],
+                                      'attempt': kwargs['attempt']})
+                    timer = threading.Timer(clip_padding, extract_clip)
+                    timer.daemon = True
+                    timer.start()
+                    clip_timers.append(timer)
+
+                if history is not None:
+                    clip_loggers = {e: ft.partial(on_move_failed, e)
+                                    for e in ('electrode-attempt-fail',
+                                              'electrode-fail')}
+                    for event, logger in clip_loggers.items():
+                        signals.signal(event).connect(logger)
+
                 # Explicitly execute a shorts detection test.
                 for shorted_channel in proxy.detect_shorts():
                     if shorted_channel in G:
@@ -259,7 +382,7 @@ def run_test(way_points, start_electrode, output_dir, video_dir=None,
                     start = time.time()
                     yield asyncio.From(_run_test(signals, proxy, G, way_points,
                                                  start=start_electrode))
-                    if video_dir:
+                    if video_dir and not record:
                         # A video directory was provided.  Look for a video
                         # corresponding to the same timeline as the test.
                         # Only consider videos that were created within 1
@@ -274,6 +397,8 @@ def run_test(way_points, start_electrode, output_dir, video_dir=None,
                 except nx.NetworkXNoPath as exception:
                     logging.error('QC test failed: `%s`', exception,
                                   exc_info=True)
+                for timer in clip_timers:
+                    timer.join()
 
                 def write_results():
                     # Substitute UUID into output directory path as necessary.
@@ -292,7 +417,7 @@ def run_test(way_points, start_electrode, output_dir, video_dir=None,
                                      output_path, title='Overwrite?') ==
                              QMessageBox.StandardButton.Yes):
                         render_summary(dropbot_events, output_path,
-                                       svg_source=svg_source)
+                                       svg_source=svg_source, clips=clips)
                         logging.info('wrote events log to: `%s`', output_path)
                         if launch:
                             # Launch result using default system viewer.
@@ -313,7 +438,15 @@ def run_test(way_points, start_electrode, output_dir, video_dir=None,
 
     thread = threading.Thread(target=chip_video_process,
                               args=(signals, resolution[0], resolution[1],
-                                    device_id))
+                                    device_id),
+                              kwargs={'source': video_source,
+                                      'realtime': True,
+                                      'record_path': (record_path if record
+                                                      else None),
+                                      'decode_scale': decode_scale,
+                                      'qr_decoder': qr_decoder,
+                                      'occupancy': occupancy,
+                                      'history': history})
     thread.start()
 
     # Launch window to view chip video.
@@ -322,6 +455,8 @@ def run_test(way_points, start_electrode, output_dir, video_dir=None,
     # Close background thread.
     signals.signal('exit-request').send('main')
     closed.wait()
+    if history is not None:
+        history.close()
 
 
 def parse_args(args=None):
@@ -340,6 +475,10 @@ def parse_args(args=None):
     .. versionchanged:: 0.11.2
         Remove ``-V`` short-form of ``voltage`` argument, since it conflicts
         with video device arg.
+    .. versionchanged:: 0.13.0
+        Add ``record``, ``vision``, ``vision-region``, ``clip-padding``,
+        ``optimize-route``, ``edge-coverage``, ``retry``, ``attempts``,
+        ``move-timeout``, and ``retry-delay`` arguments.
     '''
     if args is None:
         args = sys.argv[1:]
@@ -354,6 +493,9 @@ def parse_args(args=None):
                         "(default='%(default)s').")
     parser.add_argument('--video-dir', type=ph.path, help='Directory to search'
                         ' for recorded videos matching start time of test.')
+    parser.add_argument('--record', action='store_true', help='Record '
+                        'perspective-corrected chip video to output directory '
+                        '(named by chip UUID).')
     parser.add_argument('-s', '--start', type=int, help='Start electrode')
     parser.add_argument('--launch', action='store_true', help='Launch output '
                         'path after creation.')
@@ -372,34 +514,61 @@ def parse_args(args=None):
                         default='default')
     parser.add_argument('--voltage', type=float, help='Actuation RMS voltage '
                         '(default=%(default)s)', default=100)
+    parser.add_argument('--vision', action='store_true', help='Complete '
+                        'single-drop moves as soon as the camera shows the '
+                        'target electrode covered (requires '
+                        '`--vision-region`).')
+    parser.add_argument('--vision-region', type=float, nargs=4,
+                        metavar=('X0', 'Y0', 'X1', 'Y1'), help='Bounding box '
+                        'of electrodes in the perspective-corrected chip '
+                        'view, as fractions of the view width and height.')
+    parser.add_argument('--optimize-route', type=float, metavar='SECONDS',
+                        nargs='?', const=1., dest='route_budget',
+                        help='Replace test route by a minimum-move route '
+                        'visiting the same channels, optimized for up to '
+                        'SECONDS (default=%(const)s).')
+    parser.add_argument('--edge-coverage', action='store_true',
+                        help='Single-drop test moving liquid across every '
+                        'connection between channels, starting at the start '
+                        'electrode, instead of following the test route.')
+    parser.add_argument('--retry', choices=list(RETRY_POLICIES),
+                        default='fixed', help='Retry policy of failed '
+                        'electrode moves: same delay between attempts '
+                        '(fixed), doubling delay (exponential), or attempt '
+                        'timeout adapted to durations of successful moves '
+                        '(adaptive) (default=%(default)s).')
+    parser.add_argument('--attempts', type=int, help='Maximum attempts per '
+                        'electrode move (default=3).')
+    parser.add_argument('--move-timeout', type=float, help='Maximum duration '
+                        'of each electrode move attempt, in seconds '
+                        '(default=4).')
+    parser.add_argument('--retry-delay', type=float, help='Delay after a '
+                        'failed attempt, in seconds (default: 1 for fixed, '
+                        'otherwise 0.25).')
+    parser.add_argument('--clip-padding', type=float, default=1.,
+                        help='Seconds of video before and after each failed '
+                        'electrode move to include in report; 0 to disable '
+                        '(default=%(default)s).')
 
     args = parser.parse_args(args)
 
+    if args.vision and args.vision_region is None:
+        parser.error('`--vision` requires `--vision-region`.')
+    try:
+        args.retry = retry_policy(args.retry, attempts=args.attempts,
+                                  timeout=args.move_timeout,
+                                  delay=args.retry_delay)
+    except ValueError as exception:
+        parser.error(str(exception))
+
     args.resolution = tuple(map(int, args.resolution.split('x')))
     try:
         args.way_points = json.loads(args.test_route)
     except ValueError:
         # Assume test route arg specifies id of test route in SVG.
-        try:
-            doc = lxml.etree.parse(args.svg_path)
-        finally:
-            if isinstance(args.svg_path, io.BytesIO):
-                # "Rewind" file after parsing to pass to remaining code.
-                args.svg_path.seek(0)
-        root = doc.getroot()
-        NSMAP = {k: v for k, v in root.nsmap.items() if k is not None}
-        rxpath = ft.wraps(root.xpath)(ft.partial(root.xpath, namespaces=NSMAP))
-        # Read test routes.
-        test_route_elements = \
-            rxpath('//dmf:ChipDesign/dmf:TestRoutes/dmf:TestRoute[@id!=""]')
-        for route in test_route_elements:
-            xpath_ = ft.wraps(route.xpath)(ft.partial(route.xpath,
-                                                      namespaces=NSMAP))
-            route_ = dict(route.attrib.items())
-            if route_.get('id') == args.test_route:
-                # Test route matches specified route id.  Extract waypoints.
-                args.way_points = [int(w.text) for w in xpath_('dmf:Waypoint')]
-                break
+        test_routes = load_test_routes(args.svg_path)
+        if args.test_route in test_routes:
+            args.way_points = test_routes[args.test_route]
         else:
             parser.error('No test route with `id=%s` found in chip file.' %
                          args.test_route)
@@ -425,7 +594,12 @@ def main():
              overwrite=args.force, svg_source=args.svg_path,
              launch=args.launch, device_id=args.video_device,
              resolution=args.resolution, multi_sensing=args.multi_sensing,
-             voltage=args.voltage)
+             voltage=args.voltage, video_source=args.video_source,
+             record=args.record, decode_scale=args.decode_scale,
+             qr_decoder=args.qr_decoder, vision=args.vision,
+             vision_region=args.vision_region,
+             clip_padding=args.clip_padding, route_budget=args.route_budget,
+             edge_coverage=args.edge_coverage, retry=args.retry)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,77 @@
+# -*- encoding: utf-8 -*-
+'''
+Register a tray of chips by scanning their QR code labels.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import argparse
+import datetime as dt
+import logging
+import sys
+import threading
+
+import blinker
+
+from ..async import asyncio, show_chip
+from ..tray import TrayRegistry, tray_scan_process
+from .video import VIDEO_PARSER
+
+
+def parse_args(args=None):
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description='Register a tray of DropBot '
+                                     'chips from their QR code labels.',
+                                     parents=[VIDEO_PARSER])
+    parser.add_argument('-o', '--output', help='Output CSV file (default: '
+                        '`tray-<timestamp>.csv`).')
+    parser.add_argument('--min-detections', type=int, default=2,
+                        help='Number of frames a chip must be decoded in '
+                        'before it is registered (default=%(default)s).')
+    parser.add_argument('--qr-scale', type=float, default=.5, help='Scale '
+                        'factor of first decode attempt '
+                        '(default=%(default)s).')
+
+    args = parser.parse_args(args)
+    args.resolution = tuple(map(int, args.resolution.split('x')))
+    if args.output is None:
+        args.output = dt.datetime.now().strftime('tray-%Y%m%dT%H%M%S.csv')
+    return args
+
+
+def main():
+    logging.basicConfig(level=logging.INFO,
+                        format="[%(asctime)s] %(levelname)s: %(message)s")
+    args = parse_args()
+
+    signals = blinker.Namespace()
+    registry = TrayRegistry(min_detections=args.min_detections)
+    thread = threading.Thread(target=tray_scan_process,
+                              args=(signals, args.resolution[0],
+                                    args.resolution[1], args.video_device),
+                              kwargs={'source': args.video_source,
+                                      'realtime': True,
+                                      'scale': args.qr_scale,
+                                      'decoder': args.qr_decoder,
+                                      'registry': registry})
+    thread.start()
+
+    # Launch window to view tray; press "q" once all chips are registered.
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(show_chip(signals, title='Chip tray'))
+
+    signals.signal('exit-request').send('main')
+    thread.join()
+
+    registrations = registry.registrations()
+    registrations.to_csv(args.output, index=False)
+    print(registrations.to_string(index=False))
+    logging.info('wrote %d chip registration(s) to: `%s`',
+                 len(registrations), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,7 @@ import argparse
 import logging
 import sys
 
+from ..qr import DECODERS
 from ..video import main
 
 VIDEO_PARSER = argparse.ArgumentParser(add_help=False)
@@ -12,6 +13,16 @@ VIDEO_PARSER.add_argument('-r', '--resolution', help='Video capture resolution'
                           ' (default=%(default)s).', nargs='?',
                           choices=['1920x1080', '1280x720', '640x480'],
                           default='1280x720')
+VIDEO_PARSER.add_argument('--video-source', help='Recorded video file or '
+                          'directory of images to use instead of video '
+                          'device.')
+VIDEO_PARSER.add_argument('--decode-scale', help='Decode MJPEG frames from '
+                          'video device at 1/N resolution '
+                          '(default=%(default)s).', type=int,
+                          choices=[1, 2, 4, 8], default=1)
+VIDEO_PARSER.add_argument('--qr-decoder', help='QR code decoder '
+                          '(default=%(default)s).', choices=list(DECODERS),
+                          default='pyzbar')
 
 
 def parse_args(args=None):
@@ -31,4 +42,6 @@ if __name__ == '__main__':
     logging.basicConfig(level=logging.DEBUG,
                         format="[%(asctime)s] %(levelname)s: %(message)s")
 
-    main(resolution=args.resolution, device_id=args.video_device)
+    main(resolution=args.resolution, device_id=args.video_device,
+         source=args.video_source, decode_scale=args.decode_scale,
+         qr_decoder=args.qr_decoder)
@@ -0,0 +1,675 @@
+# -*- encoding: utf-8 -*-
+'''
+Video frame sources, and background capture into a bounded ring buffer of
+preallocated frames.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import glob
+import logging
+import os
+import threading
+import time
+import timeit
+
+import cv2
+import numpy as np
+
+
+#: :func:`cv2.imdecode` flag to decode a colour JPEG at each reduced scale.
+REDUCED_COLOR_FLAGS = {1: cv2.IMREAD_COLOR,
+                       2: cv2.IMREAD_REDUCED_COLOR_2,
+                       4: cv2.IMREAD_REDUCED_COLOR_4,
+                       8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def is_jpeg(buffer_):
+    '''
+    Returns
+    -------
+    bool
+        ``True`` if ``buffer_`` is an encoded JPEG image (i.e., starts with a
+        JPEG start-of-image marker).
+    '''
+    data = buffer_.ravel()[:2]
+    return (buffer_.dtype == np.uint8 and data.size == 2 and
+            data[0] == 0xFF and data[1] == 0xD8)
+
+
+class FrameSource(object):
+    '''
+    Base class for video frame sources.
+
+    Sources implement the subset of the :class:`cv2.VideoCapture` interface
+    used by :class:`CaptureThread`, i.e., :meth:`read`, :meth:`isOpened`,
+    and :meth:`release`.
+
+    Parameters
+    ----------
+    realtime : bool, optional
+        If ``True``, :meth:`read` blocks as necessary to replay frames at their
+        recorded timing.  Otherwise, frames are returned as fast as possible.
+    '''
+    def __init__(self, realtime=False):
+        self.realtime = realtime
+        self._start = None
+
+    def _pace(self, timestamp):
+        '''
+        Wait until ``timestamp`` seconds have elapsed since the first frame
+        (if replaying in real time).
+        '''
+        if not self.realtime:
+            return
+        now = time.time()
+        if self._start is None:
+            self._start = now - timestamp
+        delay = self._start + timestamp - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def _next_frame(self):
+        '''
+        Returns
+        -------
+        tuple(numpy.ndarray, float) or None
+            Next frame and its timestamp in seconds relative to the start of
+            the source, or ``None`` if there are no more frames.
+        '''
+        raise NotImplementedError
+
+    def read(self, image=None):
+        '''
+        Parameters
+        ----------
+        image : numpy.ndarray, optional
+            Array to write frame into (if it has matching shape and type).
+
+        Returns
+        -------
+        tuple(bool, numpy.ndarray)
+            Whether a frame was read, and the frame.
+        '''
+        result = self._next_frame()
+        if result is None:
+            return False, None
+        frame, timestamp = result
+        self._pace(timestamp)
+        if (image is not None and image.shape == frame.shape and
+                image.dtype == frame.dtype):
+            image[:] = frame
+            frame = image
+        return True, frame
+
+    def isOpened(self):
+        return True
+
+    def release(self):
+        pass
+
+
+class DeviceSource(FrameSource):
+    '''
+    Live video capture device (e.g., webcam).
+
+    Parameters
+    ----------
+    device_id : int
+        OpenCV video source id (starts at zero).
+    width : int, optional
+        Requested video width.
+    height : int, optional
+        Requested video height.
+    decode_scale : int, optional
+        Decode MJPEG frames at ``1 / decode_scale`` of the device resolution;
+        one of 1, 2, 4, or 8.  JPEG decoding at reduced scale skips most of
+        the decode work (see :data:`cv2.IMREAD_REDUCED_COLOR_2`).  The
+        compressed frame is kept (see :attr:`encoded`) so full resolution can
+        still be decoded where needed, e.g., for QR codes.
+
+        If the capture backend does not provide compressed frames, frames
+        are decoded at full resolution and downscaled instead.
+
+    Attributes
+    ----------
+    encoded : numpy.ndarray or None
+        Compressed MJPEG buffer of most recently read frame, if
+        ``decode_scale`` is greater than 1 and the capture backend provides
+        compressed frames.
+    '''
+    def __init__(self, device_id=0, width=None, height=None, decode_scale=1):
+        super(DeviceSource, self).__init__()
+        if decode_scale not in REDUCED_COLOR_FLAGS:
+            raise ValueError('`decode_scale` must be one of: %s' %
+                             sorted(REDUCED_COLOR_FLAGS))
+        self.decode_scale = decode_scale
+        self.encoded = None
+        self.capture = cv2.VideoCapture(device_id)
+
+        # Set format to MJPG (instead of YUY2) to _dramatically_ improve frame
+        # rate.  For example, using Logitech C920 camera, frame rate increases
+        # from 10 FPS to 30 FPS (not including QR code detection, warping,
+        # etc.).
+        #
+        # See: https://github.com/opencv/opencv/issues/9084#issuecomment-324477425
+        fourcc_int = np.fromstring(bytes('MJPG'),
+                                   dtype='uint8').view('uint32')[0]
+        self.capture.set(cv2.CAP_PROP_FOURCC, fourcc_int)
+
+        self.capture.set(cv2.CAP_PROP_AUTOFOCUS, True)
+        if width is not None:
+            self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height is not None:
+            self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if decode_scale > 1:
+            # Request compressed MJPEG buffers instead of decoded frames.
+            self.capture.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        self._fallback_logged = False
+
+    def read(self, image=None):
+        if self.decode_scale == 1:
+            return self.capture.read(image)
+        frame_captured, buffer_ = self.capture.read()
+        if not frame_captured:
+            return frame_captured, buffer_
+        if is_jpeg(buffer_):
+            self.encoded = buffer_
+            frame = cv2.imdecode(buffer_, REDUCED_COLOR_FLAGS
+                                 [self.decode_scale])
+            if frame is None:
+                return False, None
+        else:
+            # Backend ignored `CAP_PROP_CONVERT_RGB`; frame is already
+            # decoded at full resolution.
+            if not self._fallback_logged:
+                logging.warning('Capture backend does not provide MJPEG '
+                                'buffers; downscaling decoded frames.')
+                self._fallback_logged = True
+            self.encoded = None
+            height, width = buffer_.shape[:2]
+            size = (width // self.decode_scale, height // self.decode_scale)
+            if (image is not None and image.shape[1::-1] == size and
+                    image.dtype == buffer_.dtype):
+                return True, cv2.resize(buffer_, size, dst=image,
+                                        interpolation=cv2.INTER_AREA)
+            return True, cv2.resize(buffer_, size,
+                                    interpolation=cv2.INTER_AREA)
+        if (image is not None and image.shape == frame.shape and
+                image.dtype == frame.dtype):
+            image[:] = frame
+            frame = image
+        return True, frame
+
+    def decode_full(self, encoded=None, flags=cv2.IMREAD_COLOR):
+        '''
+        Decode compressed frame at full resolution.
+
+        Parameters
+        ----------
+        encoded : numpy.ndarray, optional
+            Compressed frame (default: :attr:`encoded`).
+        flags : int, optional
+            :func:`cv2.imdecode` flags, e.g., :data:`cv2.IMREAD_GRAYSCALE`.
+
+        Returns
+        -------
+        numpy.ndarray or None
+            Decoded frame, or ``None`` if no compressed frame is available.
+        '''
+        encoded = self.encoded if encoded is None else encoded
+        if encoded is None:
+            return None
+        return cv2.imdecode(encoded, flags)
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def release(self):
+        self.capture.release()
+
+
+class VideoFileSource(FrameSource):
+    '''
+    Recorded video file (e.g., ``.mp4``).
+
+    Parameters
+    ----------
+    path : str
+        Path to video file.
+    realtime : bool, optional
+        If ``True``, replay at recorded timing.
+    '''
+    def __init__(self, path, realtime=False):
+        super(VideoFileSource, self).__init__(realtime=realtime)
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+
+    def read(self, image=None):
+        frame_captured, frame = self.capture.read(image)
+        if frame_captured:
+            self._pace(self.capture.get(cv2.CAP_PROP_POS_MSEC) * 1e-3)
+        return frame_captured, frame
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+    def release(self):
+        self.capture.release()
+
+
+class ImageSequenceSource(FrameSource):
+    '''
+    Sequence of image files, e.g., a directory of frames.
+
+    Parameters
+    ----------
+    paths : str or list[str]
+        Directory containing images, or list of image paths.
+    pattern : str, optional
+        Glob pattern of images within directory.
+    fps : float, optional
+        Frame rate used for real-time replay.
+    realtime : bool, optional
+        If ``True``, replay at ``fps``.
+    loop : bool, optional
+        If ``True``, restart from first image after last image.
+    '''
+    def __init__(self, paths, pattern='*.png', fps=30., realtime=False,
+                 loop=False):
+        super(ImageSequenceSource, self).__init__(realtime=realtime)
+        if isinstance(paths, (bytes, type(''))):
+            paths = sorted(glob.glob(os.path.join(paths, pattern)))
+        self.paths = list(paths)
+        self.fps = fps
+        self.loop = loop
+        self._index = 0
+
+    def _next_frame(self):
+        if self._index >= len(self.paths):
+            if not (self.loop and self.paths):
+                return None
+        path = self.paths[self._index % len(self.paths)]
+        frame = cv2.imread(path)
+        if frame is None:
+            raise IOError('Error reading image: `%s`' % path)
+        timestamp = self._index / self.fps
+        self._index += 1
+        return frame, timestamp
+
+    def isOpened(self):
+        return bool(self.paths)
+
+
+class GeneratorSource(FrameSource):
+    '''
+    Frames produced by a Python iterable (e.g., a synthetic generator).
+
+    Parameters
+    ----------
+    frames : iterable
+        Iterable of BGR frames (``numpy.ndarray``).
+    fps : float, optional
+        Frame rate used for real-time replay.
+    realtime : bool, optional
+        If ``True``, replay at ``fps``.
+    '''
+    def __init__(self, frames, fps=30., realtime=False):
+        super(GeneratorSource, self).__init__(realtime=realtime)
+        self._frames = iter(frames)
+        self.fps = fps
+        self._index = 0
+
+    def _next_frame(self):
+        try:
+            frame = next(self._frames)
+        except StopIteration:
+            return None
+        timestamp = self._index / self.fps
+        self._index += 1
+        return frame, timestamp
+
+
+def open_source(source, width=None, height=None, realtime=False,
+                decode_scale=1):
+    '''
+    Open a video frame source.
+
+    Parameters
+    ----------
+    source : int, str, iterable, or object
+        One of:
+
+         - OpenCV video device id (see :class:`DeviceSource`)
+         - path to video file (see :class:`VideoFileSource`)
+         - path to directory of images (see :class:`ImageSequenceSource`)
+         - iterable of frames (see :class:`GeneratorSource`)
+         - object with a :class:`cv2.VideoCapture`-like ``read()`` method
+           (returned as-is)
+    width : int, optional
+        Requested video width (video devices only).
+    height : int, optional
+        Requested video height (video devices only).
+    realtime : bool, optional
+        If ``True``, replay recorded sources at recorded timing.  Otherwise,
+        replay as fast as possible.
+    decode_scale : int, optional
+        MJPEG decode scale (video devices only; see :class:`DeviceSource`).
+
+    Returns
+    -------
+    FrameSource or object
+        Video frame source.
+    '''
+    if hasattr(source, 'read'):
+        return source
+    elif isinstance(source, int):
+        return DeviceSource(source, width=width, height=height,
+                            decode_scale=decode_scale)
+    elif isinstance(source, (bytes, type(''))):
+        if os.path.isdir(source):
+            return ImageSequenceSource(source, realtime=realtime)
+        elif os.path.isfile(source):
+            return VideoFileSource(source, realtime=realtime)
+        raise IOError('Video source not found: `%s`' % source)
+    return GeneratorSource(source, realtime=realtime)
+
+
+class FrameRingBuffer(object):
+    '''
+    Fixed-size ring of preallocated video frames.
+
+    A single producer (see :class:`CaptureThread`) writes frames into the ring
+    while a single consumer always takes the *newest* frame.  Frames that are
+    overwritten before the consumer gets to them are counted as dropped.
+
+    The slot returned by :meth:`latest` is *pinned* (i.e., never written to by
+    the producer) until the next call to :meth:`latest`, so the consumer may
+    process the frame in place without copying it.
+
+    Parameters
+    ----------
+    shape : tuple
+        Frame shape, e.g., ``(height, width, 3)``.
+    dtype : str or numpy.dtype, optional
+        Frame data type.
+    size : int, optional
+        Number of frames in ring.  At least 3 are required: one being written,
+        one pinned by the consumer, and the newest completed frame.
+
+    Attributes
+    ----------
+    error : Exception
+        Exception that ended capture, if any (see :meth:`close`).
+    '''
+    def __init__(self, shape, dtype='uint8', size=4):
+        if size < 3:
+            raise ValueError('Ring buffer requires at least 3 frames.')
+        self.frames = np.empty((size, ) + tuple(shape), dtype=dtype)
+        self.timestamps = np.zeros(size, dtype='float64')
+        self.indexes = np.full(size, -1, dtype='int64')
+        # Time taken to read each frame from the source (in seconds).
+        self.durations = np.zeros(size, dtype='float64')
+        # Compressed frame of each slot (if provided by source).
+        self.encoded = [None] * size
+        self.closed = False
+        self.error = None
+        self.captured_count = 0
+        self.processed_count = 0
+        self.dropped_count = 0
+        self._condition = threading.Condition()
+        # Slot containing newest completed frame.
+        self._latest = -1
+        # Slot currently held by consumer.
+        self._pinned = -1
+        # Index of last frame returned to consumer.
+        self._last_index = -1
+
+    def __len__(self):
+        return self.frames.shape[0]
+
+    @property
+    def counts(self):
+        '''
+        Returns
+        -------
+        dict
+            Number of frames ``captured``, ``processed``, and ``dropped``.
+        '''
+        return {'captured': self.captured_count,
+                'processed': self.processed_count,
+                'dropped': self.dropped_count}
+
+    def write_slot(self):
+        '''
+        Returns
+        -------
+        int
+            Index of a slot that is safe to write the next frame into, i.e.,
+            neither pinned by the consumer nor holding the newest frame.
+        '''
+        with self._condition:
+            return next(i for i in range(len(self))
+                        if i not in (self._latest, self._pinned))
+
+    @property
+    def pinned_duration(self):
+        '''
+        Time taken to read the frame most recently returned by :meth:`latest`
+        (in seconds).
+        '''
+        return self.durations[self._pinned] if self._pinned >= 0 else 0.
+
+    @property
+    def pinned_encoded(self):
+        '''
+        Compressed copy of the frame most recently returned by :meth:`latest`
+        (``None`` if not provided by the frame source).
+        '''
+        return self.encoded[self._pinned] if self._pinned >= 0 else None
+
+    def commit(self, slot, timestamp=None, duration=0., encoded=None):
+        '''
+        Publish frame written to ``slot`` as the newest frame.
+
+        Parameters
+        ----------
+        slot : int
+            Slot returned by :meth:`write_slot`.
+        timestamp : float, optional
+            Capture time (default: current time).
+        duration : float, optional
+            Time taken to read frame from source (in seconds).
+        encoded : numpy.ndarray, optional
+            Compressed copy of frame (see :class:`DeviceSource`).
+        '''
+        with self._condition:
+            self.indexes[slot] = self.captured_count
+            self.durations[slot] = duration
+            self.encoded[slot] = encoded
+            self.timestamps[slot] = (time.time() if timestamp is None
+                                     else timestamp)
+            self.captured_count += 1
+            self._latest = slot
+            self._condition.notify_all()
+
+    def latest(self, timeout=None):
+        '''
+        Wait for a frame newer than the last frame taken and pin it.
+
+        Any previously pinned slot is released.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time to wait in seconds (default: wait forever).
+
+        Returns
+        -------
+        tuple(int, float, numpy.ndarray) or None
+            Frame index, capture timestamp, and frame (a view into the ring),
+            or ``None`` if the buffer was closed or ``timeout`` elapsed.
+        '''
+        end = None if timeout is None else time.time() + timeout
+        with self._condition:
+            self._pinned = -1
+            while (self._latest < 0 or
+                   self.indexes[self._latest] <= self._last_index):
+                if self.closed:
+                    return None
+                remaining = None if end is None else end - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+            slot = self._latest
+            index = int(self.indexes[slot])
+            self.dropped_count += index - self._last_index - 1
+            self.processed_count += 1
+            self._last_index = index
+            self._pinned = slot
+            # Wake producer (if waiting for frame to be consumed).
+            self._condition.notify_all()
+            return index, self.timestamps[slot], self.frames[slot]
+
+    def wait_consumed(self, timeout=None):
+        '''
+        Wait until the consumer has taken the newest frame.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time to wait in seconds (default: wait forever).
+
+        Returns
+        -------
+        bool
+            ``True`` if newest frame has been taken (or buffer was closed).
+        '''
+        end = None if timeout is None else time.time() + timeout
+        with self._condition:
+            while not self.closed and self._last_index < self.captured_count - 1:
+                remaining = None if end is None else end - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def close(self, error=None):
+        '''
+        Wake consumer; no more frames will be written.
+
+        Parameters
+        ----------
+        error : Exception, optional
+            Exception that ended capture, to be raised by the consumer (see
+            :meth:`raise_error`).
+        '''
+        with self._condition:
+            self.closed = True
+            if error is not None:
+                self.error = error
+            self._condition.notify_all()
+
+    def raise_error(self):
+        '''
+        Raise exception that ended capture, if any.
+        '''
+        if self.error is not None:
+            raise self.error
+
+
+class CaptureThread(threading.Thread):
+    '''
+    Read frames from an OpenCV-style capture into a :class:`FrameRingBuffer`.
+
+    Frames are decoded directly into preallocated ring slots, so the camera
+    driver is drained at its own rate regardless of how long downstream
+    processing takes.  Frames that do not match the ring frame shape (e.g.,
+    after the camera resolution changes) are resized into the slot.
+
+    The ring is closed when reading fails or :meth:`stop` is called.  If
+    reading raises an exception, it is stored as :attr:`error` and passed to
+    :meth:`FrameRingBuffer.close`, so the consumer can raise it.
+
+    Parameters
+    ----------
+    capture : cv2.VideoCapture or FrameSource
+        Open video capture.
+    frames : FrameRingBuffer
+        Ring buffer to write frames into.
+    drop_frames : bool, optional
+        If ``False``, wait for each frame to be consumed before reading the
+        next frame, e.g., to process every frame of a recorded video.
+    stage_timer : dropbot_chip_qc.timing.StageTimer, optional
+        If provided, record time taken to read each frame as ``capture``
+        stage.
+    '''
+    def __init__(self, capture, frames, drop_frames=True, stage_timer=None):
+        super(CaptureThread, self).__init__(name='CaptureThread')
+        self.daemon = True
+        self.capture = capture
+        self.frames = frames
+        self.drop_frames = drop_frames
+        self.stage_timer = stage_timer
+        self.error = None
+        self._stop_requested = threading.Event()
+        self._resize_logged = False
+
+    def run(self):
+        try:
+            while not self._stop_requested.is_set():
+                if not self.drop_frames and not self.frames.wait_consumed(.1):
+                    continue
+                slot = self.frames.write_slot()
+                target = self.frames.frames[slot]
+                start = timeit.default_timer()
+                frame_captured, frame = self.capture.read(target)
+                duration = timeit.default_timer() - start
+                if not frame_captured:
+                    logging.info('video capture ended')
+                    break
+                if frame is not target:
+                    # Capture did not decode in place (e.g., shape mismatch).
+                    self._fit(frame, target)
+                if self.stage_timer is not None:
+                    self.stage_timer.record('capture', duration)
+                self.frames.commit(slot, duration=duration,
+                                   encoded=getattr(self.capture, 'encoded',
+                                                   None))
+        except Exception as exception:
+            logging.error('video capture failed: %s', exception,
+                          exc_info=True)
+            self.error = exception
+        finally:
+            self.frames.close(error=self.error)
+
+    def _fit(self, frame, target):
+        '''
+        Copy frame into ring slot, converting number of channels and resizing
+        if necessary.
+        '''
+        if frame.shape == target.shape:
+            target[:] = frame
+            return
+        if not self._resize_logged:
+            logging.warning('Captured frame shape %s does not match buffer '
+                            'shape %s; resizing frames.', frame.shape,
+                            target.shape)
+            self._resize_logged = True
+        channels = frame.shape[2] if frame.ndim > 2 else 1
+        target_channels = target.shape[2] if target.ndim > 2 else 1
+        if channels != target_channels:
+            code = {(1, 3): cv2.COLOR_GRAY2BGR, (4, 3): cv2.COLOR_BGRA2BGR,
+                    (3, 1): cv2.COLOR_BGR2GRAY,
+                    (4, 1): cv2.COLOR_BGRA2GRAY}[channels, target_channels]
+            frame = cv2.cvtColor(frame, code)
+        if frame.shape[:2] == target.shape[:2]:
+            target[:] = frame.reshape(target.shape)
+        else:
+            target[:] = cv2.resize(frame, target.shape[1::-1],
+                                   interpolation=cv2.INTER_AREA)\
+                .reshape(target.shape)
+
+    def stop(self):
+        self._stop_requested.set()
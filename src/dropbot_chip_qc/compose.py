@@ -0,0 +1,85 @@
+# -*- encoding: utf-8 -*-
+'''
+Composition of combined raw/perspective-corrected display frames.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import cv2
+import numpy as np
+
+
+class FrameCompositor(object):
+    '''
+    Stack raw and perspective-corrected views into a reduced-resolution canvas.
+
+    Each view is resized straight into its half of a preallocated canvas
+    (using the ``dst`` argument of :func:`cv2.resize`), so no intermediate
+    full-size images are allocated.  Canvases are recycled in round-robin
+    order, i.e., a returned canvas is overwritten ``buffers`` compositions
+    later.
+
+    Layout of the combined video frame::
+
+        ┏━━━━━━━━━━━━━━━━━━━━━━━━━┓
+        ┃  Raw video frame        ┃
+        ┠┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┄┨
+        ┃  Perspective-corrected  ┃
+        ┗━━━━━━━━━━━━━━━━━━━━━━━━━┛
+
+    Parameters
+    ----------
+    buffers : int, optional
+        Number of canvases to cycle through.
+    interpolation : int, optional
+        OpenCV interpolation flag used for downscaling.
+    scale : float, optional
+        Scale of each view relative to the raw video frame.
+    '''
+    def __init__(self, buffers=2, interpolation=cv2.INTER_AREA, scale=.5):
+        self.buffers = buffers
+        self.interpolation = interpolation
+        self.scale = scale
+        self._canvases = []
+        self._next = 0
+
+    def compose(self, frame, warped):
+        '''
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            Raw video frame.
+        warped : numpy.ndarray
+            Perspective-corrected video frame (any size; resized to match
+            scaled ``frame`` as necessary).
+
+        Returns
+        -------
+        numpy.ndarray
+            Combined frame, ``scale`` times the width and height of ``frame``
+            for each view.
+        '''
+        height, width = frame.shape[:2]
+        half_height = int(round(height * self.scale))
+        half_width = int(round(width * self.scale))
+        shape = (2 * half_height, half_width) + frame.shape[2:]
+        if not self._canvases or self._canvases[0].shape != shape:
+            self._canvases = [np.empty(shape, dtype=frame.dtype)
+                              for i in range(self.buffers)]
+        canvas = self._canvases[self._next]
+        self._next = (self._next + 1) % len(self._canvases)
+
+        top, bottom = canvas[:half_height], canvas[half_height:]
+        if frame.shape[:2] == top.shape[:2]:
+            top[:] = frame
+        else:
+            cv2.resize(frame, (half_width, half_height), dst=top,
+                       interpolation=self.interpolation)
+        if warped.shape[:2] == bottom.shape[:2]:
+            bottom[:] = warped
+        else:
+            cv2.resize(warped, (half_width, half_height), dst=bottom,
+                       interpolation=self.interpolation)
+        return canvas
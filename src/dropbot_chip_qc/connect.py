@@ -31,6 +31,29 @@ def load_device(chip_file):
     return chip_info, G, neighbours
 
 
+def get_channels_graph(chip_info, electrodes_graph):
+    '''
+    Parameters
+    ----------
+    chip_info : dict
+        Chip info, as returned by :func:`load_device`.
+    electrodes_graph : networkx.Graph
+        Electrode connections graph, as returned by :func:`load_device`.
+
+    Returns
+    -------
+    networkx.Graph
+        Connections graph of DropBot channels.
+
+
+    .. versionadded:: 0.13.0
+    '''
+    electrode_channels = {e['id']: e['channels'][0]
+                          for e in chip_info['electrodes']}
+    return nx.Graph([tuple(map(electrode_channels.get, e))
+                     for e in electrodes_graph.edges])
+
+
 def connect(svg_source=None):
     '''
     .. versionchanged:: 0.9.0
@@ -128,8 +151,7 @@ def connect(svg_source=None):
                      names=('channel', 'direction'))
     channel_neighbours = pd.Series(electrode_channels[neighbours].values,
                                    index=index)
-    channels_graph = nx.Graph([tuple(map(electrode_channels.get, e))
-                               for e in electrodes_graph.edges])
+    channels_graph = get_channels_graph(chip_info, electrodes_graph)
 
     monitor_task = _connect()
     monitor_task.signals = signals
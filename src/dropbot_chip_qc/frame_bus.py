@@ -0,0 +1,314 @@
+# -*- encoding: utf-8 -*-
+'''
+Shared-memory frame bus, allowing video frame consumers to run in other
+processes.
+
+A writer (e.g., :func:`dropbot_chip_qc.video.chip_video_process`) publishes
+frames into a ring of slots in a named shared memory block.  Each slot holds
+a frame, a small JSON metadata record (e.g., frame index, chip UUID,
+perspective transform), and a sequence number.  Readers attach read-only and
+access frames as NumPy views directly into shared memory, i.e., without
+copying.
+
+Slot sequence numbers implement a *seqlock*: the sequence is odd while the
+writer is updating a slot.  A reader must check :meth:`FrameBusReader.valid`
+*after* using a frame view to confirm the slot was not overwritten in the
+meantime.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from collections import namedtuple
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+
+MAGIC = b'QCFRAMES'
+VERSION = 1
+# Magic, version, slot count, frame height, width, channels, metadata size,
+# and frame dtype.
+HEADER = struct.Struct(str('<8sIIIIII16s'))
+SLOT_DTYPE = np.dtype([(str('sequence'), '<u8'), (str('timestamp'), '<f8'),
+                       (str('frame_index'), '<i8'),
+                       (str('metadata_size'), '<u4'), (str('_pad'), '<u4')])
+# Total number of frames written (follows header).
+COUNT_DTYPE = np.dtype('<u8')
+
+FrameRecord = namedtuple('FrameRecord', 'frame metadata timestamp frame_index '
+                         'slot sequence')
+
+
+def _shm_path(name):
+    root = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(root, 'dropbot-chip-qc-%s' % name)
+
+
+def _map(name, size, create=False, readonly=False):
+    '''
+    Map named shared memory block (named file mapping on Windows, file in
+    ``/dev/shm`` otherwise).
+
+    Returns
+    -------
+    tuple(mmap.mmap, file or None)
+        Memory map and backing file (if any).
+    '''
+    access = mmap.ACCESS_READ if readonly else mmap.ACCESS_WRITE
+    if sys.platform == 'win32':
+        return mmap.mmap(-1, size, tagname=str(name), access=access), None
+    path = _shm_path(name)
+    if create:
+        file_ = open(path, 'w+b')
+        file_.truncate(size)
+    else:
+        file_ = open(path, 'rb' if readonly else 'r+b')
+    return mmap.mmap(file_.fileno(), size, access=access), file_
+
+
+class _FrameBus(object):
+    def _layout(self, slots, shape, dtype, metadata_size):
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.metadata_size = metadata_size
+        self._count_offset = HEADER.size
+        self._slots_offset = self._count_offset + COUNT_DTYPE.itemsize
+        self._metadata_offset = (self._slots_offset +
+                                 slots * SLOT_DTYPE.itemsize)
+        frames_offset = self._metadata_offset + slots * metadata_size
+        # Align frame data to 64 bytes.
+        self._frames_offset = (frames_offset + 63) // 64 * 64
+        self.size = (self._frames_offset + slots *
+                     int(np.prod(self.shape)) * self.dtype.itemsize)
+
+    def _views(self):
+        self._count = np.frombuffer(self._mmap, dtype=COUNT_DTYPE, count=1,
+                                    offset=self._count_offset)
+        self._slot_info = np.frombuffer(self._mmap, dtype=SLOT_DTYPE,
+                                        count=self.slots,
+                                        offset=self._slots_offset)
+        self._metadata = np.frombuffer(self._mmap, dtype='uint8',
+                                       count=self.slots * self.metadata_size,
+                                       offset=self._metadata_offset)\
+            .reshape(self.slots, self.metadata_size)
+        self.frames = np.frombuffer(self._mmap, dtype=self.dtype,
+                                    count=self.slots *
+                                    int(np.prod(self.shape)),
+                                    offset=self._frames_offset)\
+            .reshape((self.slots, ) + self.shape)
+
+    @property
+    def count(self):
+        '''
+        Total number of frames written to bus.
+        '''
+        return int(self._count[0])
+
+    def close(self):
+        # Release views before closing memory map.
+        self._count = self._slot_info = self._metadata = self.frames = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Frame views are still referenced elsewhere; memory is unmapped
+            # once they are garbage collected.
+            pass
+        if self._file is not None:
+            self._file.close()
+
+
+class FrameBusWriter(_FrameBus):
+    '''
+    Publish frames to a named shared-memory frame bus.
+
+    Parameters
+    ----------
+    name : str
+        Frame bus name.
+    shape : tuple
+        Frame shape, e.g., ``(height, width, 3)``.  Published frames with a
+        different height/width are resized to fit.
+    dtype : str or numpy.dtype, optional
+        Frame data type.
+    slots : int, optional
+        Number of frames in ring.
+    metadata_size : int, optional
+        Maximum size of JSON-encoded metadata of each frame (in bytes).
+    '''
+    def __init__(self, name, shape, dtype='uint8', slots=4,
+                 metadata_size=4096):
+        self.name = name
+        shape = tuple(shape) + (1, ) * (3 - len(shape))
+        self._layout(slots, shape, dtype, metadata_size)
+        self._mmap, self._file = _map(name, self.size, create=True)
+        self._views()
+        self._slot_info[:] = 0
+        self._count[0] = 0
+        HEADER.pack_into(self._mmap, 0, MAGIC, VERSION, slots, shape[0],
+                         shape[1], shape[2], metadata_size,
+                         self.dtype.str.encode('ascii'))
+
+    def publish(self, frame, timestamp=None, frame_index=-1, **metadata):
+        '''
+        Write frame and metadata to next slot.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            Video frame.
+        timestamp : float, optional
+            Frame timestamp (default: current time).
+        frame_index : int, optional
+            Frame index.
+        **metadata
+            JSON-serializable metadata (NumPy arrays are converted to lists).
+        '''
+        encoded = json.dumps(metadata, default=_to_json).encode('utf8')
+        if len(encoded) > self.metadata_size:
+            raise ValueError('Metadata exceeds %d bytes.' % self.metadata_size)
+
+        count = self.count
+        slot = count % self.slots
+        info = self._slot_info[slot:slot + 1]
+        # Mark slot as being written.
+        info['sequence'] = 2 * count + 1
+
+        target = self.frames[slot]
+        frame_ = frame.reshape(frame.shape[:2] + (-1, ))
+        if frame_.shape == target.shape:
+            target[:] = frame_
+        else:
+            # E.g., raw frame published before perspective correction.
+            cv2.resize(frame, self.shape[1::-1], dst=target)
+
+        self._metadata[slot, :len(encoded)] = np.frombuffer(encoded,
+                                                            dtype='uint8')
+        info['metadata_size'] = len(encoded)
+        info['timestamp'] = time.time() if timestamp is None else timestamp
+        info['frame_index'] = frame_index
+        # Publish slot.
+        info['sequence'] = 2 * (count + 1)
+        self._count[0] = count + 1
+
+    def close(self, unlink=True):
+        super(FrameBusWriter, self).close()
+        if unlink and self._file is not None:
+            try:
+                os.remove(_shm_path(self.name))
+            except OSError:
+                pass
+
+
+class FrameBusReader(_FrameBus):
+    '''
+    Attach read-only to a named shared-memory frame bus.
+
+    Parameters
+    ----------
+    name : str
+        Frame bus name.
+
+    Examples
+    --------
+
+    >>> reader = FrameBusReader('chip')
+    >>> record = reader.wait(timeout=1.)
+    >>> mean = record.frame.mean()  # Zero-copy view of shared memory.
+    >>> if reader.valid(record):
+    ...     print(record.metadata['chip_uuid'], mean)
+    '''
+    def __init__(self, name):
+        self.name = name
+        self._mmap, self._file = _map(name, HEADER.size, readonly=True)
+        header = HEADER.unpack_from(self._mmap, 0)
+        self._mmap.close()
+        if self._file is not None:
+            self._file.close()
+        magic, version, slots, height, width, channels, metadata_size, \
+            dtype = header
+        if magic != MAGIC or version != VERSION:
+            raise IOError('No compatible frame bus named `%s`.' % name)
+        self._layout(slots, (height, width, channels),
+                     dtype.rstrip(b'\0').decode('ascii'), metadata_size)
+        self._mmap, self._file = _map(name, self.size, readonly=True)
+        self._views()
+        self._last_sequence = 0
+
+    def latest(self):
+        '''
+        Returns
+        -------
+        FrameRecord or None
+            Newest frame (``frame`` is a read-only view into shared memory),
+            or ``None`` if no valid frame is available.
+        '''
+        count = self.count
+        if not count:
+            return None
+        slot = (count - 1) % self.slots
+        sequence = int(self._slot_info['sequence'][slot])
+        if sequence % 2:
+            # Slot is being written.
+            return None
+        info = self._slot_info[slot]
+        metadata = json.loads(self._metadata[slot, :info['metadata_size']]
+                              .tobytes().decode('utf8') or '{}')
+        frame = self.frames[slot]
+        if frame.shape[-1] == 1:
+            frame = frame[..., 0]
+        record = FrameRecord(frame, metadata, float(info['timestamp']),
+                             int(info['frame_index']), slot, sequence)
+        return record if self.valid(record) else None
+
+    def valid(self, record):
+        '''
+        Returns
+        -------
+        bool
+            ``True`` if slot of ``record`` has not been overwritten since it
+            was read.
+        '''
+        return int(self._slot_info['sequence'][record.slot]) == record.sequence
+
+    def wait(self, timeout=None, poll_interval=.005):
+        '''
+        Wait for a frame newer than the last frame returned by this method.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time to wait in seconds (default: wait forever).
+        poll_interval : float, optional
+            Time between checks for a new frame (in seconds).
+
+        Returns
+        -------
+        FrameRecord or None
+            New frame, or ``None`` if ``timeout`` elapsed.
+        '''
+        end = None if timeout is None else time.time() + timeout
+        while True:
+            record = self.latest()
+            if record is not None and record.sequence > self._last_sequence:
+                self._last_sequence = record.sequence
+                return record
+            if end is not None and time.time() >= end:
+                return None
+            time.sleep(poll_interval)
+
+
+def _to_json(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError('%r is not JSON serializable' % obj)
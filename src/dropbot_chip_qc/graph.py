@@ -0,0 +1,227 @@
+# -*- encoding: utf-8 -*-
+'''
+Compact array-backed channel connection graph.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import networkx as nx
+import numpy as np
+
+
+#: Predecessor of nodes that are not reachable from a source.
+UNREACHABLE = -1
+
+
+class ChannelGraph(object):
+    '''
+    Undirected graph stored as immutable compressed sparse row (CSR)
+    adjacency arrays, with a mask of removed nodes.
+
+    Adjacency arrays are shared between copies, so :meth:`copy` only copies
+    the removed node mask, and traversals (see :meth:`bfs`) are vectorized
+    over each breadth-first frontier.
+
+    Supports the subset of the :class:`networkx.Graph` interface used by
+    planners: ``node in graph``, ``iter(graph)``, ``len(graph)``,
+    :meth:`neighbors`, :meth:`copy`, :meth:`remove_node`, and
+    :meth:`remove_nodes_from`.
+
+    Parameters
+    ----------
+    nodes : list
+        Node labels (e.g., channel numbers), in index order.
+    indptr : numpy.ndarray
+        Neighbours of node ``i`` are ``indices[indptr[i]:indptr[i + 1]]``.
+    indices : numpy.ndarray
+        Concatenated neighbour indices of all nodes.
+    removed : numpy.ndarray, optional
+        Boolean mask of removed nodes.
+
+    Attributes
+    ----------
+    removed : numpy.ndarray
+        Boolean mask of removed nodes.
+    '''
+    def __init__(self, nodes, indptr, indices, removed=None):
+        self.nodes = list(nodes)
+        self._index = {n: i for i, n in enumerate(self.nodes)}
+        self.indptr = np.asarray(indptr, dtype='int32')
+        self.indices = np.asarray(indices, dtype='int32')
+        for array in (self.indptr, self.indices):
+            array.flags.writeable = False
+        self.removed = (np.zeros(len(self.nodes), dtype=bool)
+                        if removed is None else np.array(removed, dtype=bool))
+
+    @classmethod
+    def from_networkx(cls, graph):
+        '''
+        Parameters
+        ----------
+        graph : networkx.Graph
+            Connection graph (e.g., ``channels_graph``).
+
+        Returns
+        -------
+        ChannelGraph
+            Graph with the same nodes (in the same order) and edges.
+        '''
+        nodes = list(graph.nodes)
+        index = {n: i for i, n in enumerate(nodes)}
+        neighbours = [[index[m] for m in graph.neighbors(n)] for n in nodes]
+        indptr = np.zeros(len(nodes) + 1, dtype='int32')
+        indptr[1:] = np.cumsum([len(n) for n in neighbours])
+        indices = np.fromiter((j for n in neighbours for j in n),
+                              dtype='int32', count=indptr[-1])
+        return cls(nodes, indptr, indices)
+
+    def to_networkx(self):
+        '''
+        Returns
+        -------
+        networkx.Graph
+            Graph of remaining (i.e., not removed) nodes and edges between
+            them.
+        '''
+        graph = nx.Graph()
+        graph.add_nodes_from(self)
+        graph.add_edges_from(self.edges())
+        return graph
+
+    def __contains__(self, node):
+        i = self._index.get(node)
+        return i is not None and not self.removed[i]
+
+    def __iter__(self):
+        return (self.nodes[i] for i in np.flatnonzero(~self.removed))
+
+    def __len__(self):
+        return len(self.nodes) - int(self.removed.sum())
+
+    def index(self, node):
+        '''
+        Returns
+        -------
+        int
+            Index of ``node``.
+
+        Raises
+        ------
+        networkx.NodeNotFound
+            If ``node`` is not in graph (e.g., removed).
+        '''
+        if node not in self:
+            raise nx.NodeNotFound('Node %s not in graph.' % (node, ))
+        return self._index[node]
+
+    def neighbor_indices(self, i):
+        indices = self.indices[self.indptr[i]:self.indptr[i + 1]]
+        return indices[~self.removed[indices]]
+
+    def neighbors(self, node):
+        return [self.nodes[j] for j in self.neighbor_indices(self.index(node))]
+
+    def edge_indices(self):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            ``(n, 2)`` array of node index pairs ``(i, j)``, ``i < j``, of
+            each edge between remaining nodes.
+        '''
+        sources = np.repeat(np.arange(len(self.nodes), dtype='int32'),
+                            np.diff(self.indptr))
+        mask = ((sources < self.indices) & ~self.removed[sources] &
+                ~self.removed[self.indices])
+        return np.column_stack([sources[mask], self.indices[mask]])
+
+    def edges(self):
+        '''
+        Returns
+        -------
+        list[tuple]
+            Node label pairs of each edge between remaining nodes (see
+            :meth:`edge_indices`).
+        '''
+        return [(self.nodes[i], self.nodes[j])
+                for i, j in self.edge_indices()]
+
+    def remove_node(self, node):
+        '''
+        Raises
+        ------
+        networkx.NetworkXError
+            If node is not in graph.
+        '''
+        if node not in self:
+            raise nx.NetworkXError('The node %s is not in the graph.' %
+                                   (node, ))
+        self.removed[self._index[node]] = True
+
+    def remove_nodes_from(self, nodes):
+        for node in nodes:
+            if node in self:
+                self.remove_node(node)
+
+    def copy(self):
+        '''
+        Returns
+        -------
+        ChannelGraph
+            Copy sharing (immutable) adjacency arrays; only the removed node
+            mask is copied.
+        '''
+        copy = object.__new__(ChannelGraph)
+        copy.nodes = self.nodes
+        copy._index = self._index
+        copy.indptr = self.indptr
+        copy.indices = self.indices
+        copy.removed = self.removed.copy()
+        return copy
+
+    def bfs(self, i):
+        '''
+        Breadth-first search from node index ``i``, skipping removed nodes.
+
+        Parameters
+        ----------
+        i : int
+            Source node index.
+
+        Returns
+        -------
+        numpy.ndarray
+            ``int32`` predecessor index of each node in the search tree
+            (``i`` for the source, :data:`UNREACHABLE` for nodes not reached).
+        '''
+        predecessors = np.full(len(self.nodes), UNREACHABLE, dtype='int32')
+        predecessors[i] = i
+        frontier = np.array([i], dtype='int32')
+        while frontier.size:
+            starts = self.indptr[frontier]
+            counts = self.indptr[frontier + 1] - starts
+            # Positions of all frontier neighbours in `indices`.
+            offsets = (np.repeat(starts - np.cumsum(counts) + counts, counts) +
+                       np.arange(counts.sum()))
+            neighbours = self.indices[offsets]
+            parents = np.repeat(frontier, counts)
+            new = ((predecessors[neighbours] == UNREACHABLE) &
+                   ~self.removed[neighbours])
+            # First discovering parent of each newly reached node.
+            frontier, first = np.unique(neighbours[new], return_index=True)
+            predecessors[frontier] = parents[new][first]
+        return predecessors
+
+
+def channel_graph(graph):
+    '''
+    Returns
+    -------
+    ChannelGraph
+        ``graph`` if it is a :class:`ChannelGraph`; otherwise, ``graph``
+        converted from :class:`networkx.Graph`.
+    '''
+    return (graph if isinstance(graph, ChannelGraph)
+            else ChannelGraph.from_networkx(graph))
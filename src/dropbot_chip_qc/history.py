@@ -0,0 +1,236 @@
+# -*- encoding: utf-8 -*-
+'''
+Memory-bounded, time-indexed history of compressed video frames, e.g., to
+extract clips around test events without recording full session videos.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import bisect
+import logging
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import cv2
+import numpy as np
+
+
+class FrameHistory(object):
+    '''
+    Ring of JPEG-compressed video frames, indexed by capture time.
+
+    Frames are evicted (oldest first) once the total compressed size exceeds
+    ``max_bytes`` or a frame is older than ``max_duration`` seconds relative
+    to the newest frame.  Timestamps are kept monotonic (a timestamp earlier
+    than the previous frame, e.g., after a system clock adjustment, is
+    clamped to the previous timestamp), so lookups are binary searches, i.e.,
+    ``O(log n)``.
+
+    Frames may be appended from one thread (e.g., the video processing
+    thread) while clips are read from other threads.  Frames are compressed
+    in a background thread, so :meth:`append` only scales (or copies) the
+    frame; a frame is available to :meth:`clip` once it has been compressed
+    (see :meth:`flush`).  If ``max_pending`` frames are already waiting to be
+    compressed, the frame is skipped.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Maximum total size of compressed frames.
+    max_duration : float, optional
+        Maximum time span of history, in seconds.
+    interval : float, optional
+        Minimum time between stored frames, in seconds.
+    scale : float, optional
+        Scale factor applied to frames before compression.  Frames that are
+        already compressed (see :meth:`append`) are stored as is.
+    quality : int, optional
+        JPEG quality (0-100).
+    max_pending : int, optional
+        Maximum number of frames waiting to be compressed.
+
+    Attributes
+    ----------
+    nbytes : int
+        Total size of compressed frames.
+    dropped_count : int
+        Number of frames evicted from history.
+    skipped_count : int
+        Number of frames skipped because ``max_pending`` frames were waiting
+        to be compressed.
+    '''
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_duration=60.,
+                 interval=1 / 15., scale=.5, quality=75, max_pending=4):
+        self.max_bytes = max_bytes
+        self.max_duration = max_duration
+        self.interval = interval
+        self.scale = scale
+        self.quality = quality
+        self.nbytes = 0
+        self.dropped_count = 0
+        self.skipped_count = 0
+        self._lock = threading.Lock()
+        # Timestamp of newest frame accepted by `append` (stored or pending).
+        self._last = None
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        # Entries before `_start` have been evicted (lists are compacted once
+        # half of the entries are evicted).
+        self._start = 0
+        self._timestamps = []
+        self._frames = []
+
+    def __len__(self):
+        return len(self._timestamps) - self._start
+
+    def span(self):
+        '''
+        Returns
+        -------
+        tuple(float, float) or None
+            Timestamps of oldest and newest frames, or ``None`` if history is
+            empty.
+        '''
+        with self._lock:
+            if not len(self):
+                return None
+            return self._timestamps[self._start], self._timestamps[-1]
+
+    def append(self, timestamp, frame=None, encoded=None):
+        '''
+        Parameters
+        ----------
+        timestamp : float
+            Capture time of frame.
+        frame : numpy.ndarray, optional
+            BGR video frame; compressed unless ``encoded`` is provided.
+        encoded : numpy.ndarray or bytes, optional
+            JPEG-compressed frame (e.g.,
+            :attr:`dropbot_chip_qc.capture.DeviceSource.encoded`).
+
+        Returns
+        -------
+        bool
+            ``True`` if frame was queued to be stored; ``False`` if it was
+            skipped since less than ``interval`` seconds passed since the last
+            stored frame, or since ``max_pending`` frames are waiting to be
+            compressed.
+        '''
+        if self._last is not None:
+            if 0 <= timestamp - self._last < self.interval:
+                return False
+            timestamp = max(timestamp, self._last)
+        if self._pending.full():
+            self.skipped_count += 1
+            return False
+        data = None
+        if encoded is not None:
+            # Already compressed; queued anyway to keep frames in order.
+            frame = None
+            data = (encoded.tobytes() if isinstance(encoded, np.ndarray)
+                    else bytes(encoded))
+        elif self.scale != 1:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale,
+                               interpolation=cv2.INTER_AREA)
+        else:
+            # Frame buffer is reused by caller.
+            frame = frame.copy()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._store_frames,
+                                            name='FrameHistory')
+            self._thread.daemon = True
+            self._thread.start()
+        self._pending.put((timestamp, frame, data))
+        self._last = timestamp
+        return True
+
+    def _store_frames(self):
+        while True:
+            item = self._pending.get()
+            try:
+                if item is None:
+                    break
+                timestamp, frame, data = item
+                if data is None:
+                    success, encoded = \
+                        cv2.imencode('.jpg', frame,
+                                     [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                    if not success:
+                        logging.error('Error encoding history frame.')
+                        continue
+                    data = encoded.tobytes()
+                with self._lock:
+                    self._timestamps.append(timestamp)
+                    self._frames.append(data)
+                    self.nbytes += len(data)
+                    self._evict(timestamp - self.max_duration)
+            finally:
+                self._pending.task_done()
+
+    def flush(self):
+        '''
+        Wait until all appended frames have been stored.
+        '''
+        if self._thread is not None:
+            self._pending.join()
+
+    def close(self):
+        '''
+        Store pending frames and stop background thread.
+        '''
+        if self._thread is not None:
+            self._pending.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _evict(self, oldest):
+        while (len(self) > 1 and (self.nbytes > self.max_bytes or
+                                  self._timestamps[self._start] < oldest)):
+            self.nbytes -= len(self._frames[self._start])
+            self._frames[self._start] = None
+            self._start += 1
+            self.dropped_count += 1
+        if self._start > len(self._timestamps) // 2:
+            del self._timestamps[:self._start]
+            del self._frames[:self._start]
+            self._start = 0
+
+    def clip(self, start, end):
+        '''
+        Parameters
+        ----------
+        start, end : float
+            Time range of clip (inclusive).
+
+        Returns
+        -------
+        list[tuple(float, bytes)]
+            Timestamp and JPEG data of each frame captured within time range.
+        '''
+        with self._lock:
+            i = bisect.bisect_left(self._timestamps, start, lo=self._start)
+            j = bisect.bisect_right(self._timestamps, end, lo=i)
+            return list(zip(self._timestamps[i:j], self._frames[i:j]))
+
+    def around(self, timestamp, before=2., after=2.):
+        '''
+        Returns
+        -------
+        list[tuple(float, bytes)]
+            Frames captured from ``before`` seconds before to ``after`` seconds
+            after ``timestamp`` (see :meth:`clip`).
+        '''
+        return self.clip(timestamp - before, timestamp + after)
+
+    def clear(self):
+        self.flush()
+        self._last = None
+        with self._lock:
+            self._start = 0
+            del self._timestamps[:]
+            del self._frames[:]
+            self.nbytes = 0
@@ -0,0 +1,103 @@
+# -*- encoding: utf-8 -*-
+'''
+Cheap motion detection, used to skip vision processing while nothing in view
+has changed.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import cv2
+
+
+class MotionGate(object):
+    '''
+    Decide whether a video frame needs full processing, based on the
+    difference between a small grayscale thumbnail of the frame and a
+    thumbnail of the last fully processed frame.
+
+    Frames are compared against the last *processed* frame (not the previous
+    frame), so slow drift accumulates until it exceeds ``threshold``.  A full
+    check is forced at least every ``interval`` frames, and whenever the
+    caller reports that the last check did not find what it was looking for
+    (see :meth:`update`).
+
+    Parameters
+    ----------
+    size : tuple(int, int), optional
+        ``(width, height)`` of thumbnail.
+    threshold : float, optional
+        Absolute difference (in 8-bit intensity levels) of any thumbnail pixel
+        above which a frame is considered to have changed.  Each thumbnail
+        pixel averages a block of the frame, which suppresses sensor noise
+        while still registering local changes (e.g., a moving drop).
+    interval : int, optional
+        Maximum number of consecutive frames to skip.  Set to ``0`` to disable
+        gating (i.e., process every frame).
+
+    Examples
+    --------
+
+    >>> gate = MotionGate()
+    >>> if gate.update(frame, stable=markers_found):
+    ...     corners, ids = tracker.detect(frame)
+    '''
+    def __init__(self, size=(64, 36), threshold=8., interval=30):
+        self.size = tuple(size)
+        self.threshold = threshold
+        self.interval = interval
+        self.score = 0.
+        self.processed_count = 0
+        self.skipped_count = 0
+        self._reference = None
+        self._thumbnail = None
+        self._skipped = 0
+
+    def reset(self):
+        '''
+        Forget reference frame; next frame is processed.
+        '''
+        self._reference = None
+        self._skipped = 0
+
+    def update(self, frame, stable=True):
+        '''
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            BGR or grayscale video frame.
+        stable : bool, optional
+            ``False`` if processing of the last processed frame did not reach
+            a stable state (e.g., some markers were not detected), in which
+            case ``frame`` is processed regardless of motion.
+
+        Returns
+        -------
+        bool
+            ``True`` if ``frame`` should be processed; ``False`` if the
+            results for the last processed frame are still valid.
+        '''
+        # Reuse thumbnail buffer between frames.
+        self._thumbnail = cv2.resize(frame, self.size, dst=self._thumbnail,
+                                     interpolation=cv2.INTER_AREA)
+        thumbnail = self._thumbnail
+        if thumbnail.ndim == 3:
+            thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+
+        if self._reference is None or not stable or not self.interval:
+            process = True
+            self.score = 0.
+        else:
+            self.score = cv2.absdiff(thumbnail, self._reference).max()
+            process = (self.score > self.threshold or
+                       self._skipped >= self.interval)
+
+        if process:
+            self._reference = thumbnail.copy()
+            self._skipped = 0
+            self.processed_count += 1
+        else:
+            self._skipped += 1
+            self.skipped_count += 1
+        return process
@@ -24,7 +24,7 @@ from .single_drop import _run_test as _single_run_test
 
 @asyncio.coroutine
 def _run_test(signals, proxy, G, way_points, start=None,
-              move_liquid=db.dispense.move_liquid):
+              move_liquid=db.dispense.move_liquid, retry=None):
     '''
     Signals
     -------
@@ -97,13 +97,16 @@ def _run_test(signals, proxy, G, way_points, start=None,
         Prune unreachable electrodes from test route (e.g., after liquid
         movement to a bottleneck electrode has failed; cutting off the only
         path to other electrodes on the test route).
+    .. versionchanged:: 0.13.0
+        Add ``retry`` keyword argument (see
+        :func:`dropbot_chip_qc.single_drop._run_test`).
     '''
     def _move_liquid(*args, **kwargs):
         proxy.update_state(capacitance_update_interval_ms=0)
         return move_liquid(*args, **kwargs)
 
     result = _single_run_test(signals, proxy, G, way_points, start=start,
-                              move_liquid=_move_liquid)
+                              move_liquid=_move_liquid, retry=retry)
     proxy.stop_switching_matrix()
     proxy.turn_off_all_channels()
     return result
@@ -0,0 +1,277 @@
+# -*- encoding: utf-8 -*-
+'''
+Optical electrode occupancy, i.e., which electrodes hold liquid according to
+the chip camera.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import cv2
+import numpy as np
+
+from .warp import project
+
+
+#: Columns of per-frame statistics array returned by
+#: :meth:`ElectrodeOccupancy.update`.
+COLUMNS = ('mean', 'coverage')
+
+
+def fit_transform(chip_info, region, size):
+    '''
+    Parameters
+    ----------
+    chip_info : dict
+        Chip info, as returned by
+        :func:`dropbot_chip_qc.connect.load_device`.
+    region : tuple(float, float, float, float)
+        ``(x0, y0, x1, y1)`` bounding box of electrodes in the
+        perspective-corrected frame, normalized to frame size.
+    size : tuple(int, int)
+        ``(width, height)`` of (unscaled) perspective-corrected frame.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``3x3`` transformation matrix mapping chip coordinates to
+        perspective-corrected frame coordinates.
+    '''
+    points = np.concatenate([e['points'] for e in chip_info['electrodes']])
+    (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+    u0, v0, u1, v1 = region
+    width, height = size
+    scale_x = (u1 - u0) * width / (x1 - x0)
+    scale_y = (v1 - v0) * height / (y1 - y0)
+    return np.array([[scale_x, 0, u0 * width - scale_x * x0],
+                     [0, scale_y, v0 * height - scale_y * y0],
+                     [0, 0, 1]])
+
+
+class ElectrodeOccupancy(object):
+    '''
+    Per-electrode statistics of video frames, computed in one vectorized pass
+    over precomputed electrode label indices.
+
+    Electrode polygons are rasterized into a label image in *raw* frame
+    coordinates (i.e., mapped through the chip transform and the inverse of
+    the perspective correction transform), so statistics do not require a
+    perspective-corrected frame.  Labels are only rasterized again when the
+    perspective correction moves any corner of the electrode array by more
+    than ``tolerance`` pixels.
+
+    For each electrode, :meth:`update` computes:
+
+     - ``mean``: mean grayscale intensity
+     - ``coverage``: fraction of pixels differing from the reference frame
+       (see :meth:`set_reference`) by more than ``threshold`` (``NaN`` until
+       a reference frame is set)
+
+    Perspective correction maps the chip AruCo markers to fixed positions
+    (see :data:`dropbot_chip_qc.video.device_corners`), but the position of
+    the electrode array relative to the markers depends on the chip design,
+    so either ``region`` or ``chip_transform`` is required.  For example,
+    measure ``region`` once per chip design in the perspective-corrected
+    view.
+
+    Parameters
+    ----------
+    chip_info : dict
+        Chip info, as returned by
+        :func:`dropbot_chip_qc.connect.load_device`.
+    region : tuple(float, float, float, float), optional
+        ``(x0, y0, x1, y1)`` bounding box of electrodes in the
+        perspective-corrected frame, normalized to frame size (see
+        :func:`fit_transform`).  Ignored if ``chip_transform`` is provided.
+    chip_transform : numpy.ndarray, optional
+        ``3x3`` transformation matrix mapping chip coordinates to
+        perspective-corrected frame coordinates.
+    threshold : float, optional
+        Minimum absolute intensity difference from reference frame for a
+        pixel to count as covered.
+    tolerance : float, optional
+        Maximum drift (in pixels) of electrode array corners before labels are
+        rasterized again.
+
+    Attributes
+    ----------
+    electrode_ids : list[str]
+        Electrode ids, in order of statistics rows.
+    channels : numpy.ndarray
+        DropBot channel of each electrode, in order of statistics rows.
+    '''
+    def __init__(self, chip_info, region=None, chip_transform=None,
+                 threshold=25., tolerance=1.):
+        if region is None and chip_transform is None:
+            raise ValueError('Either `region` or `chip_transform` is '
+                             'required to locate electrodes.')
+        self.electrode_ids = [e['id'] for e in chip_info['electrodes']]
+        self.channels = np.array([e['channels'][0]
+                                  for e in chip_info['electrodes']])
+        self._polygons = [np.asarray(e['points'], dtype='float64')
+                          for e in chip_info['electrodes']]
+        points = np.concatenate(self._polygons)
+        (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+        self._bounds = np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]])
+        self._chip_info = chip_info
+        self.region = region
+        self.chip_transform = chip_transform
+        self.threshold = threshold
+        self.tolerance = tolerance
+        self.build_count = 0
+        self.reset()
+
+    def __len__(self):
+        return len(self.electrode_ids)
+
+    def reset(self):
+        '''
+        Discard labels and reference frame (e.g., when the chip is removed).
+        '''
+        self._corners = None
+        self._shape = None
+        # Flat frame indices of electrode pixels, and label of each.
+        self._index = None
+        self._labels = None
+        self._counts = None
+        self._reference = None
+        # Grayscale reference frame, and perspective correction transform of
+        # reference frame.
+        self._reference_frame = None
+
+    def labels(self, M, shape):
+        '''
+        Parameters
+        ----------
+        M : numpy.ndarray
+            Perspective correction transform (raw frame to
+            perspective-corrected frame).
+        shape : tuple
+            Raw frame shape.
+
+        Returns
+        -------
+        numpy.ndarray
+            ``int32`` label image in raw frame coordinates; pixels of the
+            electrode at row ``i`` of the statistics have label ``i + 1``
+            (``0`` is background).
+        '''
+        transform = self._transform(M, shape)
+        labels = np.zeros(shape[:2], dtype='int32')
+        for i, polygon in enumerate(self._polygons):
+            points = project(transform, polygon)
+            cv2.fillPoly(labels, [np.round(points).astype('int32')
+                                  .reshape(-1, 1, 2)], i + 1)
+        return labels
+
+    def _transform(self, M, shape):
+        chip_transform = self.chip_transform
+        if chip_transform is None:
+            chip_transform = fit_transform(self._chip_info, self.region,
+                                           shape[1::-1])
+        # Chip coordinates to raw frame coordinates.
+        return np.linalg.inv(M).dot(chip_transform)
+
+    def _update_labels(self, M, shape):
+        corners = project(self._transform(M, shape), self._bounds)
+        if (self._index is not None and self._shape == shape[:2] and
+                np.abs(corners - self._corners).max() <= self.tolerance):
+            return False
+        labels = self.labels(M, shape).ravel()
+        self._index = np.flatnonzero(labels)
+        self._labels = labels[self._index]
+        self._counts = np.bincount(self._labels, minlength=len(self) + 1)
+        self._corners = corners
+        self._shape = shape[:2]
+        self._reference = None
+        if self._reference_frame is not None:
+            self._index_reference(M)
+        self.build_count += 1
+        return True
+
+    def _index_reference(self, M):
+        gray, M_reference = self._reference_frame
+        if gray.shape != self._shape:
+            return
+        if not np.allclose(M, M_reference):
+            # Map reference frame to current raw frame coordinates (through
+            # perspective-corrected coordinates).
+            H = np.linalg.inv(M).dot(M_reference)
+            gray = cv2.warpPerspective(gray, H, gray.shape[::-1])
+        self._reference = gray.ravel()[self._index].astype('int16')
+
+    def _gray(self, frame):
+        gray = (cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3
+                else frame)
+        # Only electrode pixels.
+        return gray.ravel()[self._index]
+
+    def set_reference(self, frame, M):
+        '''
+        Set reference frame, e.g., before any liquid is loaded on the chip.
+
+        If the chip moves (i.e., labels are rasterized again), the reference
+        frame is mapped to the new chip position using the perspective
+        correction transforms of both frames.  The reference is discarded by
+        :meth:`reset`.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            Raw BGR or grayscale video frame.
+        M : numpy.ndarray
+            Perspective correction transform.
+        '''
+        self._update_labels(M, frame.shape)
+        gray = (cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3
+                else frame.copy())
+        self._reference_frame = gray, np.array(M, dtype='float64')
+        self._index_reference(M)
+
+    def update(self, frame, M):
+        '''
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            Raw BGR or grayscale video frame.
+        M : numpy.ndarray
+            Perspective correction transform.
+
+        Returns
+        -------
+        numpy.ndarray
+            ``float32`` array with one row per electrode (in the order of
+            :attr:`electrode_ids`) and the columns listed in
+            :data:`COLUMNS`.
+        '''
+        self._update_labels(M, frame.shape)
+        values = self._gray(frame)
+        counts = np.maximum(self._counts, 1)
+        stats = np.empty((len(self), len(COLUMNS)), dtype='float32')
+        stats[:, 0] = (np.bincount(self._labels, weights=values,
+                                   minlength=len(self) + 1) / counts)[1:]
+        if self._reference is None:
+            stats[:, 1] = np.nan
+        else:
+            covered = (np.abs(values.astype('int16') - self._reference) >
+                       self.threshold)
+            stats[:, 1] = (np.bincount(self._labels[covered],
+                                       minlength=len(self) + 1) / counts)[1:]
+        return stats
+
+    def occupied(self, stats, coverage=.5):
+        '''
+        Parameters
+        ----------
+        stats : numpy.ndarray
+            Statistics returned by :meth:`update`.
+        coverage : float, optional
+            Minimum coverage fraction of an occupied electrode.
+
+        Returns
+        -------
+        numpy.ndarray
+            Channels of occupied electrodes.
+        '''
+        return self.channels[stats[:, 1] >= coverage]
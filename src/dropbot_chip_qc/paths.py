@@ -0,0 +1,200 @@
+# -*- encoding: utf-8 -*-
+'''
+Shortest path queries on channel connection graphs.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import networkx as nx
+import numpy as np
+
+from .graph import UNREACHABLE, channel_graph
+
+
+class PathOracle(object):
+    '''
+    All-pairs (unweighted) shortest path oracle with incremental invalidation
+    on node removal.
+
+    For each source node, a breadth-first search predecessor table (see
+    :meth:`dropbot_chip_qc.graph.ChannelGraph.bfs`) is computed on first
+    query (or up front, see ``precompute``), so each path query only follows
+    predecessors from target to source, i.e., costs ``O(path length)``.
+
+    When a node is removed, only tables of sources whose shortest path tree
+    routes *through* the removed node are recomputed (on their next query);
+    in all other trees, the node is a leaf and is simply marked unreachable,
+    since removing a node never shortens any path.
+
+    Supports the subset of the :class:`networkx.Graph` interface used by
+    planners: ``node in oracle``, ``iter(oracle)``, ``len(oracle)``,
+    :meth:`copy`, :meth:`remove_node`, and :meth:`remove_nodes_from`.
+
+    Parameters
+    ----------
+    graph : networkx.Graph or dropbot_chip_qc.graph.ChannelGraph
+        Connection graph (e.g., ``channels_graph``); a
+        :class:`dropbot_chip_qc.graph.ChannelGraph` is copied, a
+        :class:`networkx.Graph` is converted.
+    precompute : bool, optional
+        If ``True``, compute tables of all sources immediately.
+
+    Attributes
+    ----------
+    graph : dropbot_chip_qc.graph.ChannelGraph
+        Connection graph (including removed nodes mask).
+    bfs_count : int
+        Number of breadth-first searches performed.
+    '''
+    def __init__(self, graph, precompute=False):
+        self.graph = channel_graph(graph)
+        if self.graph is graph:
+            self.graph = graph.copy()
+        self.nodes = self.graph.nodes
+        size = len(self.nodes)
+        # Row `i` is the predecessor table of node `i` (if `_valid[i]`).
+        self._predecessors = np.full((size, size), UNREACHABLE, dtype='int32')
+        self._valid = np.zeros(size, dtype=bool)
+        self.bfs_count = 0
+        if precompute:
+            for i in range(size):
+                self._bfs(i)
+
+    def __contains__(self, node):
+        return node in self.graph
+
+    def __iter__(self):
+        return iter(self.graph)
+
+    def __len__(self):
+        return len(self.graph)
+
+    def _bfs(self, i):
+        self._predecessors[i] = self.graph.bfs(i)
+        self._valid[i] = True
+        self.bfs_count += 1
+
+    def _table(self, i):
+        if not self._valid[i]:
+            self._bfs(i)
+        return self._predecessors[i]
+
+    def path(self, source, target):
+        '''
+        Returns
+        -------
+        list
+            Nodes of a shortest path from ``source`` to ``target``
+            (inclusive).
+
+        Raises
+        ------
+        networkx.NodeNotFound
+            If ``source`` or ``target`` is not in graph (e.g., removed).
+        networkx.NetworkXNoPath
+            If ``target`` is not reachable from ``source``.
+        '''
+        i = self.graph.index(source)
+        j = self.graph.index(target)
+        predecessors = self._table(i)
+        if predecessors[j] == UNREACHABLE:
+            raise nx.NetworkXNoPath('No path between %s and %s.' %
+                                    (source, target))
+        path = [j]
+        while j != i:
+            j = predecessors[j]
+            path.append(j)
+        return [self.nodes[k] for k in reversed(path)]
+
+    def distance(self, source, target):
+        '''
+        Returns
+        -------
+        int
+            Number of edges of a shortest path (see :meth:`path`).
+        '''
+        return len(self.path(source, target)) - 1
+
+    def has_path(self, source, target):
+        try:
+            self.path(source, target)
+        except (nx.NetworkXNoPath, nx.NodeNotFound):
+            return False
+        return True
+
+    def reachable(self, source):
+        '''
+        Returns
+        -------
+        list
+            Nodes reachable from ``source`` (including ``source``), i.e., the
+            connected component containing ``source``.
+        '''
+        predecessors = self._table(self.graph.index(source))
+        return [self.nodes[k] for k in
+                np.flatnonzero(predecessors != UNREACHABLE)]
+
+    def edges(self):
+        '''
+        Returns
+        -------
+        list[tuple]
+            Edges between remaining nodes (see
+            :meth:`dropbot_chip_qc.graph.ChannelGraph.edges`).
+        '''
+        return self.graph.edges()
+
+    def remove_node(self, node):
+        '''
+        Remove node, invalidating only tables of sources that route through
+        it.
+
+        Raises
+        ------
+        networkx.NetworkXError
+            If node is not in graph.
+        '''
+        if node not in self:
+            raise nx.NetworkXError('The node %s is not in the graph.' %
+                                   (node, ))
+        i = self.graph.index(node)
+        self.graph.remove_node(node)
+        # Node is an inner node of the shortest path tree of these sources
+        # (including its own tree).
+        self._valid &= ~(self._predecessors == i).any(axis=1)
+        # Node is at most a leaf of every other tree.
+        self._predecessors[:, i] = UNREACHABLE
+
+    def remove_nodes_from(self, nodes):
+        for node in nodes:
+            if node in self:
+                self.remove_node(node)
+
+    def copy(self):
+        '''
+        Returns
+        -------
+        PathOracle
+            Independent copy, sharing no mutable state (computed tables are
+            kept).
+        '''
+        copy = object.__new__(PathOracle)
+        copy.graph = self.graph.copy()
+        copy.nodes = self.nodes
+        copy._predecessors = self._predecessors.copy()
+        copy._valid = self._valid.copy()
+        copy.bfs_count = 0
+        return copy
+
+
+def path_oracle(graph):
+    '''
+    Returns
+    -------
+    PathOracle
+        ``graph`` if it is a :class:`PathOracle`; otherwise, a new oracle for
+        ``graph``.
+    '''
+    return graph if isinstance(graph, PathOracle) else PathOracle(graph)
@@ -0,0 +1,215 @@
+# -*- encoding: utf-8 -*-
+'''
+``frame-ready`` message payload with views computed on first access.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import functools as ft
+import inspect
+import threading
+import warnings
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+import cv2
+import numpy as np
+
+try:
+    getargspec = inspect.getfullargspec
+except AttributeError:
+    getargspec = inspect.getargspec
+
+#: ``frame-ready`` keyword arguments sent before fields were combined into a
+#: single ``payload`` keyword argument.
+LEGACY_FIELDS = ('frame', 'raw_frame', 'warped', 'transform', 'fps',
+                 'chip_uuid')
+
+
+class FramePayload(Mapping):
+    '''
+    Read-only mapping of ``frame-ready`` message fields, where *views* (e.g.,
+    perspective-corrected or combined frames) are only computed when first
+    accessed, and memoized.
+
+    For every view (and the ``raw_frame`` field, if present), an RGB copy is
+    also available under the key ``<name>_rgb``.
+
+    Views are computed from buffers that are reused for later frames, so a
+    view that has not been accessed by the time the payload is closed (see
+    :meth:`close`) is no longer available.  Receivers that need a view
+    outside of the signal callback (e.g., from another thread) must access it
+    within the callback.
+
+    Parameters
+    ----------
+    views : dict, optional
+        Function to compute each view, called without arguments.
+    **fields
+        Precomputed message fields.
+
+    Examples
+    --------
+
+    >>> def on_frame_ready(sender, payload):
+    ...     if payload['chip_uuid'] is not None:
+    ...         frame = payload['warped'].copy()  # Computed on first access.
+    '''
+    def __init__(self, views=None, **fields):
+        self._fields = fields
+        self._views = dict(views or {})
+        self._lock = threading.RLock()
+        self.closed = False
+
+    def _names(self):
+        names = set(self._fields) | set(self._views)
+        rgb_names = ['%s_rgb' % name for name in names
+                     if name in self._views or name == 'raw_frame']
+        return names | set(rgb_names)
+
+    def __getitem__(self, key):
+        try:
+            return self._fields[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key in self._fields:
+                return self._fields[key]
+            if key in self._views:
+                if self.closed:
+                    raise RuntimeError('View `%s` was not computed before '
+                                       'frame buffers were reused.' % key)
+                value = self._views[key]()
+            elif key.endswith('_rgb') and key in self._names():
+                frame = self[key[:-len('_rgb')]]
+                value = (None if frame is None
+                         else cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            else:
+                raise KeyError(key)
+            self._fields[key] = value
+            return value
+
+    def __contains__(self, key):
+        # Do not compute view to check membership.
+        return key in self._names()
+
+    def __iter__(self):
+        return iter(sorted(self._names()))
+
+    def __len__(self):
+        return len(self._names())
+
+    def computed(self, key):
+        '''
+        Returns
+        -------
+        bool
+            ``True`` if ``key`` is available without computation.
+        '''
+        return key in self._fields
+
+    def close(self):
+        '''
+        Mark payload as closed; views that have not been computed yet are no
+        longer available.
+        '''
+        with self._lock:
+            self.closed = True
+
+    def detach(self, views=()):
+        '''
+        Copy payload, e.g., to keep it beyond the signal callback.
+
+        Parameters
+        ----------
+        views : list[str], optional
+            Views to compute before copying.
+
+        Returns
+        -------
+        FramePayload
+            Closed payload where all array fields (including computed views)
+            are copies, i.e., do not reference reusable frame buffers.  Views
+            that were not computed are not available.
+        '''
+        with self._lock:
+            for view in views:
+                self[view]
+            fields = {k: v.copy() if isinstance(v, np.ndarray) else v
+                      for k, v in self._fields.items()}
+            # Keep view names, so uncomputed views raise `RuntimeError`
+            # (instead of `KeyError`), and RGB copies remain available.
+            payload = FramePayload(views={k: None for k in self._views},
+                                   **fields)
+        payload.close()
+        return payload
+
+
+def _receiver_arguments(receiver):
+    '''
+    Returns
+    -------
+    tuple(bool, bool)
+        Whether ``receiver`` has a ``payload`` argument, and whether it accepts
+        arbitrary keyword arguments.  If the signature cannot be inspected,
+        ``receiver`` is assumed to have a ``payload`` argument.
+    '''
+    while isinstance(receiver, ft.partial):
+        receiver = receiver.func
+    if not (inspect.isfunction(receiver) or inspect.ismethod(receiver)):
+        receiver = getattr(receiver, '__call__', None)
+    try:
+        spec = getargspec(receiver)
+    except TypeError:
+        return True, False
+    names = list(spec[0]) + list(getattr(spec, 'kwonlyargs', None) or [])
+    return 'payload' in names, spec[2] is not None
+
+
+def send_payload(signal, sender, payload, legacy_fields=LEGACY_FIELDS):
+    '''
+    Send ``frame-ready`` message to receivers of ``signal``.
+
+    Receivers with a ``payload`` argument are called with the ``payload``
+    keyword argument only.  For compatibility, other receivers are also sent
+    the ``legacy_fields`` of ``payload`` as keyword arguments (computing the
+    corresponding views).  Receivers accepting arbitrary keyword arguments
+    are sent both.
+
+    .. deprecated:: 0.13.0
+        ``frame-ready`` keyword arguments other than ``payload`` will no
+        longer be sent in the next release; receivers must accept a
+        ``payload`` argument.
+
+    Parameters
+    ----------
+    signal : blinker.Signal
+        Signal to send.
+    sender : object
+        Sender of message.
+    payload : FramePayload
+        Message payload.
+    legacy_fields : list[str], optional
+        Payload fields sent as keyword arguments to legacy receivers.
+    '''
+    legacy = None
+    for receiver in signal.receivers_for(sender):
+        has_payload, has_kwargs = _receiver_arguments(receiver)
+        if has_payload and not has_kwargs:
+            receiver(sender, payload=payload)
+            continue
+        if legacy is None:
+            legacy = {k: payload[k] for k in legacy_fields if k in payload}
+        kwargs = dict(legacy)
+        if has_kwargs:
+            kwargs['payload'] = payload
+        else:
+            warnings.warn('`frame-ready` receiver `%s` does not accept a '
+                          '`payload` argument; keyword arguments `%s` will '
+                          'no longer be sent in the next release.' %
+                          (getattr(receiver, '__name__', receiver),
+                           '`, `'.join(sorted(legacy))), DeprecationWarning)
+        receiver(sender, **kwargs)
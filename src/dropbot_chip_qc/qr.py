@@ -0,0 +1,468 @@
+# -*- encoding: utf-8 -*-
+'''
+Chip UUID detection from QR codes, decoded off the video processing thread.
+
+Decoders are functions with the same interface as :func:`pyzbar.pyzbar.decode`
+(see :data:`DECODERS`).
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from collections import OrderedDict
+import functools
+import logging
+import threading
+import time
+import timeit
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import cv2
+import numpy as np
+import pyzbar.pyzbar as pyzbar
+from pyzbar.locations import Point, Rect
+
+from .warp import project
+
+
+# One detector per thread.
+_opencv_detectors = threading.local()
+
+
+def decoded(data, corners, type_='QRCODE'):
+    '''
+    Parameters
+    ----------
+    data : bytes or str
+        Decoded data.
+    corners : numpy.ndarray
+        ``Nx2`` array of symbol corners.
+    type_ : str, optional
+        Symbol type.
+
+    Returns
+    -------
+    pyzbar.pyzbar.Decoded
+        Decoded symbol, as returned by :func:`pyzbar.pyzbar.decode`.
+    '''
+    if not isinstance(data, bytes):
+        data = data.encode('utf8')
+    corners = np.asarray(corners, dtype='float32').reshape(-1, 2)
+    polygon = [Point(int(round(x)), int(round(y))) for x, y in corners]
+    rect = Rect(*cv2.boundingRect(np.round(corners).astype('int32')))
+    fields = {'data': data, 'type': type_, 'rect': rect, 'polygon': polygon}
+    # Fields of `Decoded` depend on `pyzbar` version.
+    return pyzbar.Decoded(**{f: fields.get(f)
+                             for f in pyzbar.Decoded._fields})
+
+
+def opencv_decode(image):
+    '''
+    Decode QR codes using :class:`cv2.QRCodeDetector`.
+
+    Same interface as :func:`pyzbar.pyzbar.decode`.
+
+    Parameters
+    ----------
+    image : numpy.ndarray
+        Grayscale or BGR image.
+
+    Returns
+    -------
+    list[pyzbar.pyzbar.Decoded]
+        Decoded symbols.
+    '''
+    detector = getattr(_opencv_detectors, 'detector', None)
+    if detector is None:
+        detector = _opencv_detectors.detector = cv2.QRCodeDetector()
+    if hasattr(detector, 'detectAndDecodeMulti'):
+        result = detector.detectAndDecodeMulti(image)
+        if not result[0]:
+            return []
+        texts, points = result[1:3]
+    else:
+        # OpenCV < 4.3 only decodes a single QR code.
+        text, points = detector.detectAndDecode(image)[:2]
+        if not text:
+            return []
+        texts, points = [text], points.reshape(1, -1, 2)
+    return [decoded(text, corners) for text, corners in zip(texts, points)
+            if text]
+
+
+#: Available QR code decoders, by name.
+DECODERS = OrderedDict([('pyzbar', pyzbar.decode),
+                        ('opencv', opencv_decode)])
+
+
+def get_decoder(decoder):
+    '''
+    Parameters
+    ----------
+    decoder : str or function
+        Decoder name (see :data:`DECODERS`) or function with the same
+        interface as :func:`pyzbar.pyzbar.decode`.
+
+    Returns
+    -------
+    function
+        Decoder function.
+    '''
+    if callable(decoder):
+        return decoder
+    try:
+        return DECODERS[decoder]
+    except KeyError:
+        raise ValueError('Unknown QR decoder: `%s`.  Must be one of: %s' %
+                         (decoder, ', '.join(DECODERS)))
+
+
+def transform_region(M, region, size=None, padding=.25):
+    '''
+    Parameters
+    ----------
+    M : numpy.ndarray
+        ``3x3`` perspective transformation matrix.
+    region : tuple(float, float, float, float)
+        ``(x0, y0, x1, y1)`` bounding box.
+    size : tuple(int, int), optional
+        ``(width, height)`` of image to clip transformed region to.
+    padding : float, optional
+        Padding added around transformed region, as a fraction of its size.
+
+    Returns
+    -------
+    tuple(int, int, int, int)
+        ``(x, y, width, height)`` bounding box of transformed ``region``.
+    '''
+    x0, y0, x1, y1 = region
+    points = project(M, [[x0, y0], [x1, y0], [x1, y1], [x0, y1]])
+    (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+    pad_x, pad_y = padding * (x1 - x0), padding * (y1 - y0)
+    x0, y0, x1, y1 = x0 - pad_x, y0 - pad_y, x1 + pad_x, y1 + pad_y
+    if size is not None:
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(size[0], x1), min(size[1], y1)
+    return (int(x0), int(y0), max(0, int(np.ceil(x1 - x0))),
+            max(0, int(np.ceil(y1 - y0))))
+
+
+def scale_decoded(decoded_object, scale, offset=(0, 0)):
+    '''
+    Map position of a decoded symbol back to full-resolution frame coordinates.
+
+    Parameters
+    ----------
+    decoded_object : pyzbar.pyzbar.Decoded
+        Decoded symbol.
+    scale : float
+        Scale factor of image the symbol was decoded from, relative to the full
+        resolution frame.
+    offset : tuple(int, int), optional
+        ``(x, y)`` offset of decoded image (after scaling) within the frame.
+
+    Returns
+    -------
+    pyzbar.pyzbar.Decoded
+        Copy of ``decoded_object`` with ``rect`` and ``polygon`` in frame
+        coordinates.
+    '''
+    x0, y0 = offset
+    rect = decoded_object.rect
+    rect = type(rect)(int(round(rect[0] / scale + x0)),
+                      int(round(rect[1] / scale + y0)),
+                      int(round(rect[2] / scale)),
+                      int(round(rect[3] / scale)))
+    polygon = [type(p)(int(round(p[0] / scale + x0)),
+                       int(round(p[1] / scale + y0)))
+               for p in decoded_object.polygon]
+    return decoded_object._replace(rect=rect, polygon=polygon)
+
+
+def candidate_regions(gray, max_regions=2, min_size=16):
+    '''
+    Find regions of an image likely to contain a QR code.
+
+    Uses the classic high-gradient blob heuristic: QR codes are dense, roughly
+    square patches of strong horizontal *and* vertical edges.
+
+    Parameters
+    ----------
+    gray : numpy.ndarray
+        Grayscale image.
+    max_regions : int, optional
+        Maximum number of regions to return.
+    min_size : int, optional
+        Minimum width and height of a region (in pixels).
+
+    Returns
+    -------
+    list[tuple(int, int, int, int)]
+        ``(x, y, width, height)`` bounding boxes, largest first.
+    '''
+    grad_x = cv2.Sobel(gray, cv2.CV_16S, 1, 0, ksize=3)
+    grad_y = cv2.Sobel(gray, cv2.CV_16S, 0, 1, ksize=3)
+    gradient = cv2.addWeighted(cv2.convertScaleAbs(grad_x), .5,
+                               cv2.convertScaleAbs(grad_y), .5, 0)
+    gradient = cv2.blur(gradient, (5, 5))
+    _, mask = cv2.threshold(gradient, 0, 255,
+                            cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 7))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+    mask = cv2.erode(mask, None, iterations=2)
+    mask = cv2.dilate(mask, None, iterations=2)
+    # `findContours` returns 2 or 3 values depending on OpenCV version.
+    contours = cv2.findContours(mask, cv2.RETR_EXTERNAL,
+                                cv2.CHAIN_APPROX_SIMPLE)[-2]
+    regions = []
+    for contour in sorted(contours, key=cv2.contourArea, reverse=True):
+        x, y, width, height = cv2.boundingRect(contour)
+        if min(width, height) < min_size:
+            continue
+        if max(width, height) > 2 * min(width, height):
+            # QR codes are square (allowing for perspective).
+            continue
+        regions.append((x, y, width, height))
+        if len(regions) >= max_regions:
+            break
+    return regions
+
+
+def decode_adaptive(gray, small, scale, decode=pyzbar.decode, padding=.25,
+                    hints=None):
+    '''
+    Decode QR codes, escalating to full resolution only where necessary.
+
+    First attempt to decode any ``hints`` regions of the full resolution
+    image, then the downscaled image.  If nothing is decoded, look for
+    candidate QR code regions in the downscaled image and decode only the
+    corresponding (padded) regions of the full resolution image.
+
+    Parameters
+    ----------
+    gray : numpy.ndarray or function
+        Full resolution grayscale frame, or function returning it (only called
+        if candidate regions need to be decoded, e.g., to defer decoding a
+        compressed frame).
+    small : numpy.ndarray
+        Downscaled copy of ``gray``.
+    scale : float
+        Scale factor of ``small`` relative to ``gray``.
+    decode : function, optional
+        Decoder, with the same interface as :func:`pyzbar.pyzbar.decode`.
+    padding : float, optional
+        Padding added around each candidate region, as a fraction of the
+        region size.
+    hints : list[tuple(int, int, int, int)], optional
+        ``(x, y, width, height)`` regions (in full resolution coordinates)
+        likely to contain a QR code, e.g., based on AruCo marker positions.
+
+    Returns
+    -------
+    list[pyzbar.pyzbar.Decoded]
+        Decoded symbols, in full resolution frame coordinates.
+    '''
+    if hints:
+        if callable(gray):
+            gray = gray()
+        for x0, y0, w, h in hints:
+            if w <= 0 or h <= 0:
+                continue
+            decoded_objects = decode(gray[y0:y0 + h, x0:x0 + w])
+            if decoded_objects:
+                return [scale_decoded(d, 1., offset=(x0, y0))
+                        for d in decoded_objects]
+    decoded_objects = decode(small)
+    if decoded_objects:
+        return [scale_decoded(d, scale) for d in decoded_objects]
+    regions = candidate_regions(small)
+    if not regions:
+        return []
+    if callable(gray):
+        gray = gray()
+    height, width = gray.shape[:2]
+    for x, y, w, h in regions:
+        pad_x = int(w * padding)
+        pad_y = int(h * padding)
+        x0 = max(0, int((x - pad_x) / scale))
+        y0 = max(0, int((y - pad_y) / scale))
+        x1 = min(width, int((x + w + pad_x) / scale))
+        y1 = min(height, int((y + h + pad_y) / scale))
+        decoded_objects = decode(gray[y0:y1, x0:x1])
+        if decoded_objects:
+            return [scale_decoded(d, 1., offset=(x0, y0))
+                    for d in decoded_objects]
+    return []
+
+
+class QrDecodeScheduler(object):
+    '''
+    Decode QR codes in a pool of worker threads at a configurable cadence.
+
+    :meth:`submit` is cheap to call on every video frame: a frame is only
+    converted (to a downscaled grayscale copy) and queued if the decode
+    interval has elapsed and a worker is free.  Results are collected with
+    :meth:`result` or delivered to a ``callback``.
+
+    Parameters
+    ----------
+    interval : float, optional
+        Minimum time between submitted frames (in seconds).
+    scale : float, optional
+        Scale factor applied to frames before first decode attempt.
+    workers : int, optional
+        Number of decode worker threads.
+    decode : str or function, optional
+        Decoder name (see :data:`DECODERS`), or function with the same
+        interface as :func:`pyzbar.pyzbar.decode`.
+    callback : function, optional
+        Called from worker thread as ``callback(decoded_objects)`` whenever
+        symbols are decoded.
+    stage_timer : dropbot_chip_qc.timing.StageTimer, optional
+        If provided, record time taken by each decode attempt as
+        ``qr_decode`` stage.
+    '''
+    def __init__(self, interval=.1, scale=.5, workers=1, decode='pyzbar',
+                 callback=None, stage_timer=None):
+        self.interval = interval
+        self.scale = scale
+        self.decode = get_decoder(decode)
+        self.callback = callback
+        self.stage_timer = stage_timer
+        self._queue = queue.Queue(maxsize=workers)
+        self._threads = [threading.Thread(target=self._work,
+                                          name='QrDecodeWorker-%d' % i)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.daemon = True
+        self._lock = threading.Lock()
+        self._result = None
+        self._generation = 0
+        self._last_submit = 0
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        '''
+        Discard queued frames and wait for workers to finish current decode.
+        '''
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        # Only this thread adds to queue, so there is room for each sentinel.
+        for thread in self._threads:
+            self._queue.put_nowait(None)
+        for thread in self._threads:
+            if thread.ident is not None:
+                thread.join()
+
+    def reset(self):
+        '''
+        Discard pending result and results of frames already submitted (e.g.,
+        after the chip has been removed).
+        '''
+        with self._lock:
+            self._generation += 1
+            self._result = None
+
+    def submit(self, frame, encoded=None, frame_scale=1., hints=None):
+        '''
+        Queue frame for decoding, if interval has elapsed and worker is free.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            BGR video frame.  Not referenced after this call returns.
+        encoded : numpy.ndarray, optional
+            Compressed full resolution copy of ``frame`` (e.g., MJPEG buffer).
+            If provided, it is only decoded (by the worker) if candidate QR
+            code regions need to be decoded at full resolution.
+        frame_scale : float, optional
+            Scale of ``frame`` relative to ``encoded``.  Decoded symbols are
+            returned in ``frame`` coordinates.
+        hints : list[tuple(int, int, int, int)], optional
+            ``(x, y, width, height)`` regions of ``frame`` likely to contain a
+            QR code; decoded first (see :func:`decode_adaptive`).
+
+        Returns
+        -------
+        bool
+            ``True`` if frame was queued.
+        '''
+        now = time.time()
+        if now - self._last_submit < self.interval or self._queue.full():
+            return False
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if encoded is None:
+            frame_scale = 1.
+        # Scale of first decode attempt relative to `gray`.
+        scale = min(1., self.scale / frame_scale)
+        if scale < 1:
+            small = cv2.resize(gray, None, fx=scale, fy=scale,
+                               interpolation=cv2.INTER_AREA)
+        else:
+            small = gray
+        if encoded is not None:
+            # Defer full resolution decode to worker (only if necessary).
+            gray = functools.partial(cv2.imdecode, encoded,
+                                     cv2.IMREAD_GRAYSCALE)
+        if hints:
+            # Full resolution coordinates.
+            hints = [tuple(int(round(v / frame_scale)) for v in hint)
+                     for hint in hints]
+        try:
+            self._queue.put_nowait((self._generation, gray, small,
+                                    scale * frame_scale, frame_scale, hints))
+        except queue.Full:
+            return False
+        self._last_submit = now
+        return True
+
+    def result(self):
+        '''
+        Returns
+        -------
+        list[pyzbar.pyzbar.Decoded]
+            Most recently decoded symbols (empty if none since last call).
+        '''
+        with self._lock:
+            result, self._result = self._result, None
+        return result or []
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            generation, gray, small, scale, frame_scale, hints = item
+            start = timeit.default_timer()
+            try:
+                decoded_objects = decode_adaptive(gray, small, scale,
+                                                  decode=self.decode,
+                                                  hints=hints)
+                if frame_scale != 1:
+                    decoded_objects = [scale_decoded(d, 1. / frame_scale)
+                                       for d in decoded_objects]
+            except Exception:
+                logging.warning('Error decoding QR code.', exc_info=True)
+                continue
+            finally:
+                if self.stage_timer is not None:
+                    self.stage_timer.record('qr_decode',
+                                            timeit.default_timer() - start)
+            if not decoded_objects:
+                continue
+            with self._lock:
+                if generation != self._generation:
+                    continue
+                self._result = decoded_objects
+            if self.callback is not None:
+                self.callback(decoded_objects)
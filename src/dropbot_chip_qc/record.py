@@ -0,0 +1,216 @@
+# -*- encoding: utf-8 -*-
+'''
+Background recording of video frames.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import logging
+import os
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+import cv2
+import numpy as np
+
+
+class VideoRecorder(object):
+    '''
+    Encode video frames to a file in a background thread.
+
+    :meth:`write` copies the frame into a free buffer and returns
+    immediately; encoding happens in a writer thread, so encoding never stalls
+    the caller.  Buffers are allocated as needed, up to a limit; if all
+    buffers are waiting to be encoded, the frame is dropped (and counted in
+    :attr:`dropped_count`).
+
+    Frames written with a ``timestamp`` are placed in the video according to
+    their capture time: the previous frame is repeated to fill gaps (e.g.,
+    frames dropped by the camera or processing loop), and frames arriving
+    faster than ``fps`` are dropped.  Recorded video therefore plays back in
+    real time regardless of the rate frames are written at.
+
+    Parameters
+    ----------
+    path : str
+        Output video file path.
+    fps : float, optional
+        Video frame rate.
+    fourcc : str, optional
+        Four character code of video codec.
+    max_queue : int, optional
+        Maximum number of frames waiting to be encoded (default: as many as
+        fit in ``max_bytes``).
+    max_bytes : int, optional
+        Maximum total size of frame buffers, in bytes.
+
+    Attributes
+    ----------
+    written_count : int
+        Number of frames encoded (including repeated frames).
+    dropped_count : int
+        Number of frames dropped, either because all buffers were waiting to
+        be encoded or because frames arrived faster than ``fps``.
+    duplicated_count : int
+        Number of repeated frames encoded to fill gaps between timestamps.
+    '''
+    def __init__(self, path, fps=30., fourcc='mp4v', max_queue=None,
+                 max_bytes=64 << 20):
+        self.path = path
+        self.fps = fps
+        self.fourcc = fourcc
+        self.max_queue = max_queue
+        self.max_bytes = max_bytes
+        self.written_count = 0
+        self.dropped_count = 0
+        self.duplicated_count = 0
+        self._pending = queue.Queue()
+        self._free = None
+        self._buffer_count = 0
+        self._max_buffers = None
+        self._thread = threading.Thread(target=self._write_frames,
+                                        name='VideoRecorder')
+        self._thread.daemon = True
+        self._closed = False
+        # Counters are updated from both the caller and writer threads.
+        self._lock = threading.Lock()
+
+    def write(self, frame, timestamp=None):
+        '''
+        Queue frame to be written.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            BGR video frame.  Not referenced after this call returns.
+        timestamp : float, optional
+            Capture time of frame, in seconds.  If not set, frame is written
+            once, i.e., video timing assumes frames are written at ``fps``.
+
+        Returns
+        -------
+        bool
+            ``True`` if frame was queued; ``False`` if it was dropped.
+        '''
+        if self._closed:
+            raise IOError('Recorder is closed.')
+        if self._free is None:
+            # Size buffer pool based on size of first frame and start writer
+            # thread.  One extra buffer holds the previous frame, which is
+            # repeated to fill gaps.
+            max_buffers = max(1, self.max_bytes // frame.nbytes)
+            if self.max_queue is not None:
+                max_buffers = min(max_buffers, self.max_queue)
+            self._max_buffers = max_buffers + 1
+            self._free = queue.Queue()
+            self._thread.start()
+        try:
+            buffer_ = self._free.get_nowait()
+        except queue.Empty:
+            if self._buffer_count >= self._max_buffers:
+                with self._lock:
+                    self.dropped_count += 1
+                return False
+            buffer_ = np.empty_like(frame)
+            self._buffer_count += 1
+        buffer_[:] = frame
+        self._pending.put((buffer_, timestamp))
+        return True
+
+    def close(self):
+        '''
+        Finish writing queued frames and close video file.
+        '''
+        if self._closed:
+            return
+        self._closed = True
+        if self._free is not None:
+            self._pending.put(None)
+            self._thread.join()
+
+    def _write_frames(self):
+        writer = None
+        # Previous frame written, capture time of first timestamped frame, and
+        # index of next frame in video.
+        previous = None
+        start_time = None
+        index = 0
+        try:
+            while True:
+                item = self._pending.get()
+                if item is None:
+                    break
+                frame, timestamp = item
+                if writer is None:
+                    height, width = frame.shape[:2]
+                    writer = cv2.VideoWriter(self.path,
+                                             cv2.VideoWriter_fourcc(*self
+                                                                    .fourcc),
+                                             self.fps, (width, height))
+                    logging.info('recording video to: `%s`', self.path)
+                if timestamp is not None:
+                    if start_time is None:
+                        start_time = timestamp - index / self.fps
+                    frame_index = int(round((timestamp - start_time) *
+                                            self.fps))
+                    if frame_index < index:
+                        # Frame arrived faster than video frame rate.
+                        with self._lock:
+                            self.dropped_count += 1
+                        self._free.put(frame)
+                        continue
+                    if previous is not None:
+                        # Repeat previous frame until capture time of frame.
+                        for i in range(frame_index - index):
+                            writer.write(previous)
+                        with self._lock:
+                            self.duplicated_count += frame_index - index
+                            self.written_count += frame_index - index
+                    index = frame_index
+                writer.write(frame)
+                with self._lock:
+                    self.written_count += 1
+                index += 1
+                if previous is not None:
+                    self._free.put(previous)
+                previous = frame
+        finally:
+            if writer is not None:
+                writer.release()
+
+
+def recording_paths(record_path, uuid, views):
+    '''
+    Parameters
+    ----------
+    record_path : str or function
+        Either a path template containing ``%(uuid)s`` (and optionally
+        ``%(view)s``), or a function ``record_path(uuid, view)`` returning the
+        output path.
+    uuid : str
+        Chip UUID.
+    views : list[str]
+        Views to record, e.g., ``['warped', 'raw']``.
+
+    Returns
+    -------
+    dict
+        Output path of each view.  If a template without ``%(view)s`` is used
+        to record more than one view, views other than the first are suffixed
+        with ``-<view>``.
+    '''
+    paths = {}
+    for i, view in enumerate(views):
+        if callable(record_path):
+            paths[view] = record_path(uuid, view)
+            continue
+        path = record_path % {'uuid': uuid, 'view': view}
+        if i > 0 and '%(view)s' not in record_path:
+            root, ext = os.path.splitext(path)
+            path = '%s-%s%s' % (root, view, ext)
+        paths[view] = path
+    return paths
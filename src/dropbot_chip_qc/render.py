@@ -147,6 +147,11 @@ def summarize_results(events, **kwargs):
         Read software versions from ``test-start`` instead of
         ``test-complete``.  Add ``shorts_detected`` item to render context
         dictionary.
+    .. versionchanged:: 0.13.0
+        Render ``clips`` (list of dictionaries with ``title`` and
+        ``image_paths`` items), if provided.  Render count of connections
+        between channels that liquid was moved across, and list connections not
+        exercised, if recorded in the ``test-complete`` event.
     '''
     test_info = {}
     start_info = [e for e in events if e['event'] == 'test-start'][0]
@@ -162,6 +167,14 @@ def summarize_results(events, **kwargs):
                                               if e['event'] ==
                                               'shorts-detected'
                                               for c in e['values']))
+    complete_info = [e for e in events if e['event'] == 'test-complete']
+    if complete_info and 'exercised_connections' in complete_info[-1]:
+        exercised = complete_info[-1]['exercised_connections']
+        unexercised = complete_info[-1]['unexercised_connections']
+        test_info['connections'] = {'exercised_count': len(exercised),
+                                    'count': len(exercised) +
+                                    len(unexercised),
+                                    'unexercised': unexercised}
     test_info.update(kwargs)
     # Render DropBot system info using `dropbot.self_test` module functions.
     test_info.update({'dropbot':
@@ -191,9 +204,23 @@ def summarize_results(events, **kwargs):
 {%- endif %}
  - **Failed electrodes:** `{{ fail_electrodes }}`
  - **Skipped electrodes:** `{{ skip_electrodes }}`
+{%- if connections %}
+ - **Exercised connections:** {{ connections.exercised_count }} of {{ connections.count }}
+{%- if connections.unexercised %}
+ - **Unexercised connections:** `{{ connections.unexercised }}`
+{%- endif %}
+{%- endif %}
 {% if image_path %}
 ![]({{ image_path }})
 {% endif %}
+{% if clips %}
+## Failure clips
+{% for clip in clips %}
+### {{ clip.title }}
+
+{% for path in clip.image_paths %}![]({{ path }}) {% endfor %}
+{% endfor %}
+{% endif %}
 # DropBot system info
 
 {{ dropbot.system_info }}
@@ -203,7 +230,30 @@ def summarize_results(events, **kwargs):
     return template.render(**test_info)
 
 
-def render_summary(events, output_path, svg_source=None):
+def render_summary(events, output_path, svg_source=None, clips=None,
+                   max_clip_frames=8):
+    '''
+    Parameters
+    ----------
+    events : list[dict]
+        Logged test events.
+    output_path : str
+        Output HTML file path.
+    svg_source : str or file-like, optional
+        A file path, URI, or file-like object containing DropBot chip SVG
+        source.
+    clips : list[dict], optional
+        Video clips to embed in report, each with the items ``event``,
+        ``source``, ``target``, ``attempt``, and ``frames`` (list of
+        timestamp and JPEG data pairs, see
+        :meth:`dropbot_chip_qc.history.FrameHistory.clip`).
+    max_clip_frames : int, optional
+        Maximum number of (evenly spaced) frames embedded per clip.
+
+
+    .. versionchanged:: 0.13.0
+        Add ``clips`` and ``max_clip_frames`` keyword arguments.
+    '''
     # Create temporary working directory.
     parent_dir = ph.path(tempfile.mkdtemp(prefix='dropbot-chip-qc'))
 
@@ -231,9 +281,25 @@ def render_summary(events, output_path, svg_source=None):
             fig.savefig(image_path, bbox_inches='tight')
             plt.close(fig)
 
+        # Write subset of frames of each clip to JPEG files.
+        clips_ = []
+        for i, clip in enumerate(clips or []):
+            frames = clip['frames']
+            step = max(1, -(-len(frames) // max_clip_frames))
+            image_paths = []
+            for j, (timestamp, data) in enumerate(frames[::step]):
+                path_ij = parent_dir.joinpath('clip-%03d-%03d.jpg' % (i, j))
+                path_ij.write_bytes(data)
+                image_paths.append(path_ij)
+            title = ('`%s`: `%s` -> `%s` (attempt %s)' %
+                     (clip['event'], clip['source'], clip['target'],
+                      clip['attempt']))
+            clips_.append({'title': title, 'image_paths': image_paths})
+
         # Generate Markdown test results summary.
         markdown_summary = summarize_results(events, image_path=image_path,
-                                             qr_uuid_path=qr_uuid_path)
+                                             qr_uuid_path=qr_uuid_path,
+                                             clips=clips_)
 
         # Write test results output to `README.md`
         markdown_path = parent_dir.joinpath('README.md')
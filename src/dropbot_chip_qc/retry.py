@@ -0,0 +1,217 @@
+# -*- encoding: utf-8 -*-
+'''
+Retry policies for liquid moves: number of attempts, timeout of each attempt,
+and (non-blocking) delay between attempts.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from collections import OrderedDict
+
+import trollius as asyncio
+
+
+class RetryPolicy(object):
+    '''
+    Fixed retry policy: same timeout for every attempt and same delay after
+    each failed attempt.
+
+    Defaults match the original hard-coded single-drop test behaviour.
+
+    Parameters
+    ----------
+    attempts : int, optional
+        Maximum number of attempts per move.
+    timeout : float, optional
+        Maximum duration of each attempt, in seconds.
+    delay : float, optional
+        Delay after a failed attempt (before the next attempt), in seconds.
+
+    Attributes
+    ----------
+    success_count : int
+        Number of successful attempts recorded (see :meth:`record`).
+    failure_count : int
+        Number of failed attempts recorded (see :meth:`record`).
+    '''
+    def __init__(self, attempts=3, timeout=4., delay=1.):
+        if attempts < 1:
+            raise ValueError('At least one attempt is required.')
+        self.attempts = attempts
+        self.max_timeout = timeout
+        self.base_delay = delay
+        self.success_count = 0
+        self.failure_count = 0
+
+    def __repr__(self):
+        return ('%s(attempts=%d, timeout=%g, delay=%g)' %
+                (type(self).__name__, self.attempts, self.max_timeout,
+                 self.base_delay))
+
+    def timeout(self, attempt):
+        '''
+        Parameters
+        ----------
+        attempt : int
+            Attempt number (starting at 1).
+
+        Returns
+        -------
+        float
+            Maximum duration of attempt, in seconds.
+        '''
+        return self.max_timeout
+
+    def delay(self, attempt):
+        '''
+        Parameters
+        ----------
+        attempt : int
+            Number of the failed attempt (starting at 1).
+
+        Returns
+        -------
+        float
+            Delay before next attempt, in seconds.
+        '''
+        return self.base_delay
+
+    def record(self, duration, success):
+        '''
+        Record outcome of an attempt.
+
+        Parameters
+        ----------
+        duration : float
+            Duration of attempt, in seconds.
+        success : bool
+            ``True`` if liquid move succeeded.
+        '''
+        if success:
+            self.success_count += 1
+        else:
+            self.failure_count += 1
+
+    @asyncio.coroutine
+    def wait(self, attempt):
+        '''
+        Wait (without blocking the event loop) before the next attempt.
+
+        Parameters
+        ----------
+        attempt : int
+            Number of the failed attempt (starting at 1).
+        '''
+        delay = self.delay(attempt)
+        if delay > 0:
+            yield asyncio.From(asyncio.sleep(delay))
+
+
+class ExponentialBackoff(RetryPolicy):
+    '''
+    Retry policy with delay doubling (by default) after each failed attempt
+    of a move.
+
+    Parameters
+    ----------
+    attempts, timeout, delay
+        See :class:`RetryPolicy`; ``delay`` is the delay after the first
+        failed attempt.
+    factor : float, optional
+        Delay multiplier per failed attempt.
+    max_delay : float, optional
+        Maximum delay, in seconds.
+    '''
+    def __init__(self, attempts=3, timeout=4., delay=.25, factor=2.,
+                 max_delay=4.):
+        super(ExponentialBackoff, self).__init__(attempts=attempts,
+                                                 timeout=timeout, delay=delay)
+        self.factor = factor
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        return min(self.base_delay * self.factor ** (attempt - 1),
+                   self.max_delay)
+
+
+class AdaptiveRetry(RetryPolicy):
+    '''
+    Retry policy with attempt timeouts adapted to the durations of successful
+    moves so far.
+
+    Similar to TCP retransmission timeouts (RFC 6298), the timeout of a first
+    attempt is the smoothed mean duration of successful attempts plus four
+    times its smoothed mean deviation, clamped to ``[min_timeout,
+    timeout]``.  The timeout doubles with each retry of a move (up to
+    ``timeout``), so a slow electrode is still given the full timeout before
+    the move fails.  Until the first successful attempt, ``timeout`` is
+    used.
+
+    Parameters
+    ----------
+    attempts, timeout, delay
+        See :class:`RetryPolicy`.
+    min_timeout : float, optional
+        Minimum attempt timeout, in seconds.
+    gain : float, optional
+        Weight of each new duration in the smoothed mean; the mean deviation
+        uses twice this weight.
+    '''
+    def __init__(self, attempts=3, timeout=4., delay=.25, min_timeout=.5,
+                 gain=.125):
+        super(AdaptiveRetry, self).__init__(attempts=attempts,
+                                            timeout=timeout, delay=delay)
+        self.min_timeout = min_timeout
+        self.gain = gain
+        self.mean_duration = None
+        self.deviation = None
+
+    def timeout(self, attempt):
+        if self.mean_duration is None:
+            return self.max_timeout
+        timeout = max(self.mean_duration + 4 * self.deviation,
+                      self.min_timeout)
+        return min(timeout * 2 ** (attempt - 1), self.max_timeout)
+
+    def record(self, duration, success):
+        super(AdaptiveRetry, self).record(duration, success)
+        if not success:
+            return
+        if self.mean_duration is None:
+            self.mean_duration = duration
+            self.deviation = duration / 2
+        else:
+            self.deviation += (2 * self.gain *
+                               (abs(duration - self.mean_duration) -
+                                self.deviation))
+            self.mean_duration += self.gain * (duration - self.mean_duration)
+
+
+#: Retry policy classes, by name.
+RETRY_POLICIES = OrderedDict([('fixed', RetryPolicy),
+                              ('exponential', ExponentialBackoff),
+                              ('adaptive', AdaptiveRetry)])
+
+
+def retry_policy(name='fixed', **kwargs):
+    '''
+    Parameters
+    ----------
+    name : str, optional
+        Name of policy (see :data:`RETRY_POLICIES`).
+    **kwargs
+        Keyword arguments of policy class; arguments set to ``None`` are
+        ignored (i.e., policy defaults are used).
+
+    Returns
+    -------
+    RetryPolicy
+        Retry policy.
+    '''
+    try:
+        cls = RETRY_POLICIES[name]
+    except KeyError:
+        raise ValueError('Unknown retry policy `%s` (choices: %s).' %
+                         (name, ', '.join(RETRY_POLICIES)))
+    return cls(**{k: v for k, v in kwargs.items() if v is not None})
@@ -0,0 +1,336 @@
+# -*- encoding: utf-8 -*-
+'''
+Test route planning: actuation step counts of waypoint routes, minimum-move
+routes covering a set of test channels, and routes exercising every
+connection between channels.
+
+A test route is a list of waypoints; the liquid is moved along a shortest
+path between each consecutive pair of waypoints, and back to the first
+waypoint at the end (see :func:`dropbot_chip_qc.single_drop._run_test`).
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from collections import OrderedDict
+import functools as ft
+import io
+import itertools as it
+import timeit
+
+from dropbot.move import window
+import lxml.etree
+import networkx as nx
+import numpy as np
+
+from .paths import path_oracle
+
+
+def load_test_routes(svg_source):
+    '''
+    Parameters
+    ----------
+    svg_source : str or file-like
+        A file path, URI, or file-like object containing DropBot chip SVG
+        source.  File-like objects are rewound after parsing.
+
+    Returns
+    -------
+    OrderedDict
+        Waypoints of each ``<dmf:TestRoute>`` element in the SVG, keyed by
+        route id (see sci-bots/dmf-chip#1).
+    '''
+    try:
+        doc = lxml.etree.parse(svg_source)
+    finally:
+        if isinstance(svg_source, io.IOBase):
+            # "Rewind" file after parsing to pass to remaining code.
+            svg_source.seek(0)
+    root = doc.getroot()
+    NSMAP = {k: v for k, v in root.nsmap.items() if k is not None}
+    rxpath = ft.wraps(root.xpath)(ft.partial(root.xpath, namespaces=NSMAP))
+    routes = OrderedDict()
+    for route in rxpath('//dmf:ChipDesign/dmf:TestRoutes/'
+                        'dmf:TestRoute[@id!=""]'):
+        xpath_ = ft.wraps(route.xpath)(ft.partial(route.xpath,
+                                                  namespaces=NSMAP))
+        routes[route.attrib['id']] = [int(w.text)
+                                      for w in xpath_('dmf:Waypoint')]
+    return routes
+
+
+def walk(graph, way_points, loop=True):
+    '''
+    Parameters
+    ----------
+    graph : networkx.Graph, ChannelGraph, or PathOracle
+        Channel connections.
+    way_points : list
+        Test route waypoints.
+    loop : bool, optional
+        If ``True``, return to first waypoint at end of route.
+
+    Returns
+    -------
+    list
+        Channels visited consecutively by the route (one actuation step
+        between each consecutive pair).
+    '''
+    paths = path_oracle(graph)
+    way_points = list(way_points)
+    if loop:
+        way_points.append(way_points[0])
+    route = way_points[:1]
+    for source, target in window(way_points, 2):
+        if source != target:
+            route.extend(paths.path(source, target)[1:])
+    return route
+
+
+def route_steps(graph, way_points, loop=True):
+    '''
+    Returns
+    -------
+    int
+        Number of actuation steps of route (see :func:`walk`).
+    '''
+    return len(walk(graph, way_points, loop=loop)) - 1
+
+
+def distance_matrix(graph, nodes):
+    '''
+    Returns
+    -------
+    numpy.ndarray
+        Shortest path length (in steps) between each pair of ``nodes``.
+
+    Raises
+    ------
+    networkx.NetworkXNoPath
+        If any node is not reachable from the others.
+    '''
+    paths = path_oracle(graph)
+    distances = np.zeros((len(nodes), len(nodes)), dtype='int32')
+    for i, j in it.combinations(range(len(nodes)), 2):
+        distances[i, j] = distances[j, i] = paths.distance(nodes[i],
+                                                           nodes[j])
+    return distances
+
+
+def _tour_length(distances, tour):
+    return distances[tour, np.roll(tour, -1)].sum()
+
+
+def _two_opt(distances, tour, deadline):
+    # Repeatedly reverse the segment `tour[i:j + 1]` that shortens the
+    # (closed) tour the most; `tour[0]` stays in place.
+    tour = np.array(tour)
+    size = len(tour)
+    i, j = np.triu_indices(size - 1, k=1)
+    i += 1
+    j += 1
+    while timeit.default_timer() < deadline:
+        a, b = tour[i - 1], tour[i]
+        c, d = tour[j], tour[(j + 1) % size]
+        delta = (distances[a, c] + distances[b, d] - distances[a, b] -
+                 distances[c, d])
+        best = delta.argmin()
+        if delta[best] >= 0:
+            break
+        tour[i[best]:j[best] + 1] = tour[i[best]:j[best] + 1][::-1].copy()
+    return tour
+
+
+def _double_bridge(tour, random):
+    p, q, r = np.sort(random.choice(np.arange(1, len(tour)), 3,
+                                    replace=False))
+    return np.concatenate([tour[:p], tour[q:r], tour[p:q], tour[r:]])
+
+
+def optimize_route(graph, channels, start=None, time_budget=1., seed=0):
+    '''
+    Find a (near) minimum-move test route visiting all ``channels``.
+
+    The order of channels is a travelling salesman tour over shortest path
+    lengths, found by nearest neighbour construction and 2-opt improvement,
+    followed by randomly perturbed restarts (iterated local search) while
+    time is left.  Waypoints that the route passes over anyway are then
+    dropped.
+
+    Parameters
+    ----------
+    graph : networkx.Graph, ChannelGraph, or PathOracle
+        Channel connections.
+    channels : list
+        Channels to test.
+    start : optional
+        First waypoint (default: first of ``channels``).
+    time_budget : float, optional
+        Maximum optimization time, in seconds (approximate).
+    seed : int, optional
+        Random seed of perturbations.
+
+    Returns
+    -------
+    list
+        Test route waypoints, starting at ``start``.
+    '''
+    deadline = timeit.default_timer() + time_budget
+    paths = path_oracle(graph)
+    channels = list(channels)
+    if start is None:
+        start = channels[0]
+    # Unique channels, starting with `start`.
+    nodes = [start] + sorted(set(channels) - {start})
+    if len(nodes) < 4:
+        return nodes
+    distances = distance_matrix(paths, nodes)
+
+    # Nearest neighbour tour.
+    tour = [0]
+    remaining = set(range(1, len(nodes)))
+    while remaining:
+        row = distances[tour[-1]]
+        tour.append(min(remaining, key=lambda k: (row[k], k)))
+        remaining.remove(tour[-1])
+    best = _two_opt(distances, tour, deadline)
+    best_length = _tour_length(distances, best)
+
+    random = np.random.RandomState(seed)
+    while timeit.default_timer() < deadline:
+        candidate = _two_opt(distances, _double_bridge(best, random),
+                             deadline)
+        length = _tour_length(distances, candidate)
+        if length < best_length:
+            best, best_length = candidate, length
+
+    way_points = [nodes[k] for k in best]
+    return prune_way_points(paths, way_points, channels)
+
+
+def prune_way_points(graph, way_points, channels=None, loop=True):
+    '''
+    Parameters
+    ----------
+    graph : networkx.Graph, ChannelGraph, or PathOracle
+        Channel connections.
+    way_points : list
+        Test route waypoints.
+    channels : list, optional
+        Channels that must be visited (default: ``way_points``).
+    loop : bool, optional
+        If ``True``, return to first waypoint at end of route.
+
+    Returns
+    -------
+    list
+        ``way_points`` without the waypoints (except the first) that are not
+        required for the route to visit all ``channels``, where dropping a
+        waypoint does not add steps.
+    '''
+    paths = path_oracle(graph)
+    channels = set(way_points if channels is None else channels)
+    way_points = list(way_points)
+    steps = route_steps(paths, way_points, loop=loop)
+    i = 1
+    while i < len(way_points):
+        way_points_i = way_points[:i] + way_points[i + 1:]
+        route_i = walk(paths, way_points_i, loop=loop)
+        if len(route_i) - 1 <= steps and channels.issubset(route_i):
+            way_points = way_points_i
+            steps = len(route_i) - 1
+        else:
+            i += 1
+    return way_points
+
+
+def _match_pairs(distances):
+    # Greedy minimum weight perfect matching, improved by exchanging partners
+    # between pairs of pairs.
+    i, j = np.triu_indices(len(distances), k=1)
+    matched = np.zeros(len(distances), dtype=bool)
+    pairs = []
+    for k in np.argsort(distances[i, j], kind='mergesort'):
+        if not (matched[i[k]] or matched[j[k]]):
+            pairs.append((i[k], j[k]))
+            matched[[i[k], j[k]]] = True
+    improved = True
+    while improved:
+        improved = False
+        for x, y in it.combinations(range(len(pairs)), 2):
+            (a, b), (c, d) = pairs[x], pairs[y]
+            length = distances[a, b] + distances[c, d]
+            if distances[a, c] + distances[b, d] < length:
+                pairs[x], pairs[y] = (a, c), (b, d)
+                improved = True
+            elif distances[a, d] + distances[b, c] < length:
+                pairs[x], pairs[y] = (a, d), (b, c)
+                improved = True
+    return pairs
+
+
+def edge_coverage_route(graph, start, edges=None):
+    '''
+    Find a (near) minimum-move closed route from ``start`` that moves liquid
+    across every connection in ``edges`` at least once, i.e., a (rural)
+    Chinese postman route.
+
+    Connections are duplicated along shortest paths until the multigraph of
+    connections is connected (shortest connections between components of
+    required connections first) and every channel has even degree (pairing
+    odd degree channels by greedy matching of shortest path lengths); the
+    route is an Eulerian circuit of the resulting multigraph.
+
+    Parameters
+    ----------
+    graph : networkx.Graph, ChannelGraph, or PathOracle
+        Channel connections.
+    start
+        First (and last) channel of route.
+    edges : list[tuple], optional
+        Connections to exercise (default: all connections of graph).
+        Connections not reachable from ``start`` are ignored.
+
+    Returns
+    -------
+    list
+        Channels visited consecutively by the route.
+    '''
+    paths = path_oracle(graph)
+    reachable = set(paths.reachable(start))
+    edges = paths.edges() if edges is None else edges
+    multigraph = nx.MultiGraph()
+    multigraph.add_node(start)
+    multigraph.add_edges_from((a, b) for a, b in edges
+                              if a in reachable and b in reachable)
+
+    def add_path(source, target):
+        nx.add_path(multigraph, paths.path(source, target))
+
+    # Connect components of required connections, nearest first.
+    components = list(nx.connected_components(multigraph))
+    connected = components.pop(next(i for i, c in enumerate(components)
+                                    if start in c))
+    while components:
+        distance, source, target, k = min((paths.distance(a, b), a, b, k)
+                                          for k, c in enumerate(components)
+                                          for a in connected for b in c)
+        add_path(source, target)
+        connected |= components.pop(k)
+
+    odd = [n for n, degree in multigraph.degree() if degree % 2]
+    if odd:
+        for a, b in _match_pairs(distance_matrix(paths, odd)):
+            add_path(odd[a], odd[b])
+    return [start] + [v for u, v in nx.eulerian_circuit(multigraph,
+                                                       source=start)]
+
+
+def exercised_edges(route):
+    '''
+    Returns
+    -------
+    set[frozenset]
+        Connections traversed by consecutive channels of ``route``.
+    '''
+    return set(frozenset(e) for e in window(route, 2) if e[0] != e[1])
@@ -16,11 +16,34 @@ import networkx as nx
 import numpy as np
 import trollius as asyncio
 
+from .paths import PathOracle
+from .retry import RetryPolicy
+from .route import edge_coverage_route, exercised_edges
+
 
 @asyncio.coroutine
 def _run_test(signals, proxy, G, way_points, start=None,
-              move_liquid=db.move.move_liquid):
+              move_liquid=db.move.move_liquid, vision=None, cover_edges=False,
+              retry=None):
     '''
+    Parameters
+    ----------
+    vision : dropbot_chip_qc.vision.VisionTransfer, optional
+        If set, each move is complete as soon as either the capacitance
+        criterion of ``move_liquid`` is met or the camera shows the target
+        electrode covered, and an attempt fails early if the camera shows no
+        liquid movement.
+    cover_edges : bool, optional
+        If ``True``, ignore waypoints other than ``start`` and route liquid
+        across every connection between channels (see
+        :func:`dropbot_chip_qc.route.edge_coverage_route`); after a failed
+        electrode, the route is planned again over connections that have not
+        been exercised yet.
+    retry : dropbot_chip_qc.retry.RetryPolicy, optional
+        Number of attempts, timeout of each attempt, and delay between
+        attempts of each move (default: 3 attempts, 4 second timeout, 1 second
+        delay; see :class:`dropbot_chip_qc.retry.RetryPolicy`).
+
     Signals
     -------
 
@@ -40,6 +63,9 @@ def _run_test(signals, proxy, G, way_points, start=None,
       - ``start``: **start** time for electrode movement attempt
       - ``end``: **end** time for electrode movement attempt
       - ``attempt``: attempts required for successful movement
+      - ``messages``: capacitance messages recorded during movement (empty if
+        movement was confirmed by the camera)
+      - ``confirmed_by``: ``'capacitance'`` or ``'camera'``
 
     * ``electrode-attempt-fail``; single attempt to move liquid to target
       electrode has failed:
@@ -68,6 +94,10 @@ def _run_test(signals, proxy, G, way_points, start=None,
       - ``success_route``: list of electrodes visited consecutively
       - ``failed_electrodes``: list of electrodes where movement failed
       - ``success_electrodes``: list of electrodes where movement succeeded
+      - ``exercised_connections``: list of connections liquid was moved
+        across
+      - ``unexercised_connections``: list of connections liquid was not
+        moved across
 
 
     Returns
@@ -94,19 +124,36 @@ def _run_test(signals, proxy, G, way_points, start=None,
         path to other electrodes on the test route).
     .. versionchanged:: 0.9.0
         Do not remove channels 30 and 89 and from the connections graph.
+    .. versionchanged:: 0.13.0
+        Add ``vision``, ``cover_edges``, and ``retry`` keyword arguments; wait
+        between attempts without blocking the event loop.  Add ``confirmed_by``
+        to ``electrode-success`` signal, and ``exercised_connections`` and
+        ``unexercised_connections`` to results.  Accept ``G`` as a
+        :class:`dropbot_chip_qc.graph.ChannelGraph` (a :class:`networkx.Graph`
+        is converted once per test), and query routes from a
+        :class:`dropbot_chip_qc.paths.PathOracle`, which only recomputes
+        affected shortest path tables when a failed electrode is removed.
     '''
     logging.info('Begin DMF chip test routine.')
-    G_i = G.copy()
+    G_i = PathOracle(G)
+    if retry is None:
+        retry = RetryPolicy()
 
     if start is None:
         start = way_points[0]
     way_points_i = np.roll(way_points, -way_points.index(start)).tolist()
     way_points_i += [way_points[0]]
 
-    route = list(it.chain(*[nx.shortest_path(G_i, source, target)[:-1]
-                            for source, target in
-                            db.move
-                            .window(way_points_i, 2)])) + [way_points_i[-1]]
+    # Connections to exercise.
+    connections = [frozenset(e) for e in G_i.edges()]
+
+    if cover_edges:
+        route = edge_coverage_route(G_i, start)
+    else:
+        route = list(it.chain(*[G_i.path(source, target)[:-1]
+                                for source, target in
+                                db.move.window(way_points_i, 2)])) + \
+            [way_points_i[-1]]
 
     init_state = proxy.state.copy()
 
@@ -131,8 +178,7 @@ def _run_test(signals, proxy, G, way_points, start=None,
         while remaining_route_i[0] not in G_i:
             remaining_route_i.pop(0)
             try:
-                remaining_route_i = (nx.shortest_path(G_i, source_i,
-                                                      remaining_route_i[0]) +
+                remaining_route_i = (G_i.path(source_i, remaining_route_i[0]) +
                                      remaining_route_i[1:])
             except (nx.NetworkXNoPath, nx.NodeNotFound) as exception:
                 if len(remaining_route_i) < 2:
@@ -150,20 +196,26 @@ def _run_test(signals, proxy, G, way_points, start=None,
         target_i = remaining_route_i[0]
 
         start_time = time.time()
-        for i in range(3):
+        for i in range(retry.attempts):
+            timeout = retry.timeout(i + 1)
+            if vision is None:
+                wrapper = ft.partial(asyncio.wait_for, timeout=timeout)
+            else:
+                wrapper = vision.wrapper(source_i, target_i, timeout=timeout)
+            attempt_start = time.time()
             try:
                 messages_i = yield asyncio\
                     .From(move_liquid(proxy, [source_i, target_i],
-                                      wrapper=ft.partial(asyncio.wait_for,
-                                                         timeout=4)))
+                                      wrapper=wrapper))
+                retry.record(time.time() - attempt_start, True)
                 success_route.append(target_i)
-                signals.signal('electrode-success').send('_run_test',
-                                                         source=source_i,
-                                                         target=target_i,
-                                                         start=start_time,
-                                                         end=time.time(),
-                                                         attempt=i + 1,
-                                                         messages=messages_i)
+                # No capacitance messages if camera confirmed the move first.
+                confirmed_by = ('camera' if messages_i is None
+                                else 'capacitance')
+                signals.signal('electrode-success')\
+                    .send('_run_test', source=source_i, target=target_i,
+                          start=start_time, end=time.time(), attempt=i + 1,
+                          messages=messages_i or [], confirmed_by=confirmed_by)
                 break
             except db.move.MoveTimeout as exception:
                 logging.warning('Timed out moving liquid `%s`->`%s`' %
@@ -171,7 +223,9 @@ def _run_test(signals, proxy, G, way_points, start=None,
                 signals.signal('electrode-attempt-fail')\
                     .send('_run_test', source=source_i, target=target_i,
                           start=start_time, end=time.time(), attempt=i + 1)
-                time.sleep(1.)
+                retry.record(time.time() - attempt_start, False)
+                if i + 1 < retry.attempts:
+                    yield asyncio.From(retry.wait(i + 1))
         else:
             # Play system "beep" sound to notify user that electrode failed.
             winsound.MessageBeep()
@@ -184,7 +238,16 @@ def _run_test(signals, proxy, G, way_points, start=None,
                                                   attempt=i + 1)
             # Remove failed electrode adjacency graph.
             G_i.remove_node(target_i)
-            remaining_route_i = [source_i] + remaining_route_i
+            if cover_edges:
+                # Plan route over remaining connections not exercised yet.
+                exercised = exercised_edges(success_route)
+                remaining_route_i = \
+                    edge_coverage_route(G_i, source_i,
+                                        edges=[tuple(e) for e in connections
+                                               if e not in exercised and
+                                               all(c in G_i for c in e)])
+            else:
+                remaining_route_i = [source_i] + remaining_route_i
             logging.warning('Attempting to reroute around electrode `%s`.',
                             target_i)
         yield asyncio.From(asyncio.sleep(0))
@@ -196,9 +259,13 @@ def _run_test(signals, proxy, G, way_points, start=None,
 
     # Play system "beep" sound to notify user that electrode failed.
     winsound.MessageBeep()
+    exercised = exercised_edges(success_route)
     result = {'success_route': success_route,
               'failed_electrodes': sorted(set(route) - set(success_route)),
-              'success_electrodes': sorted(set(success_route))}
+              'success_electrodes': sorted(set(success_route)),
+              'exercised_connections': sorted(sorted(e) for e in exercised),
+              'unexercised_connections':
+              sorted(sorted(e) for e in set(connections) - exercised)}
     logging.info('Completed - failed electrodes: `%s`' %
                  result['failed_electrodes'])
     signals.signal('test-complete').send('_run_test', **result)
@@ -0,0 +1,93 @@
+# -*- encoding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import threading
+
+import blinker
+import numpy as np
+import pytest
+import trollius as asyncio
+
+from ..async import FrameSubscription
+from ..payload import FramePayload
+from .test_vision import _run
+
+
+def _send(signals, frames, buffer_):
+    # Frame buffer and view canvas are reused for every frame, like
+    # `chip_video_process`.
+    canvas = np.empty_like(buffer_)
+
+    def compose():
+        canvas[:] = buffer_ + 1
+        return canvas
+
+    for i, value in enumerate(frames):
+        buffer_[:] = value
+        payload = FramePayload(views={'frame': compose, 'warped': compose},
+                               raw_frame=buffer_, frame_index=i)
+        signals.signal('frame-ready').send('test', payload=payload)
+        payload.close()
+
+
+@pytest.mark.parametrize('policy, maxsize, expected',
+                         [('latest', 1, [4]),
+                          ('queue', 3, [0, 1, 2]),
+                          ('drop-oldest', 3, [2, 3, 4])])
+def test_policy(policy, maxsize, expected):
+    signals = blinker.Namespace()
+
+    @asyncio.coroutine
+    def test():
+        subscription = FrameSubscription(signals, policy=policy,
+                                         maxsize=maxsize, views=['frame'])
+        with subscription:
+            _send(signals, range(5), np.zeros((2, 2), dtype='uint8'))
+            messages = []
+            while len(subscription):
+                message = yield asyncio.From(subscription.get())
+                messages.append(message)
+        raise asyncio.Return(subscription, messages)
+
+    subscription, messages = _run(test())
+    assert [m['frame_index'] for m in messages] == expected
+    assert subscription.received_count == 5
+    assert subscription.dropped_count == 5 - len(expected)
+    # Queued messages are copies of reused buffers, including views computed
+    # on receipt.
+    assert [m['raw_frame'][0, 0] for m in messages] == expected
+    assert [m['frame'][0, 0] for m in messages] == [v + 1 for v in expected]
+    # Views that were not computed on receipt are no longer available.
+    with pytest.raises(RuntimeError):
+        messages[0]['warped']
+
+
+def test_get():
+    signals = blinker.Namespace()
+
+    @asyncio.coroutine
+    def test():
+        with FrameSubscription(signals) as subscription:
+            assert subscription.get_nowait() is None
+            # Frame is sent from video processing thread while waiting.
+            timer = threading.Timer(.05, _send, args=(signals, [7],
+                                                      np.zeros(1)))
+            timer.start()
+            message = yield asyncio.From(asyncio.wait_for(subscription.get(),
+                                                          5))
+            timer.join()
+        # Receiver is disconnected on exit.
+        assert not signals.signal('frame-ready').receivers
+        raise asyncio.Return(message)
+
+    assert _run(test())['raw_frame'][0] == 7
+
+
+def test_unknown_policy():
+    loop = asyncio.new_event_loop()
+    try:
+        with pytest.raises(ValueError):
+            FrameSubscription(blinker.Namespace(), policy='unknown',
+                              loop=loop)
+    finally:
+        loop.close()
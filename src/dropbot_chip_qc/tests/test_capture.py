@@ -0,0 +1,65 @@
+# -*- encoding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import numpy as np
+import pytest
+
+from ..capture import CaptureThread, FrameRingBuffer, GeneratorSource
+
+
+def _capture(frames, size=3):
+    ring = FrameRingBuffer((24, 32, 3), size=size)
+    thread = CaptureThread(GeneratorSource(frames, fps=1000.), ring,
+                           drop_frames=False)
+    thread.start()
+    return ring, thread
+
+
+def test_latest():
+    frames = [np.full((24, 32, 3), i, dtype='uint8') for i in range(5)]
+    ring, thread = _capture(iter(frames))
+    values = []
+    while True:
+        latest = ring.latest(timeout=1.)
+        if latest is None:
+            break
+        frame_index, timestamp, frame = latest
+        values.append(frame[0, 0, 0])
+    thread.join()
+    assert values == list(range(5))
+    assert ring.counts == {'captured': 5, 'processed': 5, 'dropped': 0}
+    ring.raise_error()
+
+
+def test_resize():
+    # Resolution changes after the first frame.
+    frames = [np.full((24, 32, 3), 10, dtype='uint8'),
+              np.full((48, 64, 3), 20, dtype='uint8'),
+              np.full((48, 64), 30, dtype='uint8')]
+    ring, thread = _capture(iter(frames))
+    values = []
+    while True:
+        latest = ring.latest(timeout=1.)
+        if latest is None:
+            break
+        values.append(latest[2].copy())
+    thread.join()
+    assert [v.shape for v in values] == 3 * [(24, 32, 3)]
+    assert [v.mean() for v in values] == [10, 20, 30]
+    assert ring.error is None
+
+
+def test_error():
+    def frames():
+        yield np.zeros((24, 32, 3), dtype='uint8')
+        raise IOError('camera disconnected')
+
+    ring, thread = _capture(frames())
+    while ring.latest(timeout=1.) is not None:
+        pass
+    thread.join()
+    assert ring.closed
+    assert isinstance(thread.error, IOError)
+    with pytest.raises(IOError):
+        ring.raise_error()
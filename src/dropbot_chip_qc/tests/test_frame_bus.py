@@ -0,0 +1,93 @@
+# -*- encoding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import uuid
+
+import numpy as np
+import pytest
+
+from ..frame_bus import FrameBusReader, FrameBusWriter
+
+
+@pytest.fixture
+def writer():
+    writer = FrameBusWriter('test-%s' % uuid.uuid4().hex, (24, 32, 3),
+                            slots=3)
+    yield writer
+    writer.close()
+
+
+def _frame(value):
+    return np.full((24, 32, 3), value, dtype='uint8')
+
+
+def test_publish(writer):
+    reader = FrameBusReader(writer.name)
+    try:
+        assert reader.latest() is None
+        writer.publish(_frame(1), timestamp=10., frame_index=5,
+                       chip_uuid='abc', transform=np.eye(3))
+        record = reader.latest()
+        assert record.frame.mean() == 1
+        assert (record.timestamp, record.frame_index) == (10., 5)
+        assert record.metadata == {'chip_uuid': 'abc',
+                                   'transform': np.eye(3).tolist()}
+        assert reader.valid(record)
+        # Frame is a read-only view of shared memory.
+        with pytest.raises(ValueError):
+            record.frame[:] = 0
+    finally:
+        reader.close()
+
+
+def test_seqlock(writer):
+    reader = FrameBusReader(writer.name)
+    try:
+        writer.publish(_frame(1))
+        record = reader.latest()
+        # Other slots are written; record is still valid.
+        for i in range(writer.slots - 1):
+            writer.publish(_frame(2))
+        assert reader.valid(record)
+        # Slot of record is overwritten.
+        writer.publish(_frame(3))
+        assert not reader.valid(record)
+        assert reader.latest().frame.mean() == 3
+
+        # Newest slot is being written.
+        slot = writer.count % writer.slots
+        writer._slot_info['sequence'][slot] = 2 * writer.count + 1
+        writer._count[0] += 1
+        assert reader.latest() is None
+    finally:
+        reader.close()
+
+
+def test_wait(writer):
+    reader = FrameBusReader(writer.name)
+    try:
+        assert reader.wait(timeout=.01) is None
+        writer.publish(_frame(1), frame_index=0)
+        assert reader.wait(timeout=.01).frame_index == 0
+        # Same frame is not returned twice.
+        assert reader.wait(timeout=.01) is None
+    finally:
+        reader.close()
+
+
+def test_resize(writer):
+    reader = FrameBusReader(writer.name)
+    try:
+        writer.publish(np.full((48, 64, 3), 7, dtype='uint8'))
+        record = reader.latest()
+        assert record.frame.shape == (24, 32, 3)
+        assert record.frame.mean() == 7
+        with pytest.raises(ValueError):
+            writer.publish(_frame(1), metadata='x' * writer.metadata_size)
+    finally:
+        reader.close()
+
+
+def test_missing():
+    with pytest.raises(IOError):
+        FrameBusReader('test-missing-%s' % uuid.uuid4().hex)
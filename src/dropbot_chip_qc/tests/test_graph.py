@@ -0,0 +1,85 @@
+# -*- encoding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from ..graph import UNREACHABLE, ChannelGraph, channel_graph
+
+
+def _graph():
+    # 6x8 grid of channels (numbered row by row, starting at 1) with a few
+    # connections missing, plus an isolated channel.
+    graph = nx.Graph()
+    for k in range(1, 49):
+        if k % 8:
+            graph.add_edge(k, k + 1)
+        if k <= 40:
+            graph.add_edge(k, k + 8)
+    graph.remove_edges_from([(1, 2), (10, 18), (20, 21)])
+    graph.add_node(100)
+    return graph
+
+
+def _depths(predecessors, i):
+    # Number of steps from `i` to each node in search tree.
+    depths = np.full(len(predecessors), -1)
+    for j in range(len(predecessors)):
+        k, depth = j, 0
+        if predecessors[j] == UNREACHABLE:
+            continue
+        while k != i:
+            k = predecessors[k]
+            depth += 1
+        depths[j] = depth
+    return depths
+
+
+def test_from_networkx():
+    graph = _graph()
+    G = ChannelGraph.from_networkx(graph)
+    assert G.nodes == list(graph.nodes)
+    assert len(G) == graph.number_of_nodes()
+    assert (set(frozenset(e) for e in G.edges()) ==
+            set(frozenset(e) for e in graph.edges()))
+    assert sorted(G.neighbors(9)) == sorted(graph.neighbors(9))
+    assert nx.is_isomorphic(G.to_networkx(), graph)
+    assert channel_graph(G) is G
+
+
+@pytest.mark.parametrize('removed', [[], [11, 12, 13], [2, 9]])
+def test_bfs(removed):
+    graph = _graph()
+    G = ChannelGraph.from_networkx(graph)
+    G.remove_nodes_from(removed)
+    graph.remove_nodes_from(removed)
+    for source in graph:
+        i = G.index(source)
+        predecessors = G.bfs(i)
+        lengths = nx.single_source_shortest_path_length(graph, source)
+        depths = _depths(predecessors, i)
+        for node, j in zip(G.nodes, range(len(G.nodes))):
+            if node in lengths:
+                assert depths[j] == lengths[node]
+                # Predecessor is connected to node.
+                assert (j == i or
+                        graph.has_edge(G.nodes[predecessors[j]], node))
+            else:
+                assert predecessors[j] == UNREACHABLE
+
+
+def test_remove_node():
+    G = ChannelGraph.from_networkx(_graph())
+    copy = G.copy()
+    copy.remove_node(9)
+    # Adjacency arrays are shared; removed mask is not.
+    assert copy.indices is G.indices
+    assert 9 in G and 9 not in copy
+    assert 9 not in copy.neighbors(10)
+    assert all(9 not in e for e in copy.edges())
+    with pytest.raises(nx.NetworkXError):
+        copy.remove_node(9)
+    with pytest.raises(nx.NodeNotFound):
+        copy.index(9)
@@ -0,0 +1,106 @@
+# -*- encoding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import threading
+
+import cv2
+import numpy as np
+
+from ..history import FrameHistory
+
+
+def _frame(value=0):
+    return np.full((48, 64, 3), value, dtype='uint8')
+
+
+def test_clip():
+    history = FrameHistory(interval=.25, scale=1, max_pending=20)
+    for i in range(20):
+        history.append(i * .125, _frame(10 * i))
+    history.flush()
+    # Frames closer than `interval` to the previous stored frame are skipped.
+    assert len(history) == 10
+    assert history.span() == (0, 2.25)
+    clip = history.clip(.5, 1.25)
+    assert [t for t, data in clip] == [.5, .75, 1., 1.25]
+    frame = cv2.imdecode(np.frombuffer(clip[0][1], dtype='uint8'),
+                         cv2.IMREAD_COLOR)
+    assert frame.shape == (48, 64, 3)
+    assert abs(frame.mean() - 40) < 2
+    assert [t for t, data in history.around(1., before=.25, after=.25)] == \
+        [.75, 1., 1.25]
+    history.close()
+
+
+def test_encoded():
+    history = FrameHistory(interval=0)
+    success, encoded = cv2.imencode('.jpg', _frame())
+    history.append(0, _frame(), encoded=encoded)
+    history.append(1, _frame())
+    history.flush()
+    clip = history.clip(0, 1)
+    # Encoded frame is stored as is (not scaled).
+    assert clip[0][1] == encoded.tobytes()
+    frame = cv2.imdecode(np.frombuffer(clip[1][1], dtype='uint8'),
+                         cv2.IMREAD_COLOR)
+    assert frame.shape == (24, 32, 3)
+    history.close()
+
+
+def test_eviction():
+    history = FrameHistory(max_duration=1., interval=0, max_pending=30)
+    for i in range(30):
+        history.append(i * .25, _frame())
+    history.flush()
+    assert history.span() == (6.25, 7.25)
+    assert history.dropped_count == 25
+
+    size = len(history.clip(0, 10)[0][1])
+    history = FrameHistory(max_bytes=5 * size, interval=0,
+                           max_pending=30)
+    for i in range(30):
+        history.append(i, _frame())
+    history.flush()
+    assert len(history) == 5
+    assert history.nbytes <= 5 * size
+    assert history.span() == (25, 29)
+    history.clear()
+    assert len(history) == 0 and history.span() is None
+    history.close()
+
+
+def test_monotonic():
+    history = FrameHistory(interval=.1)
+    history.append(10., _frame())
+    # Clock adjusted backwards; timestamp is clamped.
+    history.append(5., _frame())
+    history.flush()
+    assert [t for t, data in history.clip(0, 20)] == [10., 10.]
+    history.close()
+
+
+def test_pending():
+    history = FrameHistory(interval=0, max_pending=1)
+    encoding = threading.Event()
+    release = threading.Event()
+    imencode = cv2.imencode
+
+    def slow_imencode(*args):
+        encoding.set()
+        release.wait()
+        return imencode(*args)
+
+    cv2_imencode, cv2.imencode = cv2.imencode, slow_imencode
+    try:
+        assert history.append(0, _frame())
+        encoding.wait(1.)
+        assert history.append(1, _frame())
+        # Encoder is busy and one frame is pending.
+        assert not history.append(2, _frame())
+        assert history.skipped_count == 1
+        release.set()
+        history.flush()
+    finally:
+        cv2.imencode = cv2_imencode
+    assert [t for t, data in history.clip(0, 2)] == [0, 1]
+    history.close()
@@ -0,0 +1,70 @@
+# -*- encoding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import numpy as np
+import pytest
+
+from ..occupancy import ElectrodeOccupancy
+from .test_vision import CHIP_TRANSFORM, _chip_info
+
+#: Random texture of chip in perspective-corrected frame coordinates.
+CHIP = np.random.RandomState(0).randint(0, 100, (40, 60)).astype('uint8')
+
+
+def _view(dx, covered=()):
+    '''
+    Returns
+    -------
+    tuple(numpy.ndarray, numpy.ndarray)
+        Raw frame of chip shifted right by ``dx`` pixels, with liquid covering
+        channels in ``covered``, and perspective correction transform.
+    '''
+    chip = CHIP.copy()
+    for channel in covered:
+        # Cover electrode, including pixels on its outline.
+        x0 = 10 + 10 * (channel - 1)
+        chip[9:32, x0 - 1:x0 + 12] = 255
+    M = np.array([[1., 0, -dx], [0, 1, 0], [0, 0, 1]])
+    return np.roll(chip, dx, axis=1), M
+
+
+def test_region_required():
+    with pytest.raises(ValueError):
+        ElectrodeOccupancy(_chip_info())
+
+
+def test_labels():
+    occupancy = ElectrodeOccupancy(_chip_info(), chip_transform=CHIP_TRANSFORM)
+    labels = occupancy.labels(_view(5)[1], (40, 60))
+    # Electrode of channel 1 spans x = 15..25 in raw frame shifted by 5.
+    assert (labels[10:30, 16:24] == 1).all()
+    assert (labels[:, :14] == 0).all()
+
+
+def test_mean():
+    occupancy = ElectrodeOccupancy(_chip_info(), chip_transform=CHIP_TRANSFORM)
+    frame, M = _view(0, covered=(2, ))
+    stats = occupancy.update(frame, M)
+    assert stats[1, 0] == 255
+    assert stats[0, 0] < 100
+    # Coverage is unknown without a reference frame.
+    assert np.isnan(stats[:, 1]).all()
+
+
+def test_reference_follows_chip():
+    occupancy = ElectrodeOccupancy(_chip_info(), chip_transform=CHIP_TRANSFORM)
+    occupancy.set_reference(*_view(0))
+    # Chip moves; labels are rasterized again and reference is mapped to new
+    # chip position.
+    build_count = occupancy.build_count
+    stats = occupancy.update(*_view(5, covered=(3, )))
+    assert occupancy.build_count > build_count
+    # Outline of channel 2 electrode is shared with channel 3 electrode.
+    assert np.allclose(stats[[0, 2], 1], [0, 1])
+    assert stats[1, 1] < .5
+    assert occupancy.occupied(stats).tolist() == [3]
+
+    # Reference is discarded on reset.
+    occupancy.reset()
+    assert np.isnan(occupancy.update(*_view(5))[:, 1]).all()
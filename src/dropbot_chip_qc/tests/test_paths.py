@@ -0,0 +1,90 @@
+# -*- encoding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import itertools as it
+
+import networkx as nx
+import pytest
+
+from ..paths import PathOracle, path_oracle
+from .test_graph import _graph
+
+
+def _check(oracle, graph):
+    # Every path is a shortest path of `graph`.
+    for source, target in it.permutations(graph, 2):
+        if nx.has_path(graph, source, target):
+            path = oracle.path(source, target)
+            assert path[0] == source and path[-1] == target
+            assert all(graph.has_edge(a, b) for a, b in zip(path, path[1:]))
+            assert (len(path) - 1 ==
+                    nx.shortest_path_length(graph, source, target))
+        else:
+            with pytest.raises(nx.NetworkXNoPath):
+                oracle.path(source, target)
+
+
+def test_path():
+    graph = _graph()
+    oracle = PathOracle(graph)
+    assert oracle.bfs_count == 0
+    _check(oracle, graph)
+    # One table per source.
+    assert oracle.bfs_count == len(graph)
+    assert sorted(oracle.reachable(100)) == [100]
+    assert oracle.distance(1, 9) == 1
+    assert not oracle.has_path(1, 100)
+    assert path_oracle(oracle) is oracle
+
+
+def test_precompute():
+    oracle = PathOracle(_graph(), precompute=True)
+    bfs_count = oracle.bfs_count
+    oracle.path(1, 48)
+    assert oracle.bfs_count == bfs_count == len(oracle)
+
+
+def test_remove_node():
+    graph = _graph()
+    oracle = PathOracle(graph, precompute=True)
+    bfs_count = oracle.bfs_count
+    # Channel 41 (a corner) is a leaf of most shortest path trees.
+    oracle.remove_node(41)
+    graph.remove_node(41)
+    _check(oracle, graph)
+    # Only tables of sources routing through the removed node are
+    # recomputed.
+    assert oracle.bfs_count - bfs_count == 0
+    # Channel 28 is an inner node of some trees.
+    oracle.remove_node(28)
+    graph.remove_node(28)
+    _check(oracle, graph)
+    assert 0 < oracle.bfs_count - bfs_count < len(graph)
+    with pytest.raises(nx.NodeNotFound):
+        oracle.path(28, 1)
+    with pytest.raises(nx.NetworkXError):
+        oracle.remove_node(28)
+
+
+def test_disconnect():
+    graph = _graph()
+    oracle = PathOracle(graph)
+    _check(oracle, graph)
+    # Removing channels 2 and 9 disconnects channel 1.
+    oracle.remove_nodes_from([2, 9])
+    graph.remove_nodes_from([2, 9])
+    _check(oracle, graph)
+    assert oracle.reachable(1) == [1]
+
+
+def test_copy():
+    graph = _graph()
+    oracle = PathOracle(graph, precompute=True)
+    copy = oracle.copy()
+    copy.remove_node(9)
+    # Tables are kept, and copies are independent.
+    assert copy.bfs_count == 0
+    assert 9 in oracle and 9 not in copy
+    _check(oracle, graph)
+    graph.remove_node(9)
+    _check(copy, graph)
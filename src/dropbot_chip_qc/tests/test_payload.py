@@ -0,0 +1,82 @@
+# -*- encoding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import functools as ft
+import warnings
+
+import blinker
+import numpy as np
+import pytest
+
+from ..payload import FramePayload, send_payload
+
+
+def _payload(calls=None):
+    calls = [] if calls is None else calls
+
+    def compose():
+        calls.append('frame')
+        return np.ones((2, 2, 3), dtype='uint8')
+
+    return FramePayload(views={'frame': compose, 'warped': lambda: None},
+                        raw_frame=np.zeros((2, 2, 3), dtype='uint8'),
+                        transform=None, fps=None, chip_uuid='abc',
+                        frame_index=0)
+
+
+def test_lazy_views():
+    calls = []
+    payload = _payload(calls)
+    assert 'frame' in payload and 'frame_rgb' in payload
+    assert not payload.computed('frame')
+    assert payload['frame_rgb'].sum() == 12
+    payload['frame']
+    assert calls == ['frame']
+    payload.close()
+    # Uncomputed view is no longer available once buffers are reused.
+    with pytest.raises(RuntimeError):
+        payload['warped']
+    with pytest.raises(KeyError):
+        payload['missing']
+
+
+def test_detach():
+    payload = _payload()
+    detached = payload.detach(views=['frame'])
+    assert detached.closed
+    assert detached['raw_frame'] is not payload['raw_frame']
+    assert np.array_equal(detached['frame'], payload['frame'])
+    with pytest.raises(RuntimeError):
+        detached['warped']
+
+
+def test_send_payload():
+    signal = blinker.Signal()
+    received = {}
+
+    def on_payload(sender, payload):
+        received['payload'] = sorted(payload)
+
+    def on_legacy(sender, frame=None, chip_uuid=None, **kwargs):
+        received['legacy'] = (frame.shape, chip_uuid, 'payload' in kwargs)
+
+    def on_legacy_only(sender, frame, raw_frame, warped, transform, fps,
+                       chip_uuid):
+        received['legacy_only'] = chip_uuid
+
+    def on_event(event, sender, payload):
+        received[event] = payload['chip_uuid']
+
+    receivers = [on_payload, on_legacy, on_legacy_only,
+                 ft.partial(on_event, 'event')]
+    for receiver in receivers:
+        signal.connect(receiver)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        send_payload(signal, 'test', _payload())
+    assert 'frame' in received['payload']
+    assert received['legacy'] == ((2, 2, 3), 'abc', True)
+    assert received['legacy_only'] == 'abc'
+    assert received['event'] == 'abc'
+    # Only receiver without a `payload` argument is warned.
+    assert [w.category for w in caught] == [DeprecationWarning]
@@ -0,0 +1,34 @@
+# -*- encoding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import threading
+
+import numpy as np
+
+from ..qr import QrDecodeScheduler
+
+
+def test_stop():
+    # Stop while a worker is busy and frames are still queued.
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def decode(*args, **kwargs):
+        calls.append(None)
+        started.set()
+        release.wait(5)
+        return []
+
+    scheduler = QrDecodeScheduler(interval=0, decode=decode).start()
+    frame = np.zeros((24, 32, 3), dtype='uint8')
+    assert scheduler.submit(frame)
+    assert started.wait(5)
+    assert scheduler.submit(frame)
+    timer = threading.Timer(.1, release.set)
+    timer.start()
+    scheduler.stop()
+    timer.join()
+    assert not any(t.is_alive() for t in scheduler._threads)
+    # Queued frame was discarded.
+    assert len(calls) == 1
@@ -0,0 +1,55 @@
+# -*- encoding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import cv2
+import numpy as np
+
+from ..record import VideoRecorder, recording_paths
+
+
+def _frame(i):
+    return np.full((48, 64, 3), 10 * i, dtype='uint8')
+
+
+def _frame_count(path):
+    capture = cv2.VideoCapture(path)
+    try:
+        count = 0
+        while capture.read()[0]:
+            count += 1
+        return count
+    finally:
+        capture.release()
+
+
+def test_timestamps(tmpdir):
+    path = str(tmpdir.join('video.avi'))
+    recorder = VideoRecorder(path, fps=10., fourcc='MJPG')
+    # One second of frames at 10 fps, with gaps and a frame arriving early.
+    for timestamp in (0, .1, .2, .5, .52, .6, 1.):
+        assert recorder.write(_frame(int(timestamp * 10)),
+                              timestamp=100 + timestamp)
+    recorder.close()
+    assert recorder.dropped_count == 1
+    assert recorder.duplicated_count == 2 + 3
+    assert recorder.written_count == 11
+    assert _frame_count(path) == 11
+
+
+def test_buffers(tmpdir):
+    recorder = VideoRecorder(str(tmpdir.join('video.avi')), fourcc='MJPG',
+                             max_bytes=3 * _frame(0).nbytes)
+    recorder._thread.run = lambda: None  # Writer does not consume frames.
+    results = [recorder.write(_frame(i)) for i in range(10)]
+    # Buffers are allocated up to `max_bytes` (plus one for previous frame).
+    assert results == 4 * [True] + 6 * [False]
+    assert recorder._buffer_count == 4
+    assert recorder.dropped_count == 6
+
+
+def test_recording_paths():
+    assert (recording_paths('%(uuid)s.mp4', 'abc', ['warped', 'raw']) ==
+            {'warped': 'abc.mp4', 'raw': 'abc-raw.mp4'})
+    assert (recording_paths('%(uuid)s-%(view)s.mp4', 'abc', ['raw']) ==
+            {'raw': 'abc-raw.mp4'})
@@ -0,0 +1,79 @@
+# -*- encoding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import time
+
+import pytest
+import trollius as asyncio
+
+from ..retry import (AdaptiveRetry, ExponentialBackoff, RetryPolicy,
+                     retry_policy)
+from .test_vision import _run
+
+
+def test_fixed():
+    policy = RetryPolicy(attempts=2, timeout=3., delay=.5)
+    assert [policy.timeout(i) for i in (1, 2)] == [3., 3.]
+    assert [policy.delay(i) for i in (1, 2)] == [.5, .5]
+    policy.record(1., True)
+    policy.record(3., False)
+    assert (policy.success_count, policy.failure_count) == (1, 1)
+    with pytest.raises(ValueError):
+        RetryPolicy(attempts=0)
+
+
+def test_exponential():
+    policy = ExponentialBackoff(delay=.25, factor=2., max_delay=1.)
+    assert [policy.delay(i) for i in range(1, 6)] == [.25, .5, 1., 1., 1.]
+
+
+def test_adaptive():
+    policy = AdaptiveRetry(timeout=4., min_timeout=.5, gain=.125)
+    # Full timeout until first success.
+    assert policy.timeout(1) == 4.
+    policy.record(1., False)
+    assert policy.timeout(1) == 4.
+    policy.record(.4, True)
+    # Mean 0.4 s, deviation 0.2 s.
+    assert policy.timeout(1) == pytest.approx(1.2)
+    # Timeout doubles with each retry, up to `timeout`.
+    assert policy.timeout(2) == pytest.approx(2.4)
+    assert policy.timeout(3) == 4.
+    for i in range(50):
+        policy.record(.1, True)
+    # Deviation vanishes; timeout is clamped to `min_timeout`.
+    assert policy.mean_duration == pytest.approx(.1, abs=1e-3)
+    assert policy.timeout(1) == .5
+
+
+def test_retry_policy():
+    policy = retry_policy('exponential', attempts=5, timeout=None)
+    assert isinstance(policy, ExponentialBackoff)
+    # Arguments set to `None` use policy defaults.
+    assert (policy.attempts, policy.max_timeout) == (5, 4.)
+    with pytest.raises(ValueError):
+        retry_policy('unknown')
+
+
+def test_wait():
+    policy = RetryPolicy(delay=.2)
+    ticks = []
+
+    @asyncio.coroutine
+    def tick():
+        while True:
+            ticks.append(time.time())
+            yield asyncio.From(asyncio.sleep(.01))
+
+    @asyncio.coroutine
+    def test():
+        ticker = asyncio.ensure_future(tick())
+        start = time.time()
+        yield asyncio.From(policy.wait(1))
+        ticker.cancel()
+        raise asyncio.Return(time.time() - start)
+
+    duration = _run(test())
+    assert duration >= .2
+    # Event loop keeps running other tasks during delay.
+    assert len(ticks) > 5
@@ -0,0 +1,92 @@
+# -*- encoding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import io
+
+import networkx as nx
+import numpy as np
+
+from ..paths import PathOracle
+from ..route import (edge_coverage_route, exercised_edges, load_test_routes,
+                     optimize_route, prune_way_points, route_steps, walk)
+from .test_graph import _graph
+
+SVG = '''<svg xmlns="http://www.w3.org/2000/svg"
+     xmlns:dmf="https://github.com/sci-bots/dmf-chip-spec">
+  <dmf:ChipDesign>
+    <dmf:TestRoutes>
+      <dmf:TestRoute id="default">
+        <dmf:Waypoint>1</dmf:Waypoint>
+        <dmf:Waypoint>48</dmf:Waypoint>
+      </dmf:TestRoute>
+    </dmf:TestRoutes>
+  </dmf:ChipDesign>
+</svg>'''
+
+
+def test_walk():
+    graph = _graph()
+    route = walk(graph, [3, 5, 21])
+    assert route[0] == route[-1] == 3
+    assert all(graph.has_edge(a, b) for a, b in zip(route, route[1:]))
+    assert route_steps(graph, [3, 5, 21]) == 2 + 2 + 4
+    assert route_steps(graph, [3, 5, 21], loop=False) == 2 + 2
+
+
+def test_load_test_routes():
+    svg = io.BytesIO(SVG.encode('utf8'))
+    assert dict(load_test_routes(svg)) == {'default': [1, 48]}
+    # File is rewound.
+    assert svg.tell() == 0
+
+
+def test_optimize_route():
+    graph = _graph()
+    graph.remove_node(100)
+    channels = np.random.RandomState(1).permutation(list(graph))[:20]\
+        .tolist()
+    way_points = optimize_route(graph, channels, start=channels[0],
+                                time_budget=.2)
+    assert way_points[0] == channels[0]
+    # Route visits every channel, in fewer steps than the given order.
+    assert set(channels).issubset(walk(graph, way_points))
+    assert (route_steps(graph, way_points) <
+            route_steps(graph, channels))
+    # Path oracle tables are reused.
+    paths = PathOracle(graph, precompute=True)
+    bfs_count = paths.bfs_count
+    way_points = optimize_route(paths, channels, time_budget=.2)
+    assert set(channels).issubset(walk(paths, way_points))
+    assert paths.bfs_count == bfs_count
+
+
+def test_prune_way_points():
+    graph = _graph()
+    # Channel 2 is on the way from channel 3 to channel 1.
+    assert prune_way_points(graph, [3, 2, 1, 17]) == [3, 1, 17]
+
+
+def test_edge_coverage_route():
+    graph = _graph()
+    route = edge_coverage_route(graph, 1)
+    assert route[0] == route[-1] == 1
+    assert all(graph.has_edge(a, b) for a, b in zip(route, route[1:]))
+    # Every connection (except of isolated channel) is exercised.
+    assert (exercised_edges(route) ==
+            set(frozenset(e) for e in graph.edges()))
+    # Eulerian graph: every connection is exercised exactly once.
+    cycle = nx.cycle_graph(range(1, 7))
+    assert len(edge_coverage_route(cycle, 1)) - 1 == 6
+
+
+def test_edge_coverage_subset():
+    graph = _graph()
+    # Connections in two separate regions of the chip.
+    edges = [(1, 9), (9, 17), (40, 48)]
+    route = edge_coverage_route(graph, 1, edges=edges)
+    assert set(frozenset(e) for e in edges).issubset(exercised_edges(route))
+    assert route[0] == route[-1] == 1
+    # Connection to unreachable channel is ignored.
+    assert (exercised_edges(edge_coverage_route(graph, 1,
+                                                edges=[(1, 9), (100, 48)])) ==
+            {frozenset((1, 9))})
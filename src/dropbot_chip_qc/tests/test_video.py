@@ -0,0 +1,86 @@
+# -*- encoding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import threading
+import warnings
+
+import blinker
+import numpy as np
+import pytest
+
+from ..capture import GeneratorSource
+from ..video import chip_video_process
+
+
+def _frames(stop):
+    # Synthetic frames until the test is done.
+    i = 0
+    while not stop.is_set():
+        yield np.full((48, 64, 3), i % 256, dtype='uint8')
+        i += 1
+
+
+def test_chip_video_process():
+    signals = blinker.Namespace()
+    stop = threading.Event()
+    closed = threading.Event()
+    payloads = []
+    legacy = []
+    received = threading.Event()
+
+    def on_payload(sender, payload=None):
+        payloads.append(payload['frame_index'])
+        if payloads and legacy:
+            received.set()
+
+    def on_legacy(sender, frame=None, raw_frame=None, **kwargs):
+        legacy.append(raw_frame.shape)
+        if payloads and legacy:
+            received.set()
+
+    signals.signal('frame-ready').connect(on_payload, weak=False)
+    signals.signal('frame-ready').connect(on_legacy, weak=False)
+    signals.signal('closed').connect(lambda sender: closed.set(), weak=False)
+
+    thread = threading.Thread(target=chip_video_process, args=(signals, ),
+                              kwargs={'source':
+                                      GeneratorSource(_frames(stop),
+                                                      realtime=True),
+                                      'qr_decoder': lambda *args,
+                                      **kwargs: []})
+    with warnings.catch_warnings():
+        # Legacy keyword arguments are deprecated.
+        warnings.simplefilter('ignore', DeprecationWarning)
+        thread.start()
+        try:
+            assert received.wait(10)
+        finally:
+            signals.signal('exit-request').send('test')
+            thread.join(10)
+            stop.set()
+    assert not thread.is_alive()
+    assert closed.is_set()
+    assert payloads
+    assert legacy == [(48, 64, 3)] * len(legacy)
+
+
+def test_closed_on_error():
+    # Process is torn down if a receiver raises an exception.
+    signals = blinker.Namespace()
+    stop = threading.Event()
+    closed = threading.Event()
+
+    def on_payload(sender, payload=None):
+        raise RuntimeError('receiver failed')
+
+    signals.signal('frame-ready').connect(on_payload, weak=False)
+    signals.signal('closed').connect(lambda sender: closed.set(), weak=False)
+    try:
+        with pytest.raises(RuntimeError):
+            chip_video_process(signals,
+                               source=GeneratorSource(_frames(stop),
+                                                      realtime=True),
+                               qr_decoder=lambda *args, **kwargs: [])
+    finally:
+        stop.set()
+    assert closed.is_set()
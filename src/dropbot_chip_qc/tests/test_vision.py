@@ -0,0 +1,194 @@
+# -*- encoding: utf-8 -*-
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import threading
+
+import blinker
+import numpy as np
+import pytest
+import trollius as asyncio
+
+from ..occupancy import ElectrodeOccupancy
+from ..payload import FramePayload
+from ..vision import TransferStalled, VisionTransfer
+
+#: Perspective correction transform of synthetic frames (chip is in place).
+M = np.eye(3)
+#: Chip coordinates to perspective-corrected frame coordinates; electrodes
+#: span ``x = 10..40, y = 0..10`` on chip, and ``10..40 x 10..30`` in frame.
+CHIP_TRANSFORM = np.array([[1., 0, 0], [0, 2, 10], [0, 0, 1]])
+
+
+def _chip_info():
+    # Row of three 10x10 electrodes on channels 1, 2, and 3.
+    return {'electrodes': [{'id': 'electrode%03d' % i, 'channels': [i],
+                            'points': [[10 * i, 0], [10 * i + 10, 0],
+                                       [10 * i + 10, 10], [10 * i, 10]]}
+                           for i in range(1, 4)]}
+
+
+def _frame(covered=(), fraction=1.):
+    '''
+    Synthetic frame of empty chip, with liquid (bright) covering ``fraction``
+    of the width of each channel in ``covered``.
+    '''
+    frame = np.full((40, 60, 3), 50, dtype='uint8')
+    for channel in covered:
+        x0 = 10 + 10 * (channel - 1)
+        frame[10:30, x0:x0 + int(round(10 * fraction))] = 200
+    return frame
+
+
+def _occupancy():
+    return ElectrodeOccupancy(_chip_info(), chip_transform=CHIP_TRANSFORM)
+
+
+@asyncio.coroutine
+def _play(signals, occupancy, frames, interval=.01):
+    '''
+    Send ``frame-ready`` message with occupancy statistics of each frame.
+    '''
+    for i, (timestamp, frame) in enumerate(frames):
+        yield asyncio.From(asyncio.sleep(interval))
+        payload = FramePayload(occupancy=occupancy.update(frame, M),
+                               timestamp=timestamp, frame_index=i)
+        signals.signal('frame-ready').send('test', payload=payload)
+        payload.close()
+
+
+def _run(co):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(co)
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+
+
+def _transfer_frames(duration=.5, count=50):
+    # Liquid moves from channel 1 onto channel 2.
+    for i in range(count):
+        fraction = min(1., 2. * i / count)
+        yield i * duration / count, _frame(covered=(1, 2), fraction=fraction)
+
+
+def test_set_reference():
+    signals = blinker.Namespace()
+    occupancy = _occupancy()
+    vision = VisionTransfer(signals, occupancy)
+    # Nothing sets reference frame.
+    assert not _run(vision.set_reference(timeout=.05))
+
+    def on_request(sender):
+        # Reference is set by video processing thread.
+        def set_reference():
+            occupancy.set_reference(_frame(), M)
+            signals.signal('occupancy-reference-set').send('test')
+        threading.Timer(.01, set_reference).start()
+
+    signals.signal('occupancy-reference-request').connect(on_request)
+    assert _run(vision.set_reference(timeout=5))
+    assert not np.isnan(occupancy.update(_frame(), M)[:, 1]).any()
+
+
+def test_wait_coverage():
+    signals = blinker.Namespace()
+    occupancy = _occupancy()
+    occupancy.set_reference(_frame(), M)
+    vision = VisionTransfer(signals, occupancy)
+
+    @asyncio.coroutine
+    def test():
+        player = asyncio.ensure_future(_play(signals, occupancy,
+                                             _transfer_frames()))
+        try:
+            progress = yield asyncio.From(asyncio
+                                          .wait_for(vision.wait(1, 2), 5))
+        finally:
+            player.cancel()
+        raise asyncio.Return(progress)
+
+    progress = _run(test())
+    assert progress >= vision.coverage
+    assert vision.confirmed_count == 1
+
+
+def test_wait_contrast():
+    # Without a reference frame, progress is intensity of target relative to
+    # source.
+    signals = blinker.Namespace()
+    occupancy = _occupancy()
+    vision = VisionTransfer(signals, occupancy)
+
+    @asyncio.coroutine
+    def test():
+        frames = ([(0, _frame(covered=(1, )))] +
+                  [(t + .01, f) for t, f in _transfer_frames()])
+        player = asyncio.ensure_future(_play(signals, occupancy, frames))
+        try:
+            progress = yield asyncio.From(asyncio
+                                          .wait_for(vision.wait(1, 2), 5))
+        finally:
+            player.cancel()
+        raise asyncio.Return(progress)
+
+    assert _run(test()) >= vision.coverage
+
+
+def test_wait_stalled():
+    signals = blinker.Namespace()
+    occupancy = _occupancy()
+    occupancy.set_reference(_frame(), M)
+    vision = VisionTransfer(signals, occupancy, stall_timeout=.2)
+    # Liquid never moves onto channel 2.
+    frames = [(.05 * i, _frame(covered=(1, ))) for i in range(20)]
+
+    @asyncio.coroutine
+    def test():
+        player = asyncio.ensure_future(_play(signals, occupancy, frames))
+        try:
+            yield asyncio.From(asyncio.wait_for(vision.wait(1, 2), 5))
+        finally:
+            player.cancel()
+
+    with pytest.raises(TransferStalled):
+        _run(test())
+    assert vision.stalled_count == 1
+
+
+def test_race():
+    signals = blinker.Namespace()
+    occupancy = _occupancy()
+    occupancy.set_reference(_frame(), M)
+    vision = VisionTransfer(signals, occupancy)
+
+    @asyncio.coroutine
+    def slow_transfer():
+        yield asyncio.From(asyncio.sleep(10))
+        raise asyncio.Return(['capacitance'])
+
+    @asyncio.coroutine
+    def fast_transfer():
+        yield asyncio.From(asyncio.sleep(0))
+        raise asyncio.Return(['capacitance'])
+
+    @asyncio.coroutine
+    def test(co_transfer, timeout):
+        player = asyncio.ensure_future(_play(signals, occupancy,
+                                             _transfer_frames()))
+        try:
+            result = yield asyncio.From(vision.race(co_transfer, 1, 2,
+                                                    timeout=timeout))
+        finally:
+            player.cancel()
+        raise asyncio.Return(result)
+
+    # Camera confirms transfer before capacitance criterion.
+    assert _run(test(slow_transfer(), 5)) is None
+    # Capacitance criterion is met first.
+    assert _run(test(fast_transfer(), 5)) == ['capacitance']
+    # Neither finishes in time.
+    with pytest.raises(asyncio.TimeoutError):
+        _run(test(slow_transfer(), .05))
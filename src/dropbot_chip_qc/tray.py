@@ -0,0 +1,325 @@
+# -*- encoding: utf-8 -*-
+'''
+Bulk chip UUID registration by scanning a tray of chips.
+
+Every QR code in each frame is decoded, and chips are tracked across frames
+by UUID to build a de-duplicated registration list, with the position of each
+chip in the tray.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+from collections import OrderedDict
+import functools as ft
+import logging
+import threading
+import time
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from .capture import CaptureThread, FrameRingBuffer, open_source
+from .payload import FramePayload
+from .qr import candidate_regions, get_decoder, scale_decoded
+from .video import FPS
+
+
+def decode_all(gray, scale=.5, decode='pyzbar', padding=.25,
+               max_regions=50):
+    '''
+    Decode *all* QR codes in a frame.
+
+    Unlike :func:`dropbot_chip_qc.qr.decode_adaptive`, which stops at the
+    first decoded region, symbols decoded from the downscaled frame are
+    combined with symbols decoded from every candidate QR code region (at
+    full resolution) not already covered by a decoded symbol.
+
+    Parameters
+    ----------
+    gray : numpy.ndarray
+        Full resolution grayscale frame.
+    scale : float, optional
+        Scale factor applied to frame before first decode attempt.
+    decode : str or function, optional
+        Decoder name or function (see :data:`dropbot_chip_qc.qr.DECODERS`).
+    padding : float, optional
+        Padding added around each candidate region, as a fraction of the
+        region size.
+    max_regions : int, optional
+        Maximum number of candidate regions to decode at full resolution.
+
+    Returns
+    -------
+    list[pyzbar.pyzbar.Decoded]
+        Decoded symbols (one per distinct data), in full resolution frame
+        coordinates.
+    '''
+    decode = get_decoder(decode)
+    if scale < 1:
+        small = cv2.resize(gray, None, fx=scale, fy=scale,
+                           interpolation=cv2.INTER_AREA)
+    else:
+        small, scale = gray, 1.
+    decoded = OrderedDict((d.data, scale_decoded(d, scale))
+                          for d in decode(small))
+
+    height, width = gray.shape[:2]
+    for x, y, w, h in candidate_regions(small, max_regions=max_regions):
+        pad_x = int(w * padding)
+        pad_y = int(h * padding)
+        x0 = max(0, int((x - pad_x) / scale))
+        y0 = max(0, int((y - pad_y) / scale))
+        x1 = min(width, int((x + w + pad_x) / scale))
+        y1 = min(height, int((y + h + pad_y) / scale))
+        if any(x0 <= r.left + .5 * r.width < x1 and
+               y0 <= r.top + .5 * r.height < y1
+               for r in (d.rect for d in decoded.values())):
+            # Region is already decoded.
+            continue
+        for d in decode(gray[y0:y1, x0:x1]):
+            if d.data not in decoded:
+                decoded[d.data] = scale_decoded(d, 1., offset=(x0, y0))
+    return list(decoded.values())
+
+
+class TrayRegistry(object):
+    '''
+    De-duplicated registry of chips detected across video frames.
+
+    A chip is *registered* once its UUID has been decoded in at least
+    ``min_detections`` frames, which filters out spurious decodes.
+
+    Parameters
+    ----------
+    min_detections : int, optional
+        Number of frames a UUID must be decoded in before it is registered.
+    alpha : float, optional
+        Smoothing factor of exponentially weighted chip position.
+    '''
+    def __init__(self, min_detections=2, alpha=.5):
+        self.min_detections = min_detections
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        # Tracked state of each UUID, in order of first detection.
+        self._chips = OrderedDict()
+
+    def __len__(self):
+        return sum(1 for chip in self._chips.values()
+                   if chip['detections'] >= self.min_detections)
+
+    def update(self, decoded_objects, timestamp=None):
+        '''
+        Parameters
+        ----------
+        decoded_objects : list[pyzbar.pyzbar.Decoded]
+            Symbols decoded from a single frame.
+        timestamp : float, optional
+            Frame capture time (default: current time).
+
+        Returns
+        -------
+        list[str]
+            UUIDs registered by this update.
+        '''
+        timestamp = time.time() if timestamp is None else timestamp
+        registered = []
+        with self._lock:
+            for d in decoded_objects:
+                uuid = (d.data.decode('utf8') if isinstance(d.data, bytes)
+                        else d.data)
+                rect = np.array(d.rect, dtype=float)
+                chip = self._chips.get(uuid)
+                if chip is None:
+                    chip = self._chips[uuid] = {'rect': rect,
+                                                'detections': 0,
+                                                'first_seen': timestamp}
+                else:
+                    chip['rect'] += self.alpha * (rect - chip['rect'])
+                chip['detections'] += 1
+                chip['last_seen'] = timestamp
+                if chip['detections'] == self.min_detections:
+                    registered.append(uuid)
+        return registered
+
+    def registrations(self, row_tolerance=.5):
+        '''
+        Parameters
+        ----------
+        row_tolerance : float, optional
+            Maximum vertical distance between chips in the same tray row,
+            relative to the median chip label height.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per registered chip, in tray order (top to bottom, left to
+            right), with the columns ``uuid``, ``row``, ``column``, ``x``,
+            ``y`` (label center in frame coordinates), ``width``, ``height``,
+            ``detections``, ``first_seen``, and ``last_seen``.
+        '''
+        columns = ['uuid', 'row', 'column', 'x', 'y', 'width', 'height',
+                   'detections', 'first_seen', 'last_seen']
+        with self._lock:
+            rows = [{'uuid': uuid,
+                     'x': chip['rect'][0] + .5 * chip['rect'][2],
+                     'y': chip['rect'][1] + .5 * chip['rect'][3],
+                     'width': chip['rect'][2], 'height': chip['rect'][3],
+                     'detections': chip['detections'],
+                     'first_seen': chip['first_seen'],
+                     'last_seen': chip['last_seen']}
+                    for uuid, chip in self._chips.items()
+                    if chip['detections'] >= self.min_detections]
+        df = pd.DataFrame(rows, columns=columns)
+        if df.empty:
+            return df
+        # Group chips into rows by vertical position.
+        df.sort_values('y', inplace=True)
+        tolerance = row_tolerance * df['height'].median()
+        df['row'] = (df['y'].diff() > tolerance).cumsum()
+        df.sort_values(['row', 'x'], inplace=True)
+        df['column'] = df.groupby('row').cumcount()
+        return df.reset_index(drop=True)
+
+
+def draw_tray(frame, decoded_objects, registry, scale=.5):
+    '''
+    Returns
+    -------
+    numpy.ndarray
+        Downscaled copy of ``frame`` with each decoded QR code outlined
+        (green if registered, yellow otherwise) and labelled with the first
+        characters of its UUID.
+    '''
+    display_frame = cv2.resize(frame, None, fx=scale, fy=scale,
+                               interpolation=cv2.INTER_AREA)
+    registered = set(registry.registrations()['uuid'])
+    for d in decoded_objects:
+        uuid = d.data.decode('utf8') if isinstance(d.data, bytes) else d.data
+        color = (0, 255, 0) if uuid in registered else (0, 255, 255)
+        polygon = (np.array(d.polygon, dtype=float) * scale).astype('int32')
+        cv2.polylines(display_frame, [polygon.reshape(-1, 1, 2)], True,
+                      color, 2)
+        x, y = polygon.min(axis=0)
+        cv2.putText(display_frame, uuid[:8], (int(x), max(10, int(y) - 5)),
+                    cv2.FONT_HERSHEY_SIMPLEX, .5, color, 1, cv2.LINE_AA)
+    return display_frame
+
+
+def tray_scan_process(signals, width=1920, height=1080, device_id=0,
+                      source=None, realtime=False, scale=.5,
+                      decoder='pyzbar', registry=None, buffer_size=4):
+    '''
+    Continuously decode every QR code in view of the webcam (or other video
+    source) to register a tray of chips.
+
+    Frames are captured in a background thread (see
+    :class:`dropbot_chip_qc.capture.CaptureThread`) and the newest frame is
+    decoded as soon as decoding of the previous frame finishes.
+
+    Parameters
+    ----------
+    signals : blinker.Namespace
+        The following signals are sent::
+        - ``frame-ready``: frame has been decoded; ``payload`` keyword
+          argument is a :class:`dropbot_chip_qc.payload.FramePayload` with
+          the fields ``raw_frame``, ``frame`` (half resolution frame with
+          decoded QR codes outlined; computed on access), ``decoded_objects``,
+          ``chip_uuid`` (``None``), ``frame_index``, ``timestamp``, ``fps``,
+          and ``registry``
+        - ``chip-registered``: new chip registered; keyword arguments
+          ``uuid`` and ``decoded_object``
+        - ``closed``: process has been closed (in response to a
+          ``exit-request`` signal, or at end of video source).  If capture
+          failed with an exception, the exception is raised after this
+          signal is sent.
+    width : int, optional
+        Video width.
+    height : int, optional
+        Video height.
+    device_id : int, optional
+        OpenCV video source id (starts at zero).
+    source : int, str, iterable, or object, optional
+        Video source to use instead of ``device_id`` (see
+        :func:`dropbot_chip_qc.capture.open_source`).
+    realtime : bool, optional
+        If ``True``, replay recorded ``source`` at recorded timing.
+    scale : float, optional
+        Scale factor applied to frames before first decode attempt (see
+        :func:`decode_all`).
+    decoder : str or function, optional
+        QR code decoder (see :data:`dropbot_chip_qc.qr.DECODERS`).
+    registry : TrayRegistry, optional
+        Registry to add chips to (default: new registry).
+    buffer_size : int, optional
+        Number of preallocated frames in capture ring buffer (at least 3).
+
+    Returns
+    -------
+    TrayRegistry
+        Registry of detected chips.
+    '''
+    if registry is None:
+        registry = TrayRegistry()
+    capture = open_source(device_id if source is None else source,
+                          width=width, height=height, realtime=realtime)
+    if capture.isOpened():  # try to get the first frame
+        frame_captured, frame = capture.read()
+    else:
+        frame_captured = False
+    if not frame_captured:
+        raise IOError('No frame.')
+
+    frames = FrameRingBuffer(frame.shape, frame.dtype, size=buffer_size)
+    slot = frames.write_slot()
+    frames.frames[slot] = frame
+    frames.commit(slot)
+    capture_thread = CaptureThread(capture, frames)
+    capture_thread.start()
+
+    exit_requested = threading.Event()
+    signals.signal('exit-request').connect(lambda sender: exit_requested.set(),
+                                           weak=False)
+    fps = FPS()
+
+    try:
+        while not exit_requested.is_set():
+            latest = frames.latest(timeout=1.)
+            if latest is None:
+                if frames.closed:
+                    # Capture has ended.
+                    break
+                continue
+            frame_index, timestamp, frame = latest
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            decoded_objects = decode_all(gray, scale=scale, decode=decoder)
+            for uuid in registry.update(decoded_objects, timestamp=timestamp):
+                decoded_object = next(d for d in decoded_objects
+                                      if d.data in (uuid, uuid.encode('utf8')))
+                logging.info('chip registered: `%s`', uuid)
+                signals.signal('chip-registered').send('tray_scan_process',
+                                                       uuid=uuid,
+                                                       decoded_object=
+                                                       decoded_object)
+            payload = FramePayload(views={'frame':
+                                          ft.partial(draw_tray, frame,
+                                                     decoded_objects,
+                                                     registry)},
+                                   raw_frame=frame,
+                                   decoded_objects=decoded_objects,
+                                   chip_uuid=None, frame_index=frame_index,
+                                   timestamp=timestamp, fps=fps,
+                                   registry=registry)
+            signals.signal('frame-ready').send('tray_scan_process',
+                                               payload=payload)
+            payload.close()
+            fps.update()
+    finally:
+        capture_thread.stop()
+        capture_thread.join()
+        capture.release()
+        signals.signal('closed').send('tray_scan_process')
+    # Raise exception that ended capture (if any) in processing thread.
+    frames.raise_error()
+    return registry
@@ -12,13 +12,13 @@ import asyncio_helpers as aioh
 import dropbot_chip_qc as qc
 import dropbot_chip_qc.ui.plan
 import dropbot_chip_qc.ui.render
-import networkx as nx
 import numpy as np
 import pandas as pd
 import path_helpers as ph
 import si_prefix as si
 import trollius as asyncio
 
+from ..paths import PathOracle
 from .mqtt_proxy import DropBotMqttProxy
 
 
@@ -28,9 +28,18 @@ light_green = '#90cd97'
 
 
 class Executor(object):
+    '''
+    .. versionchanged:: 0.13.0
+        Keep ``channels_graph`` as a :class:`dropbot_chip_qc.paths.PathOracle`
+        (backed by a :class:`dropbot_chip_qc.graph.ChannelGraph`) to reuse
+        shortest path tables (computed once, up front) across (re)plans;
+        resetting the graph only copies the removed channels mask and tables.
+    '''
     def __init__(self, channels_graph, channel_plan):
-        self.base_channels_graph = channels_graph.copy()
-        self.channels_graph = channels_graph.copy()
+        # Compute shortest path tables of all channels once; every reset
+        # copies them instead of recomputing tables on each query.
+        self.base_channels_graph = PathOracle(channels_graph, precompute=True)
+        self.channels_graph = self.base_channels_graph.copy()
         self.base_channel_plan = list(channel_plan)
         self.completed_results = []
         self._thread = None
@@ -59,12 +68,17 @@ class Executor(object):
                                      loop=False))
         return channel_plan, completed_transfers
 
-    def start(self, aproxy, signals, bad_channels=None, min_duration=.15):
+    def start(self, aproxy, signals, bad_channels=None, min_duration=.15,
+              vision=None):
         '''
         # TODO
 
          - incorporate `execute()` coroutine
          - add
+
+        .. versionchanged:: 0.13.0
+            Add ``vision`` keyword argument (see
+            :func:`dropbot_chip_qc.ui.plan.transfer_liquid`).
         '''
         if self.is_alive():
             raise RuntimeError('Executor is already running.')
@@ -99,12 +113,12 @@ class Executor(object):
                                               max_update_interval))
 
         looped_channel_plan = (channel_plan +
-                               nx.shortest_path(self.channels_graph,
-                                                channel_plan[-1],
-                                                self.base_channel_plan[0])[1:])
+                               self.channels_graph
+                               .path(channel_plan[-1],
+                                     self.base_channel_plan[0])[1:])
         self._task = aioh.cancellable(execute_test)
         transfer_liquid = ft.partial(qc.ui.plan.transfer_liquid, aproxy,
-                                     min_duration=min_duration)
+                                     min_duration=min_duration, vision=vision)
         self._thread = threading.Thread(target=self._task,
                                         args=(signals, looped_channel_plan,
                                               completed_transfers,
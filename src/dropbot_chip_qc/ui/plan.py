@@ -11,11 +11,12 @@ import itertools as it
 from dropbot.threshold_async import TransferTimeout, actuate, test_steady_state_
 from dropbot.move import window
 from logging_helpers import caller_name
-import networkx as nx
 import pandas as pd
 import si_prefix as si
 import trollius as asyncio
 
+from ..paths import path_oracle
+
 
 class OrphanChannelError(Exception):
     '''
@@ -55,14 +56,23 @@ def create_channel_plan(channels_graph, waypoints, loop=True):
     '''
     Parameters
     ----------
-    channels_graph : networkx.Graph
+    channels_graph : networkx.Graph, ChannelGraph, or PathOracle
+        Channel connections (see :class:`dropbot_chip_qc.graph.ChannelGraph`
+        and :class:`dropbot_chip_qc.paths.PathOracle`).
     waypoints : list
     loop : bool, optional
+
+
+    .. versionchanged:: 0.13.0
+        Accept a :class:`dropbot_chip_qc.paths.PathOracle` or
+        :class:`dropbot_chip_qc.graph.ChannelGraph` as ``channels_graph``; an
+        oracle reuses shortest path tables across plans.
     '''
-    channel_plan = list(it.chain(*(nx.shortest_path(channels_graph, a, b)
+    paths = path_oracle(channels_graph)
+    channel_plan = list(it.chain(*(paths.path(a, b)
                                    for a, b in window(waypoints, 2))))
     if loop:
-        channel_plan += nx.shortest_path(channels_graph, waypoints[-1], waypoints[0])
+        channel_plan += paths.path(waypoints[-1], waypoints[0])
     return unique(channel_plan)
 
 
@@ -80,6 +90,12 @@ def reroute_plan(waypoints, channels_graph, channel_plan, completed_plan):
 
 
     TODO - prune plan if removed channel makes waypoint channel(s) inaccessible.
+
+
+    .. versionchanged:: 0.13.0
+        Accept a :class:`dropbot_chip_qc.paths.PathOracle` as
+        ``channels_graph``; shortest path tables not affected by the removed
+        channel are reused.
     '''
     revised_plan = _reroute_plan(waypoints, channels_graph, channel_plan,
                                     completed_plan)
@@ -89,18 +105,15 @@ def reroute_plan(waypoints, channels_graph, channel_plan, completed_plan):
 def _reroute_plan(waypoints, channels_graph, channel_plan, completed_plan):
     completed_channels = set(completed_plan)
     channel_plan_i = list(channel_plan)
-    channels_graph_i = channels_graph.copy()
+    channels_graph_i = path_oracle(channels_graph).copy()
     removed_channel = channel_plan_i.pop(0)
     print('Removing channel `%s` from plan.' % removed_channel)
     channels_graph_i.remove_node(removed_channel)
 
-    subgraphs_i = list(nx.connected_component_subgraphs(channels_graph_i))
-
-    # Find subgraph containing last successfully transferred channel.
-    accessible_subgraph_i = next(s for s in subgraphs_i
-                                 if completed_plan[-1] in s)
-    subgraphs_i.remove(accessible_subgraph_i)
-    orphan_channels_i = set(it.chain(*(s.nodes for s in subgraphs_i)))
+    # Find channels connected to last successfully transferred channel.
+    accessible_channels_i = set(channels_graph_i
+                                .reachable(completed_plan[-1]))
+    orphan_channels_i = set(channels_graph_i) - accessible_channels_i
     untestable_channels_i = orphan_channels_i - completed_channels
     # if untestable_channels_i:
         # raise OrphanChannelError(completed_plan[-1],
@@ -163,7 +176,7 @@ def transfer_windows(signals, channel_plan, completed_transfers,
 
 
 @asyncio.coroutine
-def transfer_liquid(aproxy, channels, **kwargs):
+def transfer_liquid(aproxy, channels, vision=None, **kwargs):
     '''
     Transfer liquid from tail n-1 channels to head n-1 channels.
 
@@ -180,6 +193,17 @@ def transfer_liquid(aproxy, channels, **kwargs):
     At this point, the measured capacitance is recorded as a target threshold.
     Actuation **(2)** is then applied until the target threshold capacitance
     from actuation **(1)** is reached.
+
+    If ``vision`` (a :class:`dropbot_chip_qc.vision.VisionTransfer`) is set,
+    actuation **(2)** also completes as soon as the camera shows the head
+    channel covered, and the transfer fails early if the camera shows no
+    liquid movement.  In this case, no capacitance messages are recorded for
+    actuation **(2)** and its ``confirmed_by`` is ``'camera'`` (otherwise,
+    ``'capacitance'``).
+
+
+    .. versionchanged:: 0.13.0
+        Add ``vision`` keyword argument.
     '''
     messages_ = []
 
@@ -207,10 +231,14 @@ def transfer_liquid(aproxy, channels, **kwargs):
             df = pd.DataFrame(messages[-5:])
             return df.new_value.median() >= target_capacitance_i
 
-        messages = yield asyncio\
-            .From(actuate(aproxy, route_i, test_threshold))
+        co_actuate = actuate(aproxy, route_i, test_threshold)
+        if vision is not None:
+            co_actuate = vision.race(co_actuate, channels[0], channels[-1])
+        messages = yield asyncio.From(co_actuate)
         messages_.append({'channels': tuple(route_i),
-                          'messages': messages})
+                          'messages': messages or [],
+                          'confirmed_by': ('camera' if messages is None
+                                           else 'capacitance')})
     except (asyncio.CancelledError, asyncio.TimeoutError):
         raise TransferTimeout(channels)
 
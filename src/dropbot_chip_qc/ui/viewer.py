@@ -3,7 +3,6 @@
 .. versionadded:: v0.12.0
 '''
 from PySide2 import QtGui, QtCore, QtWidgets
-import cv2
 
 from .invoker import Invoker
 
@@ -84,6 +83,9 @@ class ImageViewer(QtWidgets.QGraphicsView):
 
 class QCVideoViewer(ImageViewer):
     '''Show latest frame received from a ``frame-ready`` blinker signal.
+
+    .. versionchanged:: 0.13.0
+        Use RGB combined frame view of lazy ``frame-ready`` payload.
     '''
     def __init__(self, parent, signals):
         super(QCVideoViewer, self).__init__(parent)
@@ -92,9 +94,9 @@ class QCVideoViewer(ImageViewer):
         signals.signal('frame-ready').connect(self.on_frame_ready)
         self._frame = None
 
-    def on_frame_ready(self, sender, **record):
-        frame = record['frame']
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    def on_frame_ready(self, sender, payload):
+        # Combined frame is only computed on access (see `FramePayload`).
+        rgb_frame = payload['frame_rgb']
 
         def draw_frame(rgb_frame):
             image = QtGui.QImage(rgb_frame, rgb_frame.shape[1],
@@ -1,20 +1,31 @@
 # -*- encoding: utf-8 -*-
 from __future__ import print_function, absolute_import, unicode_literals
+import functools as ft
 import logging
 import threading
 import time
+import timeit
 
 import blinker
 import numpy as np
 import pandas as pd
-import pyzbar.pyzbar as pyzbar
 
 try:
     import cv2
 except ImportError:
     raise Exception('Error: OpenCv is not installed')
 
+from .aruco import CornerSmoother, MarkerTracker
 from .async import asyncio, show_chip
+from .capture import CaptureThread, FrameRingBuffer, open_source
+from .compose import FrameCompositor
+from .frame_bus import FrameBusWriter
+from .motion import MotionGate
+from .payload import FramePayload, send_payload
+from .qr import QrDecodeScheduler, transform_region
+from .record import VideoRecorder, recording_paths
+from .timing import StageTimer
+from .warp import WarpEngine, project
 
 
 # XXX The `device_corners` device AruCo marker locations in the normalized
@@ -69,20 +80,39 @@ class FPS(object):
             return 0.
 
 
-def chip_video_process(signals, width=1920, height=1080, device_id=0):
+def chip_video_process(signals, width=1920, height=1080, device_id=0,
+                       buffer_size=4, qr_interval=.1, qr_scale=.5,
+                       qr_workers=1, aruco_scale=.5, warp_tolerance=1.,
+                       smoothing='mean', warp_scale=1., source=None,
+                       realtime=False, drop_frames=True, stage_timer=None,
+                       record_path=None, record_views=('warped', ),
+                       record_fps=30., frame_bus=None,
+                       frame_bus_view='warped', decode_scale=1,
+                       motion_threshold=8., motion_interval=30,
+                       qr_decoder='pyzbar', occupancy=None, history=None):
     '''
-    Continuously monitor webcam feed for DMF chip.
+    Continuously monitor webcam feed (or other video source) for DMF chip.
 
-    Repeatedly perform the following tasks:
+    Frames are read from the video source in a background thread into a bounded ring
+    buffer (see :class:`dropbot_chip_qc.capture.FrameRingBuffer`).  Repeatedly
+    perform the following tasks on the newest captured frame:
 
-     - read video frame from the webcam
+     - take newest video frame from the ring buffer (skipping stale frames)
      - detect AruCo markers in the frame, and draw overlay to indicate markers
-       (if available)
+       (if available); markers are tracked between frames, so a full frame
+       scan is only necessary when tracking is lost (see
+       :class:`dropbot_chip_qc.aruco.MarkerTracker`)
      - apply perspective correction based on detected AruCo marker positions
-       (if applicable)
-     - detect chip UUID from QR code (if available)
+       (if applicable); remap tables are cached while the transformation is
+       stable (see :class:`dropbot_chip_qc.warp.WarpEngine`)
+     - detect chip UUID from QR code (if available); decoding is performed in
+       background worker threads at a limited rate, on a downscaled grayscale
+       copy of the frame (see
+       :class:`dropbot_chip_qc.qr.QrDecodeScheduler`)
      - combine raw video frame and perspective-corrected frame into a single
-       frame
+       half-resolution frame, reusing preallocated canvases (only if a
+       ``frame-ready`` receiver accesses the combined frame; see
+       :class:`dropbot_chip_qc.compose.FrameCompositor`)
      - write the chip UUID as text in top-left corner of the combined video
        frame
 
@@ -104,7 +134,17 @@ def chip_video_process(signals, width=1920, height=1080, device_id=0):
     ----------
     signals : blinker.Namespace
         The following signals are sent::
-        - ``frame-ready``: video frame is ready; keyword arguments include::
+        - ``frame-ready``: video frame is ready; the ``payload`` keyword
+          argument is a :class:`dropbot_chip_qc.payload.FramePayload`
+          mapping.  The ``frame`` and ``warped`` views (and RGB copies
+          ``frame_rgb``, ``warped_rgb``, and ``raw_frame_rgb``) are only
+          computed when first accessed, and must be accessed within the
+          receiver callback.  Receivers without a ``payload`` argument are
+          sent the ``frame``, ``raw_frame``, ``warped``, ``transform``,
+          ``fps``, and ``chip_uuid`` fields as keyword arguments instead;
+          this is **deprecated** and will be removed in the next release
+          (see :func:`dropbot_chip_qc.payload.send_payload`).  Fields
+          include::
           - ``frame``: combined video frame
           - ``raw_frame``: raw frame from webcam
           - ``warped``: perspective-corrected frame
@@ -112,37 +152,221 @@ def chip_video_process(signals, width=1920, height=1080, device_id=0):
           - ``fps``: rate of frame processing in frames per second
           - ``chip_uuid``: UUID currently detected chip (``None`` if no chip is
             detected)
+          - ``frame_index``: index of raw frame in captured sequence
+          - ``timestamp``: time raw frame was captured (``time.time()``)
+          - ``frame_counts``: number of frames ``captured``, ``processed``,
+            and ``dropped`` (i.e., never processed) so far
+          - ``timings``: duration (in seconds) of each processing stage for
+            this frame (``dispatch`` is the duration of the *previous*
+            ``frame-ready`` dispatch, including any views computed by
+            receivers)
+          - ``stage_timer``: :class:`dropbot_chip_qc.timing.StageTimer`
+            with duration histograms of all processed frames, e.g., call
+            ``stage_timer.summary()`` for p50/p95/p99 stage durations
+          - ``occupancy``: per-electrode statistics array (see
+            :meth:`dropbot_chip_qc.occupancy.ElectrodeOccupancy.update`), or
+            ``None`` if ``occupancy`` is not set or chip is not located
         - ``closed``: process has been closed (in response to a
-          ``exit-request`` signal).
+          ``exit-request`` signal, or when capture ends).  If capture failed
+          with an exception, the exception is raised after this signal is
+          sent.
         - ``chip-detected``: new chip UUID has been detected
         - ``chip-removed``: chip UUID no longer detected
+        - ``recording-started``: started recording video of detected chip;
+          keyword arguments include ``uuid`` and ``paths`` (output path of
+          each recorded view)
+        - ``recording-stopped``: stopped recording video of chip; keyword
+          arguments include ``uuid``, ``paths``, and ``frame_counts``
+          (number of frames ``written``, ``dropped``, and ``duplicated`` for
+          each view)
+        - ``occupancy-reference-set``: occupancy reference frame has been
+          set (see ``occupancy``); keyword arguments include
+          ``frame_index`` and ``timestamp``
+
+        The following signals are received::
+        - ``exit-request``: close process
+        - ``occupancy-reference-request``: set occupancy reference frame on
+          the next frame where the chip is located (see ``occupancy``)
     width : int, optional
         Video width.
     height : int, optional
         Video height.
     device_id : int, optional
         OpenCV video source id (starts at zero).
+    buffer_size : int, optional
+        Number of preallocated frames in capture ring buffer (at least 3).
+    qr_interval : float, optional
+        Minimum time between QR decode attempts (in seconds) while no chip is
+        detected.
+    qr_scale : float, optional
+        Scale factor applied to frames before QR decoding.  Full resolution
+        is only decoded within candidate QR code regions.
+    qr_workers : int, optional
+        Number of QR decode worker threads.
+    aruco_scale : float, optional
+        Scale factor applied to frames for full AruCo marker scans.
+    warp_tolerance : float, optional
+        Maximum drift (in pixels) of perspective-corrected frame corners before
+        cached remap tables are rebuilt.
+    smoothing : str, optional
+        Method used to smooth detected AruCo marker corners over time; one of
+        ``'mean'`` (moving average of last 5 detections), ``'ewma'``, or
+        ``'kalman'`` (see :class:`dropbot_chip_qc.aruco.CornerSmoother`).
+    warp_scale : float, optional
+        Scale of perspective-corrected frame relative to raw frame.  Use
+        ``0.5`` to render the perspective-corrected view directly at the size
+        of the combined display frame.
+    source : int, str, iterable, or object, optional
+        Video source to use instead of ``device_id``, e.g., path to recorded
+        video file, directory of images, or iterable of frames (see
+        :func:`dropbot_chip_qc.capture.open_source`).
+    realtime : bool, optional
+        If ``True``, replay recorded ``source`` at recorded timing.
+        Otherwise, replay as fast as possible.
+    drop_frames : bool, optional
+        If ``False``, every frame read from the source is processed (capture
+        waits for processing), e.g., to benchmark or regression test the
+        vision pipeline on a recorded video.
+    stage_timer : dropbot_chip_qc.timing.StageTimer, optional
+        Stage timer to record processing stage durations to (default: create
+        new timer).
+    record_path : str or function, optional
+        If provided, record video of each detected chip while it is detected,
+        encoding frames in a background thread.  Either a path template
+        containing ``%(uuid)s`` (and optionally ``%(view)s``), e.g.,
+        ``~/videos/%(uuid)s.mp4``, or a function ``record_path(uuid, view)``
+        returning the output path (see
+        :func:`dropbot_chip_qc.record.recording_paths`).
+    record_views : list[str], optional
+        Views to record: ``'warped'`` (perspective-corrected) and/or ``'raw'``.
+    record_fps : float, optional
+        Frame rate of recorded video.  Frames are repeated or dropped based on
+        their capture timestamps, so recorded video plays back in real time
+        even if the processing rate differs.
+    frame_bus : str, optional
+        If provided, publish frames to shared-memory frame bus with this name,
+        so consumers in other processes can attach using
+        :class:`dropbot_chip_qc.frame_bus.FrameBusReader`.  Metadata of each
+        frame includes ``chip_uuid``, ``transform``, and ``fps``.
+    frame_bus_view : str, optional
+        View published to frame bus: ``'warped'`` (perspective-corrected) or
+        ``'raw'``.
+    decode_scale : int, optional
+        Decode MJPEG frames from video device at ``1 / decode_scale`` of the
+        device resolution (1, 2, 4, or 8); see
+        :class:`dropbot_chip_qc.capture.DeviceSource`.  All processing then
+        runs on the reduced frames, except QR codes, which are decoded from
+        the compressed full resolution frame when the reduced frame is not
+        sufficient.
+    motion_threshold : float, optional
+        Change in intensity (of any pixel of a small frame thumbnail) above
+        which marker detection and perspective correction are repeated (see
+        :class:`dropbot_chip_qc.motion.MotionGate`).  While nothing in view
+        moves and either both markers were found or no chip is detected,
+        marker positions (including the marker overlay) and the perspective
+        correction transform of the last processed frame are reused.  Views,
+        recorded video, frame bus frames, and occupancy statistics are still
+        computed from each new frame.
+    motion_interval : int, optional
+        Maximum number of consecutive frames for which marker detection and
+        perspective correction may be skipped.  Set to ``0`` to process every
+        frame.
+    qr_decoder : str or function, optional
+        QR code decoder; either ``'pyzbar'``, ``'opencv'``, or a function with
+        the same interface as :func:`pyzbar.pyzbar.decode` (see
+        :data:`dropbot_chip_qc.qr.DECODERS`).  Once a chip UUID has been
+        decoded while both AruCo markers are visible, the position of the QR
+        code relative to the markers is used to decode the same region of
+        subsequent chips first.
+    occupancy : dropbot_chip_qc.occupancy.ElectrodeOccupancy, optional
+        If provided, compute per-electrode statistics (mean intensity and
+        coverage) of each frame where the chip is located; published as the
+        ``occupancy`` field of ``frame-ready`` messages.  A reference frame
+        for coverage (see
+        :meth:`dropbot_chip_qc.occupancy.ElectrodeOccupancy.set_reference`)
+        is set on the first frame where the chip is located after it is
+        detected, and again on request (e.g., once the chip has settled and
+        before liquid is loaded).
+    history : dropbot_chip_qc.history.FrameHistory, optional
+        If provided, append each raw frame (before overlays are drawn) to the
+        compressed frame history, e.g., to extract clips around test events.
+        Compressed MJPEG buffers from the video device (see ``decode_scale``)
+        are stored without encoding again; other frames are compressed in the
+        history's background thread.
+
+    Notes
+    -----
+    ``raw_frame`` references a ring buffer slot that is reused once the next
+    frame is processed, and ``frame`` references a canvas that is reused two
+    combined frames later; copy them to keep them beyond the signal callback.
+
+
+    .. versionchanged:: 0.13.0
+        Capture frames in a background thread and always process the newest
+        frame; decode QR codes off the video processing thread (QR code region
+        hinted by AruCo marker positions first); track AruCo markers between
+        frames; reuse perspective correction remap tables; smooth marker
+        corners using preallocated arrays; compose combined frame into reusable
+        half-resolution canvases, only if ``frame-ready`` has receivers; and
+        skip marker detection and perspective correction while nothing moves.
+        Send ``frame-ready`` message fields as a single lazy ``payload``
+        mapping, where views are only computed when accessed by receivers
+        (legacy keyword arguments are deprecated), and add ``frame_index``,
+        ``frame_counts``, ``timestamp``, ``timings``, ``stage_timer``, and
+        ``occupancy`` fields.  Send ``recording-started`` and
+        ``recording-stopped`` signals.  Add ``buffer_size``, ``qr_interval``,
+        ``qr_scale``, ``qr_workers``, ``qr_decoder``, ``aruco_scale``,
+        ``warp_tolerance``, ``smoothing``, ``warp_scale``, ``source``,
+        ``realtime``, ``drop_frames``, ``decode_scale``, ``stage_timer``,
+        ``record_path``, ``record_views``, ``record_fps``, ``frame_bus``,
+        ``frame_bus_view``, ``motion_threshold``, ``motion_interval``,
+        ``occupancy``, and ``history`` keyword arguments.
     '''
-    capture = cv2.VideoCapture(device_id)
-
-    # Set format to MJPG (instead of YUY2) to _dramatically_ improve frame
-    # rate.  For example, using Logitech C920 camera, frame rate increases from
-    # 10 FPS to 30 FPS (not including QR code detection, warping, etc.).
-    #
-    # See: https://github.com/opencv/opencv/issues/9084#issuecomment-324477425
-    fourcc_int = np.fromstring(bytes('MJPG'), dtype='uint8').view('uint32')[0]
-    capture.set(cv2.CAP_PROP_FOURCC, fourcc_int)
-
-    capture.set(cv2.CAP_PROP_AUTOFOCUS, True)
-    capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-    capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    capture = open_source(device_id if source is None else source,
+                          width=width, height=height, realtime=realtime,
+                          decode_scale=decode_scale)
 
     if capture.isOpened():  # try to get the first frame
         frame_captured, frame = capture.read()
     else:
+        frame_captured = False
+    if not frame_captured:
         raise IOError('No frame.')
 
-    corners_by_id = {}
+    # Preallocate ring buffer based on actual frame size (requested resolution
+    # may not be supported by device).  Seed with first frame.
+    frames = FrameRingBuffer(frame.shape, frame.dtype, size=buffer_size)
+    slot = frames.write_slot()
+    frames.frames[slot] = frame
+    frames.commit(slot)
+    if stage_timer is None:
+        stage_timer = StageTimer()
+    capture_thread = CaptureThread(capture, frames, drop_frames=drop_frames,
+                                   stage_timer=stage_timer)
+    capture_thread.start()
+    qr_scheduler = QrDecodeScheduler(interval=qr_interval, scale=qr_scale,
+                                     workers=qr_workers, decode=qr_decoder,
+                                     stage_timer=stage_timer).start()
+
+    marker_tracker = MarkerTracker(marker_ids=range(2), scale=aruco_scale)
+    motion_gate = MotionGate(threshold=motion_threshold,
+                             interval=motion_interval)
+    warp_engine = WarpEngine(tolerance=warp_tolerance, scale=warp_scale)
+    # Keep display size independent of decode scale (without upscaling).
+    compositor = FrameCompositor(scale=min(1., .5 * decode_scale))
+    if frame_bus is not None:
+        if frame_bus_view == 'raw':
+            frame_bus_shape = frame.shape
+        else:
+            frame_bus_shape = (warp_engine.output_size(frame.shape[1::-1])
+                               [::-1] + frame.shape[2:])
+        frame_bus_writer = FrameBusWriter(frame_bus, frame_bus_shape,
+                                          dtype=frame.dtype)
+    corner_smoother = CornerSmoother(marker_ids=range(2), window=5,
+                                     method=smoothing)
+    # Target quad of perspective transform only depends on frame size.
+    device_quad = (device_corners.loc[corner_indices] *
+                   frame.shape[:2][::-1]).values.astype('float32')
 
     start = time.time()
     frame_count = 0
@@ -158,113 +382,258 @@ def chip_video_process(signals, width=1920, height=1080, device_id=0):
 
     signals.signal('exit-request').connect(lambda sender: exit_requested.set(),
                                            weak=False)
+    reference_requested = threading.Event()
+    signals.signal('occupancy-reference-request')\
+        .connect(lambda sender, **kwargs: reference_requested.set(),
+                 weak=False)
 
     # Font used for UUID label.
     font = cv2.FONT_HERSHEY_SIMPLEX
     fps = FPS()
-
-    while frame_captured and not exit_requested.is_set():
-        # Find barcodes and QR codes
-        if not chip_detected.is_set():
-            decodedObjects = pyzbar.decode(frame)
-            if decodedObjects:
-                chip_detected.decoded_objects = decodedObjects
-                chip_detected.set()
-                # Find font scale to fit UUID to width of frame.
-                text = chip_detected.decoded_objects[0].data
-                scale = 4
-                thickness = 1
-                text_size = cv2.getTextSize(text, font, scale, thickness)
-                while text_size[0][0] > frame.shape[0]:
-                    scale *= .95
+    dispatch_duration = 0.
+    # Video recorder for each recorded view of the currently detected chip.
+    recorders = {}
+    # Marker detection results (reused for frames skipped by motion gate).
+    corners, ids = [], None
+    corners_by_id_i = {}
+    # Bounding box of QR code in perspective-corrected frame (learned from
+    # decoded chips).
+    qr_region = None
+    def warp(frame, M, timings, cache):
+        if M is None:
+            return frame
+        if 'warped' not in cache:
+            # Transform may be reused from a previous frame (see
+            # `motion_gate`), but always warp the current frame.
+            with stage_timer.time('warp', timings):
+                cache['warped'] = warp_engine.warp(frame, M)
+        return cache['warped']
+
+    def compose(frame, warp_view, timings, label):
+        warped = warp_view()
+        with stage_timer.time('compose', timings):
+            display_frame = compositor.compose(frame, warped)
+            if label is not None:
+                cv2.putText(display_frame, label['uuid'],
+                            (10, 10 + label['text_size'][0][-1]), font,
+                            label['scale'], (255,255,255),
+                            label['thickness'], cv2.LINE_AA)
+        return display_frame
+
+    def start_recording(uuid):
+        paths = recording_paths(record_path, uuid, record_views)
+        for view, path in paths.items():
+            recorders[view] = VideoRecorder(path, fps=record_fps)
+        signals.signal('recording-started').send('chip_video_process',
+                                                 uuid=uuid, paths=paths)
+
+    def stop_recording(uuid):
+        for recorder in recorders.values():
+            recorder.close()
+        paths = {view: r.path for view, r in recorders.items()}
+        frame_counts = {view: {'written': r.written_count,
+                               'dropped': r.dropped_count,
+                               'duplicated': r.duplicated_count}
+                        for view, r in recorders.items()}
+        recorders.clear()
+        signals.signal('recording-stopped').send('chip_video_process',
+                                                 uuid=uuid, paths=paths,
+                                                 frame_counts=frame_counts)
+
+    try:
+        while not exit_requested.is_set():
+            latest = frames.latest(timeout=1.)
+            if latest is None:
+                if frames.closed:
+                    # Capture has ended.
+                    break
+                continue
+            frame_index, timestamp, frame = latest
+            start_i = timeit.default_timer()
+            timings = {'capture': frames.pinned_duration,
+                       'dispatch': dispatch_duration}
+            if history is not None:
+                with stage_timer.time('history', timings):
+                    history.append(timestamp, frame,
+                                   encoded=frames.pinned_encoded)
+
+            # Find barcodes and QR codes
+            if not chip_detected.is_set():
+                with stage_timer.time('qr', timings):
+                    # Results are from a previously submitted frame (if any).
+                    decodedObjects = qr_scheduler.result()
+                    markers_found = all(i in corners_by_id_i for i in range(2))
+                    if not decodedObjects:
+                        if qr_region is not None and markers_found:
+                            # Decode expected QR code region first.
+                            hints = [transform_region(np.linalg.inv(M),
+                                                      qr_region,
+                                                      size=frame.shape[1::-1])]
+                        else:
+                            hints = None
+                        qr_scheduler.submit(frame,
+                                            encoded=frames.pinned_encoded,
+                                            frame_scale=1. / decode_scale,
+                                            hints=hints)
+                if decodedObjects:
+                    if markers_found:
+                        # Learn position of QR code relative to markers,
+                        # i.e., in perspective-corrected frame coordinates.
+                        points = project(M, decodedObjects[0].polygon)
+                        qr_region = (tuple(points.min(axis=0)) +
+                                     tuple(points.max(axis=0)))
+                    chip_detected.decoded_objects = decodedObjects
+                    chip_detected.set()
+                    if occupancy is not None:
+                        # Reference of chip before liquid is loaded.
+                        reference_requested.set()
+                    # Find font scale to fit UUID to width of combined frame.
+                    text = chip_detected.decoded_objects[0].data
+                    scale = 4
+                    thickness = 1
                     text_size = cv2.getTextSize(text, font, scale, thickness)
-                chip_detected.label = {'uuid': text, 'scale': scale,
-                                       'thickness': 1, 'text_size': text_size}
-                signals.signal('chip-detected')\
-                    .send('chip_video_process',
-                          decoded_objects=chip_detected.decoded_objects)
-                logging.info('chip detected: `%s`',
-                             chip_detected.decoded_objects[0].data)
-
-        detect_dict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_1000)
-        corners, ids, rejectedImgPoints = cv2.aruco.detectMarkers(frame,
-                                                                  detect_dict)
-        cv2.aruco.drawDetectedMarkers(frame, corners, ids)
-        corners_by_id_i = (dict(zip(ids[:, 0], corners)) if ids is not None
-                           else {})
-
-        updated = False
-        for i in range(2):
-            if i in corners_by_id_i:
-                corners_list_i = corners_by_id.setdefault(i, [])
-                corners_list_i.append(corners_by_id_i[i])
-                del corners_list_i[:-5]
-                updated = True
-
-        if updated and all(i in corners_by_id_i for i in range(2)):
-            not_detected_count = 0
-            mean_corners = pd.concat((pd.DataFrame(np.array(corners_by_id[i])
-                                                   .mean(axis=0)[0],
-                                                   columns=['x', 'y'],
-                                                   index=['top-left',
-                                                          'top-right',
-                                                          'bottom-right',
-                                                          'bottom-left'])
-                                      for i in range(2)), keys=range(2))
-            M = cv2.getPerspectiveTransform(mean_corners.loc[corner_indices]
-                                            .values,
-                                            (device_corners.loc[corner_indices]
-                                             * frame.shape[:2][::-1]).values)
-        elif chip_detected.is_set():
-            M = None
-            not_detected_count += 1
-
-        if M is None and not_detected_count >= 10:
-            not_detected_count = 0
-            # AruCo markers have not been detected for the previous 10 frames;
-            # assume chip has been removed.
-            chip_detected.clear()
-            signals.signal('chip-removed').send('chip_video_process')
-
-        if M is not None:
-            warped =  cv2.warpPerspective(frame, M, frame.shape[:2][::-1])
-        else:
-            warped = frame
-        display_frame = np.concatenate([frame, warped])
-        display_frame = cv2.resize(display_frame,
-                                   tuple(np.array(display_frame.shape[:2]) /
-                                         2))
-        if chip_detected.is_set():
-            kwargs = chip_detected.label.copy()
-            cv2.putText(display_frame, kwargs['uuid'],
-                        (10, 10 + kwargs['text_size'][0][-1]), font,
-                        kwargs['scale'], (255,255,255),
-                        kwargs['thickness'], cv2.LINE_AA)
-            chip_uuid = chip_detected.label['uuid']
-        else:
-            chip_uuid = None
-        signals.signal('frame-ready').send('chip_video_process',
-                                           frame=display_frame, transform=M,
-                                           raw_frame=frame, warped=warped,
-                                           fps=fps, chip_uuid=chip_uuid)
-        frame_captured, frame = capture.read()
-        fps.update()
-
-    # When everything done, release the capture
-    capture.release()
-    signals.signal('closed').send('chip_video_process')
-
-
-def main(signals=None, resolution=(1280, 720), device_id=0):
+                    while text_size[0][0] > frame.shape[1] * compositor.scale:
+                        scale *= .95
+                        text_size = cv2.getTextSize(text, font, scale,
+                                                    thickness)
+                    chip_detected.label = {'uuid': text, 'scale': scale,
+                                           'thickness': 1,
+                                           'text_size': text_size}
+                    signals.signal('chip-detected')\
+                        .send('chip_video_process',
+                              decoded_objects=chip_detected.decoded_objects)
+                    logging.info('chip detected: `%s`',
+                                 chip_detected.decoded_objects[0].data)
+                    if record_path is not None:
+                        start_recording(text)
+
+            markers_found = all(i in corners_by_id_i for i in range(2))
+            with stage_timer.time('aruco', timings):
+                # Only re-detect markers if something moved, unless chip state
+                # is still settling (i.e., chip detected but markers missing).
+                process = motion_gate.update(frame, stable=markers_found or
+                                             not chip_detected.is_set())
+                if process:
+                    corners, ids = marker_tracker.detect(frame)
+                    corners_by_id_i = (dict(zip(ids[:, 0], corners))
+                                       if ids is not None else {})
+
+                    for i in range(2):
+                        if i in corners_by_id_i:
+                            corner_smoother.update(i, corners_by_id_i[i])
+                cv2.aruco.drawDetectedMarkers(frame, corners, ids)
+
+            if process:
+                if all(i in corners_by_id_i for i in range(2)):
+                    not_detected_count = 0
+                    M = cv2.getPerspectiveTransform(corner_smoother
+                                                    .quad(corner_indices),
+                                                    device_quad)
+                elif chip_detected.is_set():
+                    M = None
+                    not_detected_count += 1
+
+            if M is None and not_detected_count >= 10:
+                not_detected_count = 0
+                # AruCo markers have not been detected for the previous 10
+                # frames; assume chip has been removed.
+                chip_detected.clear()
+                # Discard decode results from frames where chip was still
+                # present.
+                qr_scheduler.reset()
+                corner_smoother.reset()
+                if occupancy is not None:
+                    occupancy.reset()
+                if recorders:
+                    stop_recording(chip_detected.label['uuid'])
+                signals.signal('chip-removed').send('chip_video_process')
+
+            if occupancy is None or M is None:
+                occupancy_stats = None
+            else:
+                with stage_timer.time('occupancy', timings):
+                    reference_set = reference_requested.is_set()
+                    if reference_set:
+                        reference_requested.clear()
+                        occupancy.set_reference(frame, M)
+                    occupancy_stats = occupancy.update(frame, M)
+                if reference_set:
+                    signals.signal('occupancy-reference-set')\
+                        .send('chip_video_process', frame_index=frame_index,
+                              timestamp=timestamp)
+            chip_uuid = (chip_detected.label['uuid'] if chip_detected.is_set()
+                         else None)
+            # Views are computed on first access (see `FramePayload`).
+            warp_view = ft.partial(warp, frame, M, timings, {})
+            compose_view = ft.partial(compose, frame, warp_view, timings,
+                                      chip_detected.label if chip_uuid
+                                      else None)
+            if recorders:
+                with stage_timer.time('record', timings):
+                    for view, recorder in recorders.items():
+                        recorder.write(frame if view == 'raw' else warp_view(),
+                                       timestamp=timestamp)
+            if frame_bus is not None:
+                with stage_timer.time('publish', timings):
+                    frame_bus_writer.publish(frame if frame_bus_view == 'raw'
+                                             else warp_view(),
+                                             timestamp=timestamp,
+                                             frame_index=frame_index,
+                                             chip_uuid=chip_uuid, transform=M,
+                                             fps=fps.framerate)
+            # Total processing time, excluding `frame-ready` dispatch.
+            dispatch_start = timeit.default_timer()
+            timings['total'] = dispatch_start - start_i
+            stage_timer.record('total', timings['total'])
+            payload = FramePayload(views={'warped': warp_view,
+                                          'frame': compose_view},
+                                   transform=M, raw_frame=frame, fps=fps,
+                                   chip_uuid=chip_uuid,
+                                   frame_index=frame_index,
+                                   timestamp=timestamp,
+                                   frame_counts=frames.counts,
+                                   timings=timings, stage_timer=stage_timer,
+                                   occupancy=occupancy_stats)
+            send_payload(signals.signal('frame-ready'), 'chip_video_process',
+                         payload)
+            # Buffers of uncomputed views are reused from here on.
+            payload.close()
+            dispatch_duration = timeit.default_timer() - dispatch_start
+            stage_timer.record('dispatch', dispatch_duration)
+            fps.update()
+    finally:
+        # When everything done, stop capture thread and release the capture
+        capture_thread.stop()
+        capture_thread.join()
+        qr_scheduler.stop()
+        if recorders:
+            stop_recording(chip_detected.label['uuid'])
+        if frame_bus is not None:
+            frame_bus_writer.close()
+        capture.release()
+        signals.signal('closed').send('chip_video_process')
+    # Raise exception that ended capture (if any) in processing thread.
+    frames.raise_error()
+
+
+def main(signals=None, resolution=(1280, 720), device_id=0, source=None,
+         realtime=True, decode_scale=1, qr_decoder='pyzbar'):
     '''
     Launch chip webcam monitor thread and view window.
+
+    .. versionchanged:: 0.13.0
+        Add ``source``, ``realtime``, ``decode_scale``, and ``qr_decoder``
+        keyword arguments (see :func:`chip_video_process`).
     '''
     if signals is None:
         signals = blinker.Namespace()
 
     thread = threading.Thread(target=chip_video_process,
                               args=(signals, resolution[0], resolution[1],
-                                    device_id))
+                                    device_id),
+                              kwargs={'source': source, 'realtime': realtime,
+                                      'decode_scale': decode_scale,
+                                      'qr_decoder': qr_decoder})
     thread.start()
 
     loop = asyncio.get_event_loop()
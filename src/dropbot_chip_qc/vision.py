@@ -0,0 +1,268 @@
+# -*- encoding: utf-8 -*-
+'''
+Camera-based liquid transfer criterion, using the per-electrode occupancy
+statistics of ``frame-ready`` messages (see
+:class:`dropbot_chip_qc.occupancy.ElectrodeOccupancy`).
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+import functools as ft
+import logging
+
+import numpy as np
+import trollius as asyncio
+
+from .async import FrameSubscription
+
+
+class TransferStalled(asyncio.TimeoutError):
+    '''
+    Liquid did not visibly move towards the target electrode(s).
+
+    Subclass of :class:`asyncio.TimeoutError`, so existing timeout handling
+    (e.g., :class:`dropbot.move.MoveTimeout`) also applies.
+    '''
+    def __init__(self, source, target, progress, *args, **kwargs):
+        super(TransferStalled, self).__init__(*args, **kwargs)
+        self.source = source
+        self.target = target
+        self.progress = progress
+
+    def __str__(self):
+        return ('No visible liquid movement from `%s` to `%s` (progress: '
+                '%.2f)' % (self.source, self.target, self.progress))
+
+
+class VisionTransfer(object):
+    '''
+    Complete liquid transfers as soon as the camera shows the target
+    electrode(s) covered, and fail transfers early when the liquid visibly
+    does not move.
+
+    *Progress* of a transfer is the mean ``coverage`` of the target
+    electrode(s) if the occupancy statistics have a reference frame.
+    Otherwise, progress is the change in mean intensity of the target
+    electrode(s) since the start of the transfer, relative to the initial
+    intensity difference between source and target electrode(s); i.e., ``1``
+    once the target looks like the source did.  If that difference is below
+    ``min_contrast``, progress is unknown and the transfer is neither
+    confirmed nor failed by the camera.
+
+    Parameters
+    ----------
+    signals : blinker.Namespace
+        DMF chip webcam monitor signals (see
+        :func:`dropbot_chip_qc.video.chip_video_process`, which must be
+        called with the same ``occupancy``).
+    occupancy : dropbot_chip_qc.occupancy.ElectrodeOccupancy
+        Occupancy statistics of ``frame-ready`` messages.
+    coverage : float, optional
+        Progress at which a transfer is complete.
+    stall_timeout : float, optional
+        Seconds after start of a transfer to require ``min_progress``.
+    min_progress : float, optional
+        Minimum progress within ``stall_timeout`` seconds.
+    min_contrast : float, optional
+        Minimum intensity difference between source and target electrode(s) to
+        measure progress without a reference frame.
+
+    Attributes
+    ----------
+    confirmed_count : int
+        Number of transfers completed by the camera.
+    stalled_count : int
+        Number of transfers failed by the camera.
+    '''
+    def __init__(self, signals, occupancy, coverage=.5, stall_timeout=1.,
+                 min_progress=.1, min_contrast=10.):
+        self.signals = signals
+        self.occupancy = occupancy
+        self.coverage = coverage
+        self.stall_timeout = stall_timeout
+        self.min_progress = min_progress
+        self.min_contrast = min_contrast
+        self.confirmed_count = 0
+        self.stalled_count = 0
+
+    def rows(self, channels):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            Statistics rows of electrodes connected to any of ``channels``.
+        '''
+        return np.flatnonzero(np.in1d(self.occupancy.channels,
+                                      np.ravel(channels)))
+
+    def progress(self, stats, baseline, source_rows, target_rows):
+        '''
+        Parameters
+        ----------
+        stats : numpy.ndarray
+            Current occupancy statistics.
+        baseline : numpy.ndarray
+            Occupancy statistics at start of transfer.
+        source_rows, target_rows : numpy.ndarray
+            Statistics rows of source and target electrodes (see
+            :meth:`rows`).
+
+        Returns
+        -------
+        float
+            Transfer progress, or ``NaN`` if progress is unknown.
+        '''
+        coverage = stats[target_rows, 1]
+        if not np.isnan(coverage).any():
+            return coverage.mean()
+        target_mean = baseline[target_rows, 0].mean()
+        contrast = baseline[source_rows, 0].mean() - target_mean
+        if abs(contrast) < self.min_contrast:
+            return np.nan
+        return (stats[target_rows, 0].mean() - target_mean) / contrast
+
+    @asyncio.coroutine
+    def set_reference(self, timeout=5.):
+        '''
+        Request a new occupancy reference frame (see
+        :func:`dropbot_chip_qc.video.chip_video_process`), e.g., once the
+        chip is in place and before liquid is loaded, and wait until it is
+        set.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time to wait, in seconds.
+
+        Returns
+        -------
+        bool
+            ``True`` if reference frame was set within ``timeout``.
+        '''
+        loop = asyncio.get_event_loop()
+        reference_set = asyncio.Event(loop=loop)
+
+        def on_reference_set(sender, **kwargs):
+            loop.call_soon_threadsafe(reference_set.set)
+
+        signal = self.signals.signal('occupancy-reference-set')
+        signal.connect(on_reference_set)
+        try:
+            self.signals.signal('occupancy-reference-request')\
+                .send('VisionTransfer')
+            yield asyncio.From(asyncio.wait_for(reference_set.wait(),
+                                                timeout))
+        except asyncio.TimeoutError:
+            raise asyncio.Return(False)
+        finally:
+            signal.disconnect(on_reference_set)
+        raise asyncio.Return(True)
+
+    @asyncio.coroutine
+    def wait(self, source, target):
+        '''
+        Wait for camera to show liquid transferred from ``source`` to
+        ``target`` channel(s).
+
+        Never returns if progress is unknown (e.g., chip is not in view).
+
+        Returns
+        -------
+        float
+            Transfer progress.
+
+        Raises
+        ------
+        TransferStalled
+            If progress is below ``min_progress`` in the first frame captured
+            at least ``stall_timeout`` seconds after the first frame of the
+            transfer.
+        '''
+        source_rows = self.rows(source)
+        target_rows = self.rows(target)
+        baseline = None
+        with FrameSubscription(self.signals) as subscription:
+            while True:
+                payload = yield asyncio.From(subscription.get())
+                stats = payload.get('occupancy')
+                if stats is None or not (source_rows.size and
+                                         target_rows.size):
+                    continue
+                if baseline is None:
+                    baseline = stats.copy()
+                    start = payload['timestamp']
+                    initial = self.progress(stats, baseline, source_rows,
+                                            target_rows)
+                    continue
+                progress = self.progress(stats, baseline, source_rows,
+                                         target_rows)
+                if np.isnan(progress):
+                    continue
+                if progress >= self.coverage:
+                    self.confirmed_count += 1
+                    raise asyncio.Return(progress)
+                if (payload['timestamp'] - start >= self.stall_timeout and
+                        progress - np.nan_to_num(initial) <
+                        self.min_progress):
+                    self.stalled_count += 1
+                    raise TransferStalled(source, target, progress)
+
+    @asyncio.coroutine
+    def race(self, co_transfer, source, target, timeout=None):
+        '''
+        Race a (e.g., capacitance-based) transfer coroutine against
+        :meth:`wait`; whichever finishes first decides the transfer, and the
+        other is cancelled.
+
+        Parameters
+        ----------
+        co_transfer : asyncio.coroutine
+            Transfer coroutine.
+        source, target : int or list[int]
+            Source and target channel(s).
+        timeout : float, optional
+            Maximum duration of transfer in seconds.
+
+        Returns
+        -------
+        object
+            Result of ``co_transfer``, or ``None`` if camera confirmed the
+            transfer first.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            If neither finished within ``timeout`` seconds.
+        TransferStalled
+            If camera shows no progress (see :meth:`wait`).
+        '''
+        transfer = asyncio.ensure_future(co_transfer)
+        vision = asyncio.ensure_future(self.wait(source, target))
+        try:
+            done, pending = yield asyncio\
+                .From(asyncio.wait([transfer, vision], timeout=timeout,
+                                   return_when=asyncio.FIRST_COMPLETED))
+        finally:
+            for future in (transfer, vision):
+                if not future.done():
+                    future.cancel()
+        if transfer in done:
+            raise asyncio.Return(transfer.result())
+        elif vision in done:
+            progress = vision.result()
+            logging.debug('Transfer `%s`->`%s` confirmed by camera (progress: '
+                          '%.2f)', source, target, progress)
+            raise asyncio.Return(None)
+        raise asyncio.TimeoutError()
+
+    def wrapper(self, source, target, timeout=None):
+        '''
+        Returns
+        -------
+        function
+            Wrapper for transfer coroutine (e.g., ``wrapper`` argument of
+            :func:`dropbot.move.move_liquid`), see :meth:`race`.
+        '''
+        return ft.partial(self.race, source=source, target=target,
+                          timeout=timeout)
@@ -0,0 +1,143 @@
+# -*- encoding: utf-8 -*-
+'''
+Perspective correction of video frames using cached remap tables.
+
+.. versionadded:: 0.13.0
+'''
+from __future__ import (absolute_import, division, print_function,
+                        unicode_literals)
+
+import cv2
+import numpy as np
+
+
+def project(M, points):
+    '''
+    Parameters
+    ----------
+    M : numpy.ndarray
+        ``3x3`` perspective transformation matrix.
+    points : numpy.ndarray
+        ``Nx2`` array of points.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``Nx2`` array of transformed points.
+    '''
+    points = np.asarray(points, dtype='float64')
+    homogeneous = np.column_stack([points, np.ones(len(points))]).dot(M.T)
+    return homogeneous[:, :2] / homogeneous[:, 2:]
+
+
+class WarpEngine(object):
+    '''
+    Perspective warp equivalent to :func:`cv2.warpPerspective`, using
+    :func:`cv2.remap` with lookup tables that are reused across frames.
+
+    Remap tables are only rebuilt when the transformation changes enough to
+    move any corner of the output by more than ``tolerance`` source pixels.
+    Since the chip is generally stationary, most frames reuse the cached
+    (fixed-point) tables, which is substantially cheaper than computing the
+    perspective mapping for every pixel of every frame.
+
+    Parameters
+    ----------
+    tolerance : float, optional
+        Maximum drift (in source pixels) of the output corners before remap
+        tables are rebuilt.
+    scale : float, optional
+        Output scale factor, relative to size of the warped view.
+    roi : tuple(int, int, int, int), optional
+        ``(x, y, width, height)`` region of the warped view to render, e.g.,
+        only the chip region (default: entire warped view).
+    interpolation : int, optional
+        OpenCV interpolation flag.
+    '''
+    def __init__(self, tolerance=1., scale=1., roi=None,
+                 interpolation=cv2.INTER_LINEAR):
+        self.tolerance = tolerance
+        self.scale = scale
+        self.roi = roi
+        self.interpolation = interpolation
+        self.build_count = 0
+        self._maps = None
+        self._key = None
+
+    def reset(self):
+        '''
+        Discard cached remap tables.
+        '''
+        self._maps = None
+        self._key = None
+
+    def output_size(self, size):
+        '''
+        Parameters
+        ----------
+        size : tuple(int, int)
+            ``(width, height)`` of warped view.
+
+        Returns
+        -------
+        tuple(int, int)
+            ``(width, height)`` of output frames.
+        '''
+        x, y, width, height = (self.roi if self.roi is not None
+                               else (0, 0) + tuple(size))
+        return (int(round(width * self.scale)),
+                int(round(height * self.scale)))
+
+    def warp(self, frame, M, size=None, dst=None):
+        '''
+        Apply perspective transformation to frame.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            Source video frame.
+        M : numpy.ndarray
+            ``3x3`` perspective transformation matrix (e.g., from
+            :func:`cv2.getPerspectiveTransform`).
+        size : tuple(int, int), optional
+            ``(width, height)`` of warped view (default: size of ``frame``).
+        dst : numpy.ndarray, optional
+            Output array to write into.
+
+        Returns
+        -------
+        numpy.ndarray
+            Warped frame, of size :meth:`output_size`.
+        '''
+        if size is None:
+            size = frame.shape[1], frame.shape[0]
+        x, y = self.roi[:2] if self.roi is not None else (0, 0)
+        out_width, out_height = self.output_size(size)
+        # Map output pixel coordinates to warped view coordinates, then to
+        # source frame coordinates.
+        T = np.array([[1. / self.scale, 0, x],
+                      [0, 1. / self.scale, y],
+                      [0, 0, 1]])
+        M_inv = np.linalg.inv(M).dot(T)
+        key = project(M_inv, [(0, 0), (out_width, 0),
+                              (out_width, out_height), (0, out_height)])
+
+        if (self._maps is None or
+                self._maps[0].shape[:2] != (out_height, out_width) or
+                np.abs(key - self._key).max() > self.tolerance):
+            self._maps = self._build_maps(M_inv, out_width, out_height)
+            self._key = key
+            self.build_count += 1
+        return cv2.remap(frame, self._maps[0], self._maps[1],
+                         self.interpolation, dst=dst)
+
+    @staticmethod
+    def _build_maps(M_inv, width, height):
+        u, v = np.meshgrid(np.arange(width, dtype='float32'),
+                           np.arange(height, dtype='float32'))
+        M_inv = M_inv.astype('float32')
+        denominator = M_inv[2, 0] * u + M_inv[2, 1] * v + M_inv[2, 2]
+        map_x = (M_inv[0, 0] * u + M_inv[0, 1] * v + M_inv[0, 2]) / denominator
+        map_y = (M_inv[1, 0] * u + M_inv[1, 1] * v + M_inv[1, 2]) / denominator
+        # Fixed-point maps are considerably faster to apply.
+        return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)